@@ -9,8 +9,6 @@ st.write("# Welcome to our project! 👋")
 
 st.sidebar.success("Select visualization from the sidebar to get started.")
 
-import streamlit as st
-
 # Streamlit Introduction Page
 st.markdown("""
 # Data Science Project: Pipeline for Data Engineering, Machine Learning, and Visualization
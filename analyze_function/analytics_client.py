@@ -0,0 +1,98 @@
+import os
+import json
+import gzip
+import threading
+from collections import OrderedDict
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+## ---------------analytics client---------------
+# Thin client of analyze_function/analytics_server.py used by the pages. Every
+# response is kept with its ETag; later requests for the same URL send
+# If-None-Match, and a 304 reuses the parsed payload, so an unchanged figure
+# costs one round trip and no JSON decoding.
+
+ANALYTICS_URL = os.getenv("ANALYTICS_URL", "http://127.0.0.1:8765")
+
+
+class AnalyticsClient:
+    """
+    HTTP client of the analytics server with an ETag-validated response cache.
+    """
+
+    def __init__(self, base_url: str = ANALYTICS_URL, timeout: float = 120, max_entries: int = 256):
+        """
+        :param base_url: Server address.
+        :param timeout: Seconds to wait for a response (figures over the full corpus can take a while).
+        :param max_entries: Responses kept for revalidation.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._responses = OrderedDict()  # url -> (etag, payload)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"AnalyticsClient({self.base_url!r})"
+
+    def _get(self, path, params=None, timeout=None):
+        params = {key: value for key, value in (params or {}).items() if value is not None and value != ""}
+        url = f"{self.base_url}{path}" + (f"?{urlencode(sorted(params.items()))}" if params else "")
+        with self._lock:
+            cached = self._responses.get(url)
+        headers = {"Accept-Encoding": "gzip"}
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        try:
+            with urlopen(Request(url, headers=headers), timeout=timeout or self.timeout) as response:
+                body = response.read()
+                if response.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                etag = response.headers.get("ETag")
+        except HTTPError as e:
+            if e.code == 304 and cached is not None:
+                with self._lock:
+                    self._responses.move_to_end(url)
+                return cached[1]
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Analytics server error {e.code} for {path}: {message}") from None
+        payload = json.loads(body)
+        if etag:
+            with self._lock:
+                self._responses[url] = (etag, payload)
+                while len(self._responses) > self.max_entries:
+                    self._responses.popitem(last=False)
+        return payload
+
+    def available(self, timeout: float = 1.0):
+        """True when the server answers /health."""
+        try:
+            self._get("/health", timeout=timeout)
+            return True
+        except (URLError, OSError, RuntimeError, ValueError):
+            return False
+
+    def years(self, query=None):
+        """Year range of the (matching) papers; see InsightsDataset.years."""
+        return self._get("/years", {"query": query})
+
+    def figure(self, name, query=None, start_year=None, end_year=None, keyword=None, column=None, max_nodes=None):
+        """
+        Fetch one Data Insights figure.
+
+        :return: Dict with 'figure' (plotly figure dict, accepted by st.plotly_chart) and 'metrics'.
+        """
+        return self._get(f"/figure/{name}", {"query": query, "start_year": start_year, "end_year": end_year,
+                                             "keyword": keyword, "column": column, "max_nodes": max_nodes})
+
+    def refresh(self, full=False):
+        """Ask the server to add newly ingested papers (or, with ``full``, to reload everything)."""
+        request = Request(f"{self.base_url}/refresh{'?full=1' if full else ''}", data=b"", method="POST")
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+## ---------------analytics client---------------
@@ -0,0 +1,577 @@
+import os
+import sys
+import json
+import gzip
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+import pandas as pd
+from analyze_function.cache import dataset_fingerprint
+from analyze_function.schema import INSIGHTS_COLUMNS, load_typed_frame, mongo_projection, concat_typed_frames
+from analyze_function.year_aggregates import build_year_partials, YearPartials, YEAR_PARTIALS_PATH
+
+## ---------------insights dataset---------------
+# One typed copy of the Data Insights frame and the figures computed from it.
+# The analytics server holds a single instance for every dashboard session; the
+# page falls back to an in-process instance when no server is running. Filtered
+# views are kept in a small LRU so repeated requests hand the same DataFrame
+# objects to the cached analysis functions and reuse their fingerprints. A
+# refresh reads only the papers above the _id watermark and folds them into a
+# copy of the year aggregates instead of reloading and recounting everything.
+
+DEFAULT_KEYWORD = "Chulalongkorn"
+GRAPH_COLUMNS = ("Funding Agencies", "Organizations")
+VIEW_CACHE_SIZE = 16
+
+
+# Function to pick the initial year range of the slider
+def default_year_range(years):
+    min_year, max_year = years[0], years[-1]
+    return max(min_year, min(2018, max_year)), min(max_year, max(2023, min_year))
+
+
+def _collaboration_payload(data, column_name, max_nodes):
+    from analyze_function.collaboration_graph import build_collaboration_graph, plot_community_graph
+    graph = build_collaboration_graph(data, column_name=column_name)
+    communities = int(graph.communities().max() + 1) if graph.n_nodes else 0
+    fig = plot_community_graph(graph, max_nodes=max_nodes, title=f"{column_name} Collaboration Communities")
+    return fig, {"nodes": int(graph.n_nodes), "edges": int(graph.n_edges), "communities": communities}
+
+
+def _figure(name, data, summary, keyword, column, max_nodes):
+    """Compute one named figure; returns (figure, metrics or None)."""
+    from analyze_function import data_insights
+    if name == "top_cited_journals":
+        return data_insights.plot_top_cited_journals(summary['journal_citations'], top_n=10), None
+    if name == "open_access":
+        return data_insights.plot_open_access_trends(summary['open_access']), None
+    if name == "funding_agencies":
+        return data_insights.analyze_funding_agencies(data, keyword=keyword, column_name='Funding Agencies',
+                                                      top_n=10), None
+    if name == "connection_node":
+        return data_insights.analyze_connection_node(data), None
+    if name == "collaboration_graph":
+        if column not in GRAPH_COLUMNS:
+            raise ValueError(f"column must be one of {GRAPH_COLUMNS}")
+        return _collaboration_payload(data, column, max_nodes)
+    if name == "articles_per_year":
+        return data_insights.plot_article_per_year(summary['articles_per_year']), None
+    raise KeyError(name)
+
+
+FIGURES = ("top_cited_journals", "open_access", "funding_agencies", "connection_node", "collaboration_graph",
+           "articles_per_year")
+
+
+class InsightsDataset:
+    """
+    The Data Insights frame with its year aggregates, search filter and figures.
+    """
+
+    def __init__(self, frame: pd.DataFrame, search_index_dir: str = None, partials: YearPartials = None,
+                 mongo_handler=None):
+        """
+        :param frame: Typed frame with at least INSIGHTS_COLUMNS.
+        :param search_index_dir: Full-text index used by ``query`` filters; defaults to SEARCH_INDEX_DIR.
+        :param partials: Year aggregates of the whole frame; built from it when None.
+        :param mongo_handler: MongoDBHandler the frame was read from; enables incremental ``refreshed``.
+        """
+        from app.data_cleaning.search_index import SEARCH_INDEX_DIR
+        self.frame = frame
+        self.version = dataset_fingerprint(frame)
+        self.search_index_dir = search_index_dir or SEARCH_INDEX_DIR
+        self.partials = partials
+        self.mongo_handler = mongo_handler
+        self._search_index = None
+        self._search_stamp = None
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    @classmethod
+    def from_mongo(cls, mongo_handler, columns=INSIGHTS_COLUMNS, partials_path=YEAR_PARTIALS_PATH):
+        """
+        Load the typed frame from the Scopus 'data' collection.
+
+        :param mongo_handler: Connected MongoDBHandler.
+        :param columns: Columns to fetch.
+        :param partials_path: Year aggregates saved by ``python -m analyze_function.year_aggregates update``;
+            only the papers above their watermark are counted into them.
+        :return: The InsightsDataset.
+        """
+        _, data = mongo_handler.get_all_data(limit=0, projection=mongo_projection(columns))
+        frame = load_typed_frame(data, columns=columns)
+        partials = None
+        if partials_path and os.path.exists(partials_path):
+            partials = YearPartials.load(partials_path)
+            if partials.watermark is None:
+                partials = None
+            else:
+                new = frame[frame['_id'] > partials.watermark]
+                partials.update(new, watermark=str(new['_id'].max()) if len(new) else None)
+        return cls(frame, partials=partials, mongo_handler=mongo_handler)
+
+    def refreshed(self, chunk_size=50000):
+        """
+        The dataset extended with the papers ingested since this one was loaded.
+
+        Only documents above the highest loaded _id are read. The year aggregates of the
+        whole frame are copied and updated with them; the old dataset is left untouched.
+
+        :param chunk_size: Documents per read.
+        :return: A new InsightsDataset, or this one when nothing was added.
+        """
+        from bson import ObjectId
+        if self.mongo_handler is None:
+            raise ValueError("Only a dataset loaded from MongoDB can be refreshed incrementally")
+        columns = list(self.frame.columns)
+        watermark = self.frame['_id'].max() if len(self.frame) else None
+        query = {'_id': {'$gt': ObjectId(watermark)}} if watermark else None
+        chunks = [
+            load_typed_frame(records, columns=columns)
+            for records in self.mongo_handler.iter_chunks('data', chunk_size, projection=mongo_projection(columns),
+                                                          query=query, sort=[('_id', 1)])
+        ]
+        if not chunks:
+            return self
+        new = concat_typed_frames(chunks)
+        _, partials = self.matching()
+        partials = YearPartials(partials.partials, partials.watermark) if partials is not None else YearPartials()
+        partials.update(new, watermark=str(new['_id'].max()))
+        return InsightsDataset(concat_typed_frames([self.frame, new]), self.search_index_dir, partials,
+                               self.mongo_handler)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Load a columnar snapshot written by ``save_snapshot`` (dtypes are preserved)."""
+        return cls(pd.read_parquet(path))
+
+    def save_snapshot(self, path):
+        """Write the typed frame to a Parquet snapshot."""
+        self.frame.to_parquet(path, index=False)
+
+    def _search_ids(self, query):
+        from app.data_cleaning.search_index import SearchIndex
+        manifest_path = os.path.join(self.search_index_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise ValueError("No full-text index; build it with search_index.py sync")
+        # Reopen the index whenever an ingestion run rewrites its manifest
+        stamp = os.path.getmtime(manifest_path)
+        with self._lock:
+            if self._search_stamp != stamp:
+                self._search_index, self._search_stamp = SearchIndex(self.search_index_dir), stamp
+            index = self._search_index
+        return index.match_ids(query)
+
+    @property
+    def search_available(self):
+        return os.path.exists(os.path.join(self.search_index_dir, "manifest.json"))
+
+    def _cached_view(self, key, build):
+        # Builds are serialised so concurrent figures of one view share a single frame object
+        with self._build_lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+            view = build()
+            self._views[key] = view
+            while len(self._views) > VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return view
+
+    def matching(self, query=None):
+        """
+        The papers matching a full-text query, with their year aggregates.
+
+        :param query: Search query; None or '' keeps every paper.
+        :return: Tuple (frame, YearPartials or None when nothing matches).
+        """
+        def build():
+            frame = self.frame
+            if query:
+                frame = frame[frame['_id'].astype(str).isin(self._search_ids(query))]
+            elif self.partials is not None:
+                return frame, self.partials if self.partials.years else None
+            return frame, build_year_partials(frame) if len(frame) else None
+        return self._cached_view(("query", query or None), build)
+
+    def view(self, query=None, start_year=None, end_year=None):
+        """
+        The matching papers published in ``[start_year, end_year]`` and the merged aggregates of that range.
+
+        :return: Tuple (frame, summary dict from YearPartials.query).
+        """
+        frame, partials = self.matching(query)
+        if partials is None:
+            raise ValueError("No papers match the search")
+        if start_year is None or end_year is None:
+            start_year, end_year = default_year_range(partials.years)
+
+        def build():
+            data = frame[(frame['year'] >= start_year) & (frame['year'] <= end_year)]
+            return data, partials.query(start_year, end_year)
+        return self._cached_view(("range", query or None, start_year, end_year), build)
+
+    def years(self, query=None):
+        """
+        Year range information for the page controls.
+
+        :param query: Optional search query.
+        :return: Dict with version, n_rows, years, default range and whether search is available.
+        """
+        frame, partials = self.matching(query)
+        years = [int(year) for year in partials.years] if partials is not None else []
+        return {
+            "version": self.version,
+            "n_rows": int(len(frame)),
+            "years": years,
+            "default": list(default_year_range(years)) if years else None,
+            "search": self.search_available,
+        }
+
+    def figure(self, name, query=None, start_year=None, end_year=None, keyword=DEFAULT_KEYWORD,
+               column="Funding Agencies", max_nodes=100):
+        """
+        Compute one figure of the Data Insights page.
+
+        :param name: One of FIGURES.
+        :param query: Optional search query.
+        :param start_year: First year of the range (inclusive); defaults to the page's initial range.
+        :param end_year: Last year of the range (inclusive).
+        :param keyword: Funding agency keyword of the 'funding_agencies' figure.
+        :param column: Column of the 'collaboration_graph' figure.
+        :param max_nodes: Nodes drawn by the 'collaboration_graph' figure.
+        :return: Dict with 'figure' (plotly Figure) and 'metrics' (dict or None).
+        """
+        if name not in FIGURES:
+            raise KeyError(name)
+        data, summary = self.view(query, start_year, end_year)
+        fig, metrics = _figure(name, data, summary, keyword or DEFAULT_KEYWORD, column or "Funding Agencies",
+                               int(max_nodes or 100))
+        return {"figure": fig, "metrics": metrics}
+
+## ---------------insights dataset---------------
+
+
+## ---------------shared payload cache---------------
+class PayloadCache:
+    """
+    LRU of encoded response bodies with request coalescing.
+
+    Concurrent requests for the same key wait for the first one instead of
+    computing the payload again.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        :param max_bytes: Upper bound on the stored bodies (plain plus gzip).
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (etag, body, gzipped body)
+        self._current_bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached entry for ``key``, computing it at most once at a time.
+
+        :param key: Hashable cache key.
+        :param compute: Callable returning the JSON body as bytes.
+        :return: Tuple (etag, body, gzipped body).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = {"event": threading.Event(), "entry": None, "error": None}
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending["event"].wait()
+            if pending["error"] is not None:
+                raise pending["error"]
+            return pending["entry"]
+
+        try:
+            body = compute()
+            entry = (f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body, gzip.compress(body, 5))
+            pending["entry"] = entry
+            self._store(key, entry)
+            return entry
+        except Exception as e:
+            pending["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending["event"].set()
+
+    def _store(self, key, entry):
+        size = len(entry[1]) + len(entry[2])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._current_bytes -= len(old[1]) + len(old[2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._current_bytes, "hits": self.hits,
+                    "misses": self.misses, "coalesced": self.coalesced}
+
+## ---------------shared payload cache---------------
+
+
+## ---------------analytics HTTP service---------------
+# GET  /health                      version, rows and cache statistics
+# GET  /years?query=                year range of the (matching) papers
+# GET  /figure/<name>?query=&start_year=&end_year=&keyword=&column=&max_nodes=
+#                                   {"figure": plotly JSON, "metrics": {...} | null}
+# POST /refresh?full=               add the papers ingested since the last load (full=1 reloads
+#                                   everything) and drop the cache
+# Responses carry an ETag of their body; a matching If-None-Match gets a 304.
+
+FIGURE_PARAMETERS = {"query": str, "start_year": int, "end_year": int, "keyword": str, "column": str,
+                     "max_nodes": int}
+
+
+class AnalyticsService:
+    """
+    Serves the figures of one InsightsDataset through a shared PayloadCache.
+    """
+
+    def __init__(self, loader, max_cache_bytes: int = 256 * 1024 * 1024):
+        """
+        :param loader: Callable returning a fresh InsightsDataset (called again on refresh).
+        :param max_cache_bytes: Size of the payload cache.
+        """
+        self.loader = loader
+        self.cache = PayloadCache(max_cache_bytes)
+        self.dataset = loader()
+        self._reload_lock = threading.Lock()
+
+    def reload(self, full=False):
+        """
+        Pick up new data; cached payloads of the old version are dropped.
+
+        :param full: Call the loader again instead of only adding the new papers of a MongoDB dataset.
+        :return: The new data version.
+        """
+        with self._reload_lock:
+            if full or self.dataset.mongo_handler is None:
+                dataset = self.loader()
+            else:
+                dataset = self.dataset.refreshed()
+            if dataset is not self.dataset:
+                self.dataset = dataset
+                self.cache.clear()
+        return dataset.version
+
+    def warm(self):
+        """Precompute the payloads of the page's initial view."""
+        self.payload("/years", {})
+        for name in FIGURES:
+            try:
+                self.payload(f"/figure/{name}", {})
+            except Exception as e:
+                print(f"Error precomputing figure '{name}': {e}")
+
+    def payload(self, path, params):
+        """
+        Encoded response for a GET request.
+
+        :param path: Request path.
+        :param params: Query parameters (strings).
+        :return: Tuple (etag, body, gzipped body).
+        """
+        dataset = self.dataset
+        if path == "/years":
+            query = params.get("query") or None
+            return self.cache.get_or_compute(
+                (dataset.version, path, query),
+                lambda: json.dumps(dataset.years(query)).encode())
+        if path.startswith("/figure/"):
+            name = path[len("/figure/"):]
+            if name not in FIGURES:
+                raise KeyError(name)
+            unknown = set(params) - set(FIGURE_PARAMETERS)
+            if unknown:
+                raise ValueError(f"Unknown parameters {sorted(unknown)}")
+            try:
+                typed = {key: FIGURE_PARAMETERS[key](value) for key, value in params.items() if value != ""}
+            except ValueError:
+                raise ValueError("start_year, end_year and max_nodes must be integers")
+
+            def compute():
+                result = dataset.figure(name, **typed)
+                return ('{"figure": ' + result["figure"].to_json() + ', "metrics": '
+                        + json.dumps(result["metrics"]) + '}').encode()
+            return self.cache.get_or_compute((dataset.version, path, tuple(sorted(typed.items()))), compute)
+        raise KeyError(path)
+
+
+class AnalyticsRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of the AnalyticsService held by the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body=b"", etag=None, gzipped=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+        if gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({"error": message}).encode())
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        try:
+            if url.path == "/health":
+                body = {"version": service.dataset.version, "n_rows": int(len(service.dataset.frame)),
+                        "cache": service.cache.stats()}
+                self._send(200, json.dumps(body).encode())
+                return
+            etag, body, gzipped = service.payload(url.path, params)
+        except KeyError as e:
+            self._error(404, f"Not found: {e}")
+            return
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        except Exception as e:
+            print(f"Error serving {self.path}: {e}")
+            self._error(500, str(e))
+            return
+        candidates = [tag.strip().removeprefix("W/") for tag in self.headers.get("If-None-Match", "").split(",")]
+        if etag in candidates:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, body, etag, gzipped)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/refresh":
+            self._error(404, f"Not found: {self.path}")
+            return
+        full = dict(parse_qsl(url.query)).get("full", "") not in ("", "0")
+        try:
+            version = self.server.service.reload(full=full)
+        except Exception as e:
+            print(f"Error reloading analytics data: {e}")
+            self._error(500, str(e))
+            return
+        self._send(200, json.dumps({"version": version}).encode())
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# Function to create the HTTP server around a service
+def make_server(service, host="127.0.0.1", port=8765, verbose=False):
+    """
+    Bind a threaded HTTP server for an AnalyticsService.
+
+    Parameters:
+        service (AnalyticsService): The service to expose.
+        host (str): Interface to bind; keep the default to stay local.
+        port (int): Port to bind (0 picks a free one).
+        verbose (bool): Log every request.
+
+    Returns:
+        ThreadingHTTPServer: Call ``serve_forever()`` to start it.
+    """
+    server = ThreadingHTTPServer((host, port), AnalyticsRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+## ---------------analytics HTTP service---------------
+
+
+def main(argv=None):
+    """Command line entry point: serve the analytics API or write a columnar snapshot."""
+    parser = argparse.ArgumentParser(description="Local analytics server shared by the dashboard sessions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Serve the Data Insights figures over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--snapshot", default=None, help="Read a Parquet snapshot instead of MongoDB")
+    serve_parser.add_argument("--cache-mb", type=int, default=256)
+    serve_parser.add_argument("--no-warm", action="store_true", help="Do not precompute the initial view")
+    serve_parser.add_argument("--verbose", action="store_true")
+    snapshot_parser = subparsers.add_parser("snapshot", help="Write the typed frame from MongoDB to Parquet")
+    snapshot_parser.add_argument("output")
+    args = parser.parse_args(argv)
+
+    def load_from_mongo():
+        from app.data_collection.db import MongoDBHandler
+        return InsightsDataset.from_mongo(MongoDBHandler())
+
+    if args.command == "snapshot":
+        dataset = load_from_mongo()
+        dataset.save_snapshot(args.output)
+        print(f"Wrote {len(dataset.frame)} rows to {args.output} (version {dataset.version})")
+        return 0
+
+    loader = (lambda: InsightsDataset.from_snapshot(args.snapshot)) if args.snapshot else load_from_mongo
+    service = AnalyticsService(loader, max_cache_bytes=args.cache_mb * 1024 * 1024)
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"Serving {len(service.dataset.frame)} papers on http://{args.host}:{server.server_address[1]}")
+    if not args.no_warm:
+        threading.Thread(target=service.warm, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import os
+import pickle
+import hashlib
+import inspect
+import threading
+import weakref
+import functools
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+## ---------------analysis result cache---------------
+# Results are keyed by a fingerprint of every DataFrame argument plus the
+# remaining call arguments, so a rerun with the same data and parameters is a
+# single dictionary lookup.
+
+_MISSING = object()
+
+# Fingerprints memoised per live DataFrame object: id -> (weakref, fingerprint, sample token)
+_fingerprint_memo = {}
+_fingerprint_lock = threading.Lock()
+
+# Rows hashed by the memo check; spread evenly so an edit anywhere in a small frame is seen
+_SAMPLE_ROWS = 64
+
+
+def _hash_frame(data):
+    """Hash the contents of a DataFrame or Series (index, values and column names)."""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode())
+        digest.update(repr(list(data.dtypes.astype(str))).encode())
+    else:
+        digest.update(repr(data.name).encode())
+        digest.update(str(data.dtype).encode())
+    try:
+        hashed = pd.util.hash_pandas_object(data, index=True)
+    except TypeError:
+        # Columns holding unhashable values (lists, dicts, ObjectId...) are hashed by their text
+        hashed = pd.util.hash_pandas_object(data.astype(str), index=True)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _sample_token(data):
+    """Cheap check of a memoised fingerprint: shape, dtypes and a hash of a fixed row sample."""
+    positions = np.unique(np.linspace(0, len(data) - 1, num=min(len(data), _SAMPLE_ROWS)).astype(np.int64))
+    dtypes = tuple(data.dtypes.astype(str)) if isinstance(data, pd.DataFrame) else str(data.dtype)
+    return data.shape, dtypes, _hash_frame(data.iloc[positions])
+
+
+def dataset_fingerprint(data, refresh=False):
+    """
+    Return a content fingerprint for a DataFrame or Series.
+
+    The fingerprint is memoised for the lifetime of the object and reused while the
+    shape, dtypes and a fixed sample of rows are unchanged. An in-place edit that
+    misses every sampled row is not seen; pass ``refresh=True`` after such edits.
+
+    Parameters:
+        data (DataFrame | Series): The dataset to fingerprint.
+        refresh (bool): Ignore the memoised value and hash the contents again.
+
+    Returns:
+        str: A hex digest identifying the contents of ``data``.
+    """
+    key = id(data)
+    sample = _sample_token(data)
+    if not refresh:
+        with _fingerprint_lock:
+            entry = _fingerprint_memo.get(key)
+        if entry is not None and entry[0]() is data and entry[2] == sample:
+            return entry[1]
+
+    fingerprint = _hash_frame(data)
+    try:
+        ref = weakref.ref(data, lambda _, key=key: _fingerprint_memo.pop(key, None))
+    except TypeError:
+        return fingerprint
+    with _fingerprint_lock:
+        _fingerprint_memo[key] = (ref, fingerprint, sample)
+    return fingerprint
+
+
+def _normalize_argument(value):
+    """Turn a call argument into a stable, hashable token for the cache key."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return ("frame", dataset_fingerprint(value))
+    if isinstance(value, pd.Index):
+        return ("index", tuple(value.tolist()))
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _normalize_argument(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_normalize_argument(v) for v in value]
+        if isinstance(value, (set, frozenset)):
+            items = sorted(items, key=repr)
+        return (type(value).__name__, tuple(items))
+    return value
+
+
+def make_cache_key(func, args, kwargs):
+    """Build the cache key for ``func(*args, **kwargs)`` with defaults applied."""
+    signature = inspect.signature(func)
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    token = repr((func.__module__, func.__qualname__,
+                  tuple((name, _normalize_argument(value)) for name, value in bound.arguments.items())))
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+def _estimate_size(value):
+    """Approximate the memory held by a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class AnalysisCache:
+    """
+    A memory-bounded LRU cache for analysis results with an optional disk tier.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, disk_dir: str = None,
+                 max_disk_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        :param max_bytes: Upper bound on the estimated size of the in-memory entries.
+        :param disk_dir: Directory for the disk tier. The disk tier is disabled when None.
+        :param max_disk_bytes: Upper bound on the total size of the files in ``disk_dir``.
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._current_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or (self.disk_dir is not None and os.path.exists(self._disk_path(key)))
+
+    @property
+    def current_bytes(self):
+        return self._current_bytes
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        """
+        Look up a cached value, falling back to the disk tier.
+
+        :param key: The cache key.
+        :param default: Value returned when the key is not cached.
+        :return: The cached value or ``default``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = _MISSING
+            if value is not _MISSING:
+                os.utime(path)
+                self._store_memory(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Store a value in memory and, when enabled, on disk.
+
+        :param key: The cache key.
+        :param value: The value to cache.
+        """
+        self._store_memory(key, value)
+        if self.disk_dir:
+            self._store_disk(key, value)
+
+    def _store_memory(self, key, value):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+            # Evict least recently used entries until we are back under budget
+            while self._current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+
+    def _store_disk(self, key, value):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing cache entry to {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self, disk=False):
+        """
+        Drop every in-memory entry, and the disk tier as well when ``disk`` is True.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+        if disk and self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        """Return hit/miss counters and the current memory footprint."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._current_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+# Shared cache used by the analysis modules; set ANALYSIS_CACHE_DIR to enable the disk tier
+analysis_cache = AnalysisCache(disk_dir=os.getenv("ANALYSIS_CACHE_DIR"))
+
+
+def cached_analysis(func=None, *, cache=None, check_inputs=True):
+    """
+    Decorator that memoises an analysis function in an ``AnalysisCache``.
+
+    On a cache miss the DataFrame arguments are fingerprinted again after the call;
+    if the function changed them a RuntimeError is raised, so cached results can
+    never be built from data that was modified along the way.
+
+    Parameters:
+        func (callable): The analysis function to wrap.
+        cache (AnalysisCache): The cache to use. Defaults to ``analysis_cache``.
+        check_inputs (bool): Verify that DataFrame arguments are not mutated.
+
+    Returns:
+        callable: The wrapped function. ``wrapper.uncached`` calls the original.
+    """
+    if func is None:
+        return functools.partial(cached_analysis, cache=cache, check_inputs=check_inputs)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        target = cache if cache is not None else analysis_cache
+        key = make_cache_key(func, args, kwargs)
+        result = target.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        frames = [value for value in list(args) + list(kwargs.values())
+                  if isinstance(value, (pd.DataFrame, pd.Series))]
+        before = [dataset_fingerprint(frame) for frame in frames]
+        result = func(*args, **kwargs)
+        if check_inputs:
+            after = [dataset_fingerprint(frame, refresh=True) for frame in frames]
+            if after != before:
+                raise RuntimeError(f"{func.__qualname__} mutated its input data; refusing to cache the result.")
+        target.put(key, result)
+        return result
+
+    wrapper.uncached = func
+    wrapper.cache_key = lambda *args, **kwargs: make_cache_key(func, args, kwargs)
+    return wrapper
+
+## ---------------analysis result cache---------------
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from analyze_function.ml_processing import StreamingTextClusterer, iter_predict_chunks
+
+## ---------------cluster visualization artifact---------------
+# Offline job that rebuilds the ML page's scatter data (formerly a hand-made
+# dataset/k-mean.csv) from the whole Mongo `data` collection. The streaming
+# clustering pipeline reads the collection in chunks, and the scored rows are
+# written one Parquet row group per chunk, so memory stays bounded by the chunk
+# size. A version stamp and the build settings go into the file's metadata.
+
+ARTIFACT_PATH = os.getenv("CLUSTER_ARTIFACT_PATH", "dataset/k-mean.parquet")
+LEGACY_ARTIFACT_PATH = "dataset/k-mean.csv"
+# Columns the ML page plots; everything else in the artifact is left on disk
+PLOT_COLUMNS = ['dc:title', 'auto_label', 'PCA1', 'PCA2']
+TEXT_COLUMNS = ('dc:title', 'auth-keywords')
+METADATA_KEY = b"cluster_artifact"
+
+ARTIFACT_SCHEMA = pa.schema([
+    ('dc:title', pa.string()),
+    ('cluster', pa.int16()),
+    ('auto_label', pa.dictionary(pa.int8(), pa.string())),
+    ('PCA1', pa.float32()),
+    ('PCA2', pa.float32()),
+])
+
+
+# Function to stream a Mongo collection as DataFrame chunks holding only the given columns
+def mongo_chunk_factory(db_handler, collection_name='data', columns=TEXT_COLUMNS, chunk_size=20000):
+    projection = {column: 1 for column in columns}
+    projection['_id'] = 0
+
+    def factory():
+        for records in db_handler.iter_chunks(collection_name, chunk_size, projection=projection):
+            yield pd.DataFrame.from_records(records).reindex(columns=list(columns))
+    return factory
+
+
+def _to_table(result, schema=ARTIFACT_SCHEMA):
+    """Convert one scored chunk to the compact artifact schema."""
+    return pa.Table.from_pandas(pd.DataFrame({
+        'dc:title': result['dc:title'].astype(object).where(result['dc:title'].notna(), None),
+        'cluster': result['cluster'].astype(np.int16),
+        'auto_label': result['auto_label'].astype(str),
+        'PCA1': result['PCA1'].astype(np.float32),
+        'PCA2': result['PCA2'].astype(np.float32),
+    }), schema=schema, preserve_index=False)
+
+
+def build_cluster_artifact(source, output_path=ARTIFACT_PATH, text_columns=TEXT_COLUMNS, n_clusters=10,
+                           chunk_size=20000, category_keywords=None, source_name=None, progress_callback=None):
+    """
+    Cluster, auto-label and project a whole corpus in chunks and write the plot artifact.
+
+    Parameters:
+        source: CSV path or a callable returning a fresh iterator of DataFrame chunks
+            (see mongo_chunk_factory). It is read three times.
+        output_path (str): Destination Parquet file; written to a temporary file and renamed.
+        text_columns (tuple): Columns concatenated into the clustered text; the first one is
+            kept as the hover title.
+        n_clusters (int): Number of clusters.
+        chunk_size (int): Rows per chunk.
+        category_keywords (dict): Category taxonomy used to auto-label clusters.
+        source_name (str): Description of the source stored in the version stamp.
+        progress_callback (callable): Optional callable(fraction, message).
+
+    Returns:
+        tuple: (version stamp dict, fitted ClusterModel)
+    """
+    text_columns = list(text_columns)
+    clusterer = StreamingTextClusterer(n_clusters=n_clusters, chunk_size=chunk_size, text_columns=text_columns)
+    clusterer.fit(source, category_keywords, progress_callback)
+    model = clusterer.to_model()
+
+    stamp = {
+        'version': datetime.datetime.now().strftime("%Y%m%d-%H%M%S"),
+        'created': datetime.datetime.now().isoformat(timespec="seconds"),
+        'source': source_name or (source if isinstance(source, str) else 'chunk factory'),
+        'n_rows': int(clusterer.n_documents_),
+        'n_clusters': n_clusters,
+        'text_columns': text_columns,
+        'cluster_labels': list(model.cluster_labels),
+    }
+    title_column = text_columns[0]
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    schema = ARTIFACT_SCHEMA.with_metadata({METADATA_KEY: json.dumps(stamp).encode()})
+    temporary_path = f"{output_path}.tmp"
+    with pq.ParquetWriter(temporary_path, schema, compression='zstd') as writer:
+        for result in iter_predict_chunks(model, source, chunk_size, keep_columns=(title_column,),
+                                          progress_callback=progress_callback, start_fraction=0.7,
+                                          n_rows=clusterer.n_documents_):
+            writer.write_table(_to_table(result.rename(columns={title_column: 'dc:title'}), schema))
+    os.replace(temporary_path, output_path)
+    print(f"Wrote {stamp['n_rows']} rows to {output_path} (version {stamp['version']})")
+    return stamp, model
+
+
+def artifact_version(path=ARTIFACT_PATH):
+    """
+    Read the version stamp of an artifact without loading its rows.
+
+    Parameters:
+        path (str): The Parquet artifact.
+
+    Returns:
+        dict: The stamp written by build_cluster_artifact, or None when there is none.
+    """
+    if not path.endswith('.parquet') or not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata[METADATA_KEY]) if METADATA_KEY in metadata else None
+
+
+def load_cluster_artifact(path=None, columns=PLOT_COLUMNS):
+    """
+    Load only the plotted columns of the cluster artifact.
+
+    Parameters:
+        path (str): Artifact path; defaults to ARTIFACT_PATH, falling back to the legacy CSV.
+        columns (list): Columns to read.
+
+    Returns:
+        DataFrame: The requested columns, with auto_label as a categorical.
+    """
+    if path is None:
+        path = ARTIFACT_PATH if os.path.exists(ARTIFACT_PATH) else LEGACY_ARTIFACT_PATH
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    data = pd.read_csv(path, usecols=columns, dtype={'auto_label': 'category'})
+    return data[columns]
+
+## ---------------cluster visualization artifact---------------
+
+
+def main(argv=None):
+    """Command line entry point: rebuild the artifact from Mongo or from a CSV."""
+    parser = argparse.ArgumentParser(description="Build the ML page's cluster visualization artifact")
+    parser.add_argument("--output", default=ARTIFACT_PATH)
+    parser.add_argument("--collection", default="data", help="Mongo collection to read")
+    parser.add_argument("--csv", default=None, help="Read a CSV instead of Mongo")
+    parser.add_argument("--text-columns", nargs="+", default=list(TEXT_COLUMNS))
+    parser.add_argument("--n-clusters", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        source, source_name = args.csv, args.csv
+    else:
+        from app.data_collection.db import MongoDBHandler
+        source = mongo_chunk_factory(MongoDBHandler(), args.collection, args.text_columns, args.chunk_size)
+        source_name = f"mongo:{args.collection}"
+    build_cluster_artifact(source, args.output, args.text_columns, args.n_clusters, args.chunk_size,
+                           source_name=source_name,
+                           progress_callback=lambda fraction, message: print(f"[{fraction:5.0%}] {message}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
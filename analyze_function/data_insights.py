@@ -1,15 +1,13 @@
-import streamlit as st
-import time
-import numpy as np
 import pandas as pd
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import networkx as nx
 from collections import Counter
+from analyze_function.cache import cached_analysis
+from analyze_function.profiling import profiled
+from analyze_function.heavy_hitters import top_values
 
 ## ---------------data analysis part---------------
 # Function to analyze top-cited journals
+@cached_analysis
+@profiled()
 def analyze_top_cited_journals(data, top_n=10):
     """
     Analyze and visualize the top-cited journals, handling long text labels.
@@ -22,8 +20,16 @@ def analyze_top_cited_journals(data, top_n=10):
         None: Displays a bar chart of top-cited journals.
     """
     # Identify top-cited journals
-    top_cited = data.groupby('prism:publicationName')['citedby-count'].sum().sort_values(ascending=False).head(top_n)
-    
+    journal_citations = data.groupby('prism:publicationName', observed=True)['citedby-count'].sum()
+    return plot_top_cited_journals(journal_citations, top_n)
+
+
+# Function to plot the top-cited journals from precomputed citation sums per journal
+def plot_top_cited_journals(journal_citations, top_n=10):
+    # plotly and networkx are imported on first use to keep page startup fast
+    import plotly.express as px
+    top_cited = journal_citations.sort_values(ascending=False).head(top_n)
+
     # Truncate or format long journal names
     top_cited.index = top_cited.index.map(lambda x: x[:20] + "..." if len(x) > 20 else x)
 
@@ -45,6 +51,8 @@ def analyze_top_cited_journals(data, top_n=10):
     return fig
 
 
+@cached_analysis
+@profiled()
 def analyze_open_access_trends(data):
     """
     Analyze and visualize the open-access trends.
@@ -57,9 +65,16 @@ def analyze_open_access_trends(data):
     """
     # Analyze open-access trends
     mapping = {"gold": "True", "bronze": "True", "green": "True", "hybrid": "True", "diamond": "True" ,"True": "True"}
-    data['openaccessFlag'] = data["openaccessFlag"].replace(mapping)
-    open_access_trends = data['openaccessFlag'].value_counts()
+    # Map onto a new Series so the caller's frame is left untouched; the typed frame stores the flag as a
+    # category, which replace() cannot merge into one value, so map plain objects (missing flags stay NaN)
+    open_access_flags = data["openaccessFlag"].astype(object).replace(mapping)
+    open_access_trends = open_access_flags.value_counts()
+    return plot_open_access_trends(open_access_trends)
 
+
+# Function to plot open-access trends from precomputed counts per flag
+def plot_open_access_trends(open_access_trends):
+    import plotly.express as px
     # Plot open-access trends
     fig = px.pie(
         names=open_access_trends.index,
@@ -73,6 +88,7 @@ def analyze_open_access_trends(data):
     return fig
 
 
+@profiled()
 def analyze_funding_agency_counts(data, top_n=10):
     """
     Display the top funding agencies by count.
@@ -85,7 +101,8 @@ def analyze_funding_agency_counts(data, top_n=10):
         None: Prints the top funding agencies by count.
     """
     # Explore funding patterns
-    funding_counts = data['Funding Agencies'].value_counts().head(top_n)
+    # Count individual agencies chunk by chunk instead of exploding the whole column
+    funding_counts = top_values(data, 'Funding Agencies', top_n)
 
     print(f"Top {top_n} Funding Agencies by Count:")
     print(funding_counts)
@@ -115,6 +132,7 @@ def prepare_top_agencies_df(co_occurrence_count, top_n):
 
 # Function to create a bar plot using Plotly
 def plot_top_agencies(top_agencies_df, top_n, keyword):
+    import plotly.express as px
     top_agencies_df.Agency = top_agencies_df.Agency.map(lambda x: x[:20] + "..." if len(x) > 20 else x)
     fig = px.bar(
         top_agencies_df, 
@@ -133,6 +151,8 @@ def plot_top_agencies(top_agencies_df, top_n, keyword):
     return fig
 
 # Renamed main function for workflow execution
+@cached_analysis
+@profiled()
 def analyze_funding_agencies(data, keyword='Chulalongkorn', column_name='Funding Agencies', top_n=10):
     # Step 1: Filter data by keyword
     filtered_data = filter_by_funding_agency(data, keyword, column_name)
@@ -149,9 +169,16 @@ def analyze_funding_agencies(data, keyword='Chulalongkorn', column_name='Funding
     # Step 5: Plot the results
     return plot_top_agencies(top_agencies_df, top_n, keyword)
 
+@cached_analysis
+@profiled()
 def article_per_year(data):
     articles_per_year = data.groupby('year').size()
+    return plot_article_per_year(articles_per_year)
+
 
+# Function to plot the number of articles from precomputed counts per year
+def plot_article_per_year(articles_per_year):
+    import plotly.express as px
     # Create the line plot
     fig = px.line(articles_per_year, title='Number of Articles Published per Year', labels={'year': 'Year', '0': 'Number of Articles'})
 
@@ -187,18 +214,6 @@ def article_per_year(data):
     fig.add_vline(x=2020, line=dict(color='purple', width=2, dash='dash'), annotation_text="Pandemic Year", annotation_position="top right")
     return fig 
 
-# Function to clean and preprocess funding agency data
-def preprocess_funding_agencies(data, column_name='Funding Agencies'):
-    data[column_name] = data[column_name].fillna('')
-    funding_agencies = data[column_name].str.split(',').explode().str.strip().dropna()
-    return funding_agencies
-
-# Function to count and filter the top N funding agencies
-def get_top_agencies(funding_agencies, top_n=10):
-    agency_count = funding_agencies.value_counts()
-    top_agencies = agency_count.head(top_n).index
-    return top_agencies
-
 # Function to create edges for the network graph
 def create_edges(data, column_name, top_agencies=None):
     edges = set()  # Using a set to avoid duplicate pairs
@@ -223,6 +238,7 @@ def create_edges(data, column_name, top_agencies=None):
 
 # Function to create a network graph and calculate node positions
 def build_graph(edges):
+    import networkx as nx
     G = nx.Graph()
     G.add_edges_from(edges)
     pos = nx.spring_layout(G, k=0.15, iterations=20)
@@ -230,6 +246,7 @@ def build_graph(edges):
 
 # Function to prepare Plotly traces for visualization
 def prepare_traces(G, pos):
+    import plotly.graph_objects as go
     # Prepare edges
     edge_x, edge_y = [], []
     for edge in G.edges():
@@ -280,6 +297,7 @@ def prepare_traces(G, pos):
 
 # Function to create and display/save the graph
 def visualize_network(edge_trace, node_trace, output_file="funding_agencies_network_with_labels.html"):
+    import plotly.graph_objects as go
     fig = go.Figure(
         data=[edge_trace, node_trace],
         layout=go.Layout(
@@ -296,23 +314,22 @@ def visualize_network(edge_trace, node_trace, output_file="funding_agencies_netw
     return fig
 
 # Main function to execute the workflow
+@cached_analysis
+@profiled()
 def analyze_connection_node(data, column_name='Funding Agencies', top_n=10, output_file="funding_agencies_network_with_labels.html"):
-    # Step 1: Preprocess data
-    funding_agencies = preprocess_funding_agencies(data, column_name)
-    
-    # Step 2: Get top N agencies
-    top_agencies = get_top_agencies(funding_agencies, top_n)
+    # Step 1: Get top N agencies in a single streaming pass
+    top_agencies = top_values(data, column_name, top_n).index
     
-    # Step 3: Create edges
+    # Step 2: Create edges
     edges = create_edges(data, column_name, top_agencies)
     
-    # Step 4: Build graph
+    # Step 3: Build graph
     G, pos = build_graph(edges)
     
-    # Step 5: Prepare Plotly traces
+    # Step 4: Prepare Plotly traces
     edge_trace, node_trace = prepare_traces(G, pos)
     
-    # Step 6: Visualize network
+    # Step 5: Visualize network
     fig = visualize_network(edge_trace, node_trace, output_file)
     return fig
 
@@ -0,0 +1,300 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from analyze_function.model_registry import ModelRegistry
+
+## ---------------title -> field classifier---------------
+# A sparse linear model trained on dataset/title_field_count.csv. Scoring is a
+# single sparse matrix product per micro-batch, so whole corpora can be labelled
+# in a streaming pass.
+
+FIELD_MODEL_NAME = "field_classifier"
+DEFAULT_TRAINING_FILE = "dataset/title_field_count.csv"
+DEFAULT_BATCH_SIZE = 4096
+
+
+def _clean_titles(titles):
+    return pd.Series(titles, dtype=object).fillna('').astype(str).to_numpy()
+
+
+class FieldClassifier:
+    """
+    Predict the research field of a paper from its title.
+    """
+
+    def __init__(self, ngram_range=(1, 2), min_df=2, alpha=1e-4, random_state=42):
+        """
+        Initialize the classifier.
+
+        :param ngram_range: Word n-gram range of the TF-IDF features.
+        :param min_df: Minimum document frequency of a feature.
+        :param alpha: L2 regularisation strength of the linear model.
+        :param random_state: Seed of the SGD solver.
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import SGDClassifier
+        self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=ngram_range, min_df=min_df,
+                                          sublinear_tf=True, dtype=np.float32)
+        self.model = SGDClassifier(loss='modified_huber', alpha=alpha, max_iter=50, tol=1e-4,
+                                   random_state=random_state)
+        self.classes_ = None
+        self._weights = None
+        self._intercept = None
+
+    def fit(self, titles, fields):
+        """
+        Train on parallel lists of titles and field labels.
+
+        :return: self
+        """
+        X = self.vectorizer.fit_transform(_clean_titles(titles))
+        self.model.fit(X, np.asarray(fields))
+        self._prepare_scoring()
+        return self
+
+    def _prepare_scoring(self):
+        # Keep a float32, column-major copy of the weights for the scoring product
+        self.classes_ = self.model.classes_
+        coef, intercept = self.model.coef_, self.model.intercept_
+        if coef.shape[0] == 1:
+            # Binary models keep a single row scoring the second class
+            coef, intercept = np.vstack([-coef, coef]), np.concatenate([-intercept, intercept])
+        self._weights = np.asfortranarray(coef.T, dtype=np.float32)
+        self._intercept = intercept.astype(np.float32)
+
+    def decision_function(self, titles):
+        """
+        Score every title against every field.
+
+        :param titles: Iterable of titles.
+        :return: Array of shape (n_titles, n_fields).
+        """
+        X = self.vectorizer.transform(_clean_titles(titles))
+        return np.asarray(X @ self._weights) + self._intercept
+
+    def predict(self, titles, batch_size=DEFAULT_BATCH_SIZE, return_scores=False):
+        """
+        Predict the field of every title in micro-batches.
+
+        :param titles: Iterable of titles.
+        :param batch_size: Titles scored per batch.
+        :param return_scores: Also return the winning decision score of each title.
+        :return: Array of field names (and array of scores when requested).
+        """
+        titles = _clean_titles(titles)
+        labels, scores = [], []
+        for start in range(0, len(titles), batch_size):
+            decision = self.decision_function(titles[start:start + batch_size])
+            best = decision.argmax(axis=1)
+            labels.append(self.classes_[best])
+            scores.append(decision[np.arange(len(best)), best])
+        if not labels:
+            labels, scores = [np.array([], dtype=object)], [np.array([], dtype=np.float32)]
+        if return_scores:
+            return np.concatenate(labels), np.concatenate(scores)
+        return np.concatenate(labels)
+
+    def predict_batches(self, batches):
+        """
+        Predict a stream of title batches (e.g. chunks read from Mongo or CSV).
+
+        :param batches: Iterable of title lists.
+        :return: Generator of field-name arrays, one per batch.
+        """
+        for batch in batches:
+            yield self.predict(batch, batch_size=max(len(batch), 1))
+
+    def evaluate(self, titles, fields):
+        """
+        Measure accuracy and macro F1 on labelled titles.
+
+        :return: Dictionary of metrics.
+        """
+        from sklearn.metrics import accuracy_score, f1_score
+        predicted = self.predict(titles)
+        return {
+            'accuracy': float(accuracy_score(fields, predicted)),
+            'macro_f1': float(f1_score(fields, predicted, average='macro')),
+            'n_samples': int(len(predicted)),
+        }
+
+    def save(self, registry=None, name=FIELD_MODEL_NAME, metadata=None):
+        """
+        Save the classifier as a new version in a ModelRegistry.
+
+        :return: The saved version string.
+        """
+        registry = registry or ModelRegistry()
+        return registry.save(name, {'vectorizer': self.vectorizer, 'model': self.model}, metadata=metadata)
+
+    @classmethod
+    def load(cls, registry=None, name=FIELD_MODEL_NAME, version='latest'):
+        """
+        Load a saved version from a ModelRegistry.
+
+        :return: The FieldClassifier.
+        """
+        registry = registry or ModelRegistry()
+        artifacts, _ = registry.load(name, version)
+        classifier = cls()
+        classifier.vectorizer = artifacts['vectorizer']
+        classifier.model = artifacts['model']
+        classifier._prepare_scoring()
+        return classifier
+
+
+def train_field_classifier(file_path=DEFAULT_TRAINING_FILE, test_size=0.2, random_state=42):
+    """
+    Train a classifier on a title,field CSV and report held-out metrics.
+
+    Parameters:
+        file_path (str): CSV with 'title' and 'field' columns.
+        test_size (float): Fraction of rows held out for evaluation.
+        random_state (int): Seed of the split and the solver.
+
+    Returns:
+        tuple: (FieldClassifier trained on all rows, held-out metrics dict)
+    """
+    from sklearn.model_selection import train_test_split
+    data = pd.read_csv(file_path).dropna(subset=['title', 'field'])
+    train, test = train_test_split(data, test_size=test_size, random_state=random_state, stratify=data['field'])
+    metrics = FieldClassifier(random_state=random_state).fit(train['title'], train['field']).evaluate(
+        test['title'], test['field'])
+    classifier = FieldClassifier(random_state=random_state).fit(data['title'], data['field'])
+    return classifier, metrics
+
+
+def classify_csv(classifier, input_path, output_path, title_column='title', chunk_size=100000,
+                 batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Label every row of a CSV in a streaming pass and write the result.
+
+    Parameters:
+        classifier (FieldClassifier): The trained classifier.
+        input_path (str): CSV to label.
+        output_path (str): Destination CSV with 'predicted_field' and 'field_score' appended.
+        title_column (str): Column holding the titles.
+        chunk_size (int): Rows read per chunk.
+        batch_size (int): Titles scored per micro-batch.
+
+    Returns:
+        int: Number of labelled rows.
+    """
+    n_rows = 0
+    for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunk_size)):
+        labels, scores = classifier.predict(chunk[title_column], batch_size=batch_size, return_scores=True)
+        chunk['predicted_field'] = labels
+        chunk['field_score'] = scores
+        chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        n_rows += len(chunk)
+    return n_rows
+
+
+def predict_field_counts(classifier, chunks, title_column='title'):
+    """
+    Count the predicted fields over a stream of DataFrame chunks.
+
+    Parameters:
+        classifier (FieldClassifier): The trained classifier.
+        chunks (iterable): DataFrames holding ``title_column``.
+        title_column (str): Column holding the titles.
+
+    Returns:
+        Series: Number of titles per predicted field, most common first.
+    """
+    counts = pd.Series(dtype=np.int64)
+    for chunk in chunks:
+        chunk_counts = pd.Series(classifier.predict(chunk[title_column])).value_counts()
+        counts = counts.add(chunk_counts, fill_value=0)
+    return counts.astype(np.int64).sort_values(ascending=False)
+
+
+# Function to plot the number of titles per predicted field
+def plot_field_counts(field_counts, title="Predicted Research Fields"):
+    import plotly.express as px
+    fig = px.bar(
+        x=field_counts.index,
+        y=field_counts.values,
+        title=title,
+        labels={'x': 'Research Field', 'y': 'Number of Papers'},
+        color_discrete_sequence=['skyblue'],
+    )
+    fig.update_layout(xaxis_tickangle=-45, height=500)
+    return fig
+
+
+def benchmark_throughput(classifier, titles, batch_sizes=(256, 1024, 4096, 16384), repeats=3):
+    """
+    Measure prediction throughput for several micro-batch sizes.
+
+    Parameters:
+        classifier (FieldClassifier): The trained classifier.
+        titles (list): Titles to score; repeated to reach a measurable workload.
+        batch_sizes (tuple): Micro-batch sizes to compare.
+        repeats (int): Timed runs per batch size (the best one is kept).
+
+    Returns:
+        DataFrame: batch_size, seconds and titles_per_sec for each batch size.
+    """
+    titles = _clean_titles(titles)
+    rows = []
+    for batch_size in batch_sizes:
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            classifier.predict(titles, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+        rows.append({'batch_size': batch_size, 'seconds': best, 'titles_per_sec': len(titles) / best})
+    return pd.DataFrame(rows)
+
+## ---------------title -> field classifier---------------
+
+
+def main(argv=None):
+    """Command line entry point: train, predict or bench."""
+    parser = argparse.ArgumentParser(description="Title -> research field classifier")
+    parser.add_argument("--model-dir", default=None, help="Model registry directory (default: MODEL_DIR or models/)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train on a title,field CSV and save a new version")
+    train_parser.add_argument("--data", default=DEFAULT_TRAINING_FILE)
+
+    predict_parser = subparsers.add_parser("predict", help="Label every title of a CSV")
+    predict_parser.add_argument("input")
+    predict_parser.add_argument("output")
+    predict_parser.add_argument("--title-column", default="title")
+    predict_parser.add_argument("--chunk-size", type=int, default=100000)
+    predict_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    predict_parser.add_argument("--version", default="latest")
+
+    bench_parser = subparsers.add_parser("bench", help="Measure prediction throughput in titles/sec")
+    bench_parser.add_argument("--data", default=DEFAULT_TRAINING_FILE)
+    bench_parser.add_argument("--n-titles", type=int, default=200000)
+    bench_parser.add_argument("--version", default="latest")
+
+    args = parser.parse_args(argv)
+    registry = ModelRegistry(args.model_dir) if args.model_dir else ModelRegistry()
+
+    if args.command == "train":
+        classifier, metrics = train_field_classifier(args.data)
+        print(f"Held-out accuracy {metrics['accuracy']:.3f}, macro F1 {metrics['macro_f1']:.3f}")
+        classifier.save(registry, metadata={'training_file': args.data, **metrics})
+    elif args.command == "predict":
+        classifier = FieldClassifier.load(registry, version=args.version)
+        start = time.perf_counter()
+        n_rows = classify_csv(classifier, args.input, args.output, args.title_column, args.chunk_size,
+                              args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"Labelled {n_rows} titles in {elapsed:.1f}s ({n_rows / max(elapsed, 1e-9):,.0f} titles/sec)")
+    elif args.command == "bench":
+        classifier = FieldClassifier.load(registry, version=args.version)
+        titles = pd.read_csv(args.data)['title']
+        titles = np.resize(_clean_titles(titles), args.n_titles)
+        print(benchmark_throughput(classifier, titles).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+import os
+import re
+import sys
+import json
+import pickle
+import hashlib
+import argparse
+import unicodedata
+import numpy as np
+import pandas as pd
+
+## ---------------country nodes and collaboration flows---------------
+# The mapping CSVs hold one row per country mention (countries.csv) and one row
+# per collaboration link (line_data_list.csv), with many duplicates. These
+# functions collapse them into one node per country with a publication count and
+# one flow per unordered country pair with a weight, which is what the pydeck
+# layers draw.
+
+NODE_COLUMNS = ['Country', 'latitude', 'longitude', 'publications']
+FLOW_COLUMNS = ['source', 'target', 'start_lat', 'start_lon', 'end_lat', 'end_lon', 'weight']
+
+
+# Function to collapse country mentions into one weighted node per country
+def aggregate_country_nodes(mentions):
+    """
+    Count the mentions of every country.
+
+    Parameters:
+        mentions (DataFrame): One row per mention with Country, latitude and longitude.
+
+    Returns:
+        DataFrame: Country, latitude, longitude and publications, most published first.
+    """
+    nodes = (
+        mentions.dropna(subset=['latitude', 'longitude'])
+        .groupby(['Country', 'latitude', 'longitude'], sort=False)
+        .size()
+        .reset_index(name='publications')
+    )
+    return nodes.sort_values('publications', ascending=False, ignore_index=True)[NODE_COLUMNS]
+
+
+# Function to collapse duplicate links into one weighted flow per country pair
+def aggregate_flows(links, nodes=None, directed=False):
+    """
+    Count the links between every pair of locations.
+
+    Parameters:
+        links (DataFrame): One row per link with start_lat, start_lon, end_lat and end_lon.
+        nodes (DataFrame): Optional node table used to name the endpoints.
+        directed (bool): Keep A->B and B->A apart; by default both count towards one flow.
+
+    Returns:
+        DataFrame: source, target, endpoint coordinates and weight, heaviest first.
+    """
+    coordinates = links[['start_lat', 'start_lon', 'end_lat', 'end_lon']].dropna().to_numpy(dtype=np.float64)
+    if not directed and len(coordinates):
+        # Order each pair's endpoints so both directions land on the same key
+        swap = (coordinates[:, 0] > coordinates[:, 2]) | (
+            (coordinates[:, 0] == coordinates[:, 2]) & (coordinates[:, 1] > coordinates[:, 3]))
+        coordinates[swap] = coordinates[swap][:, [2, 3, 0, 1]]
+    # Self-links carry no collaboration between countries
+    coordinates = coordinates[(coordinates[:, 0] != coordinates[:, 2]) | (coordinates[:, 1] != coordinates[:, 3])]
+
+    flows = (
+        pd.DataFrame(coordinates, columns=['start_lat', 'start_lon', 'end_lat', 'end_lon'])
+        .groupby(['start_lat', 'start_lon', 'end_lat', 'end_lon'], sort=False)
+        .size()
+        .reset_index(name='weight')
+    )
+    if nodes is not None and len(nodes):
+        names = nodes.drop_duplicates(['latitude', 'longitude']).set_index(['latitude', 'longitude'])['Country']
+        flows['source'] = names.reindex(pd.MultiIndex.from_frame(flows[['start_lat', 'start_lon']])).to_numpy()
+        flows['target'] = names.reindex(pd.MultiIndex.from_frame(flows[['end_lat', 'end_lon']])).to_numpy()
+    else:
+        flows['source'] = None
+        flows['target'] = None
+    return flows.sort_values('weight', ascending=False, ignore_index=True)[FLOW_COLUMNS]
+
+## ---------------country nodes and collaboration flows---------------
+
+
+## ---------------offline country geocoding---------------
+# Country names from the `Countries` field (a comma-joined list per paper, see
+# formatdata.extract_author_affiliations) are resolved against an alias index
+# built once from dataset/country-coord.csv: normalised names, alpha-2 and
+# alpha-3 codes, plus the common variants below. No network lookups are made.
+# Each batch of papers is turned into node and flow counts in one vectorized
+# pass, and the counts are accumulated so new data is added incrementally.
+
+COUNTRY_COORD_PATH = "dataset/country-coord.csv"
+ALIAS_INDEX_PATH = "dataset/country-alias-index.json"
+NODES_PATH = "dataset/country_nodes.csv"
+FLOWS_PATH = "dataset/country_flows.csv"
+FLOW_STATE_PATH = "dataset/country_flows_state.pkl"
+
+# Variant spellings mapped to the names used in country-coord.csv. They are applied
+# after the ISO codes so they also correct the swapped Korea codes in that file.
+COUNTRY_ALIASES = {
+    'USA': 'United States', 'US': 'United States', 'United States of America': 'United States',
+    'UK': 'United Kingdom', 'GB': 'United Kingdom', 'GBR': 'United Kingdom', 'Great Britain': 'United Kingdom',
+    'England': 'United Kingdom', 'Scotland': 'United Kingdom', 'Wales': 'United Kingdom',
+    'Northern Ireland': 'United Kingdom',
+    'Russia': 'Russian Federation',
+    'KR': 'South Korea', 'KOR': 'South Korea', 'Korea': 'South Korea', 'Republic of Korea': 'South Korea',
+    'Korea, Republic of': 'South Korea', 'Korea (Republic of)': 'South Korea',
+    'KP': 'North Korea', 'PRK': 'North Korea', "Democratic People's Republic of Korea": 'North Korea',
+    'Vietnam': 'Viet Nam', 'Czechia': 'Czech Republic', 'Türkiye': 'Turkey', 'Turkiye': 'Turkey',
+    'Laos': "Lao People's Democratic Republic", 'Brunei': 'Brunei Darussalam',
+    'Syria': 'Syrian Arab Republic', 'Libya': 'Libyan Arab Jamahiriya', 'North Macedonia': 'Macedonia',
+    'Eswatini': 'Swaziland', 'Palestine': 'Palestinian', 'State of Palestine': 'Palestinian',
+    'Macau': 'Macao', 'Ivory Coast': "Côte d'Ivoire", 'Cabo Verde': 'Cape Verde',
+    'Democratic Republic of the Congo': 'Congo', 'Republic of the Congo': 'Congo',
+    'Vatican': 'Holy See (Vatican City State)', 'Vatican City': 'Holy See (Vatican City State)',
+    'Iran, Islamic Republic of': 'Iran', 'Tanzania, United Republic of': 'Tanzania',
+    'Moldova, Republic of': 'Moldova', 'Taiwan, Province of China': 'Taiwan', 'Burma': 'Myanmar',
+    'East Timor': 'Timor-Leste', 'Hong Kong SAR': 'Hong Kong',
+}
+
+
+def normalize_country_name(name):
+    """Case-fold, strip accents and punctuation, and collapse whitespace."""
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    name = re.sub(r"[^a-z0-9]+", " ", name.casefold()).strip()
+    return re.sub(r"^the ", "", name)
+
+
+class CountryAliasIndex:
+    """
+    Offline lookup from country names and ISO codes to coordinates.
+    """
+
+    def __init__(self, countries, aliases):
+        """
+        :param countries: DataFrame with Country, latitude and longitude, one row per country id.
+        :param aliases: Mapping of normalised alias to country id.
+        """
+        self.countries = countries.reset_index(drop=True)
+        self.aliases = aliases
+
+    @classmethod
+    def build(cls, coord_path=COUNTRY_COORD_PATH, extra_aliases=COUNTRY_ALIASES):
+        """
+        Build the index from country-coord.csv.
+
+        :param coord_path: CSV with Country, Alpha-2 code, Alpha-3 code, latitude and longitude.
+        :param extra_aliases: Mapping of variant spelling to a Country name in the CSV.
+        :return: The CountryAliasIndex.
+        """
+        records = pd.read_csv(coord_path, keep_default_na=False, na_values=[''])
+        # Duplicate names (e.g. the two Congos) share one node, as in the original lookup
+        countries = records.drop_duplicates('Country')[['Country', 'latitude', 'longitude']].reset_index(drop=True)
+        ids = pd.Series(countries.index, index=countries['Country'])
+        aliases = {}
+        for column in ('Alpha-3 code', 'Alpha-2 code', 'Country'):
+            for value, country in zip(records[column], records['Country']):
+                if isinstance(value, str) and value:
+                    aliases[normalize_country_name(value)] = int(ids[country])
+        for alias, country in extra_aliases.items():
+            if country in ids.index:
+                aliases[normalize_country_name(alias)] = int(ids[country])
+        return cls(countries, aliases)
+
+    def save(self, path=ALIAS_INDEX_PATH):
+        """Write the index as JSON."""
+        with open(path, "w") as f:
+            json.dump({'countries': self.countries.to_dict('list'), 'aliases': self.aliases}, f)
+
+    @classmethod
+    def load(cls, path=ALIAS_INDEX_PATH):
+        """Read an index written by ``save``."""
+        with open(path, "r") as f:
+            payload = json.load(f)
+        return cls(pd.DataFrame(payload['countries']), payload['aliases'])
+
+    def resolve(self, names):
+        """
+        Resolve country names to country ids.
+
+        :param names: Array-like of raw names.
+        :return: int64 array of country ids, -1 where a name is unknown.
+        """
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=True)
+        # Only the distinct names are normalised and looked up
+        lookup = np.array([self.aliases.get(normalize_country_name(name), -1) for name in uniques] + [-1],
+                          dtype=np.int64)
+        return lookup[codes]
+
+    @property
+    def fingerprint(self):
+        """Hash of the country table and aliases; counts keyed by country id are only valid for the same index."""
+        payload = json.dumps({'countries': self.countries.to_dict('list'), 'aliases': self.aliases}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def __len__(self):
+        return len(self.countries)
+
+
+def load_alias_index(index_path=ALIAS_INDEX_PATH, coord_path=COUNTRY_COORD_PATH):
+    """
+    Load the prebuilt alias index, rebuilding it when it is missing or older than the coordinates CSV.
+
+    Returns:
+        CountryAliasIndex: The index.
+    """
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(coord_path):
+        return CountryAliasIndex.load(index_path)
+    index = CountryAliasIndex.build(coord_path)
+    index.save(index_path)
+    return index
+
+
+def explode_countries(countries):
+    """
+    Split comma-joined country lists into one row per mention.
+
+    Parameters:
+        countries (Series): The `Countries` field, one entry per paper.
+
+    Returns:
+        tuple: (paper position array, stripped name array), empty names removed.
+    """
+    lists = pd.Series(countries, dtype=object).fillna('').astype(str).str.split(',')
+    paper = np.repeat(np.arange(len(lists)), lists.str.len().to_numpy())
+    names = lists.explode().str.strip().to_numpy(dtype=object)
+    keep = names != ''
+    return paper[keep], names[keep]
+
+
+def count_country_links(countries, alias_index):
+    """
+    Count publications per country and co-authoring papers per country pair in one pass.
+
+    Parameters:
+        countries (Series): The `Countries` field, one entry per paper.
+        alias_index (CountryAliasIndex): Resolves names to country ids.
+
+    Returns:
+        tuple: (publications per country id array, Series of pair weights indexed by
+        a * n_countries + b with a < b, Series of unresolved name counts)
+    """
+    n_countries = len(alias_index)
+    paper, names = explode_countries(countries)
+    ids = alias_index.resolve(names)
+    unresolved = pd.Series(names[ids < 0]).value_counts()
+
+    # A paper counts once per country, however many of its authors are based there
+    mentions = pd.DataFrame({'paper': paper[ids >= 0], 'country': ids[ids >= 0]}).drop_duplicates()
+    publications = np.bincount(mentions['country'].to_numpy(), minlength=n_countries)
+
+    pairs = mentions.merge(mentions, on='paper', suffixes=('_a', '_b'))
+    pairs = pairs[pairs['country_a'] < pairs['country_b']]
+    keys = pairs['country_a'].to_numpy(dtype=np.int64) * n_countries + pairs['country_b'].to_numpy(dtype=np.int64)
+    return publications, pd.Series(keys).value_counts(), unresolved
+
+
+class CountryFlowBuilder:
+    """
+    Accumulates country node and flow counts across batches of papers.
+    """
+
+    def __init__(self, alias_index):
+        """
+        :param alias_index: CountryAliasIndex used to resolve names.
+        """
+        self.alias_index = alias_index
+        self.index_fingerprint = alias_index.fingerprint
+        self.publications = np.zeros(len(alias_index), dtype=np.int64)
+        self.pair_weights = pd.Series(dtype=np.int64)
+        self.unresolved = pd.Series(dtype=np.int64)
+        self.n_papers = 0
+        # Highest Mongo _id already counted, so reruns only read newer documents
+        self.watermark = None
+
+    def update(self, countries, watermark=None):
+        """
+        Add a batch of papers.
+
+        :param countries: The `Countries` field of the batch.
+        :param watermark: Optional position of the batch in its source (e.g. its highest _id); the highest seen is kept.
+        :return: self
+        """
+        publications, pair_weights, unresolved = count_country_links(countries, self.alias_index)
+        self.publications += publications
+        self.pair_weights = self.pair_weights.add(pair_weights, fill_value=0).astype(np.int64)
+        self.unresolved = self.unresolved.add(unresolved, fill_value=0).astype(np.int64)
+        self.n_papers += len(countries)
+        if watermark is not None and (self.watermark is None or watermark > self.watermark):
+            self.watermark = watermark
+        return self
+
+    def nodes(self):
+        """Node table (NODE_COLUMNS) of every country with at least one publication."""
+        present = np.flatnonzero(self.publications)
+        nodes = self.alias_index.countries.iloc[present].copy()
+        nodes['publications'] = self.publications[present]
+        return nodes.sort_values('publications', ascending=False, ignore_index=True)[NODE_COLUMNS]
+
+    def flows(self):
+        """Flow table (FLOW_COLUMNS) with one row per co-authoring country pair."""
+        countries = self.alias_index.countries
+        keys = self.pair_weights.index.to_numpy(dtype=np.int64)
+        source, target = keys // len(countries), keys % len(countries)
+        flows = pd.DataFrame({
+            'source': countries['Country'].to_numpy()[source],
+            'target': countries['Country'].to_numpy()[target],
+            'start_lat': countries['latitude'].to_numpy()[source],
+            'start_lon': countries['longitude'].to_numpy()[source],
+            'end_lat': countries['latitude'].to_numpy()[target],
+            'end_lon': countries['longitude'].to_numpy()[target],
+            'weight': self.pair_weights.to_numpy(dtype=np.int64),
+        })
+        return flows.sort_values('weight', ascending=False, ignore_index=True)[FLOW_COLUMNS]
+
+    def save(self, path=FLOW_STATE_PATH):
+        """Persist the accumulated counts (the alias index is not stored)."""
+        state = {key: value for key, value in self.__dict__.items() if key != 'alias_index'}
+        with open(path, "wb") as f:
+            pickle.dump(state, f)
+
+    @classmethod
+    def load(cls, alias_index, path=FLOW_STATE_PATH):
+        """Restore counts saved by ``save``; start empty when there are none or they were built with another index."""
+        builder = cls(alias_index)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            # Publication rows and pair keys are country ids, which change with the index
+            if state.get('index_fingerprint') == builder.index_fingerprint:
+                builder.__dict__.update(state)
+            else:
+                print("The country alias index changed since the counts were saved; recounting every paper.")
+        return builder
+
+    def write(self, nodes_path=NODES_PATH, flows_path=FLOWS_PATH):
+        """Write the node and flow tables read by the Mapping page."""
+        self.nodes().to_csv(nodes_path, index=False)
+        self.flows().to_csv(flows_path, index=False)
+
+## ---------------offline country geocoding---------------
+
+
+def main(argv=None):
+    """Command line entry point: (re)build the alias index or update the node and flow tables."""
+    parser = argparse.ArgumentParser(description="Offline country geocoding and collaboration flows")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build-index", help="Build the country alias index from country-coord.csv")
+    update_parser = subparsers.add_parser("update", help="Count new papers into the node and flow tables")
+    update_parser.add_argument("--csv", default=None, help="Read a CSV instead of Mongo (always a full rebuild)")
+    update_parser.add_argument("--collection", default="data")
+    update_parser.add_argument("--column", default="Countries")
+    update_parser.add_argument("--chunk-size", type=int, default=50000)
+    update_parser.add_argument("--rebuild", action="store_true", help="Discard the saved counts first")
+    args = parser.parse_args(argv)
+
+    if args.command == "build-index":
+        index = CountryAliasIndex.build()
+        index.save()
+        print(f"Wrote {len(index.aliases)} aliases for {len(index)} countries to {ALIAS_INDEX_PATH}")
+        return 0
+
+    alias_index = load_alias_index()
+    if args.csv:
+        builder = CountryFlowBuilder(alias_index)
+        for chunk in pd.read_csv(args.csv, usecols=[args.column], chunksize=args.chunk_size):
+            builder.update(chunk[args.column])
+    else:
+        from bson import ObjectId
+        from app.data_collection.db import MongoDBHandler
+        builder = CountryFlowBuilder(alias_index) if args.rebuild else CountryFlowBuilder.load(alias_index)
+        query = {'_id': {'$gt': ObjectId(builder.watermark)}} if builder.watermark else None
+        # Read in _id order so the watermark is the highest _id counted, whatever the natural order
+        for records in MongoDBHandler().iter_chunks(args.collection, args.chunk_size, projection={args.column: 1},
+                                                    query=query, sort=[('_id', 1)]):
+            chunk = pd.DataFrame.from_records(records).reindex(columns=['_id', args.column])
+            builder.update(chunk[args.column], watermark=str(max(chunk['_id'])))
+        builder.save()
+    builder.write()
+    print(f"{builder.n_papers} papers: {len(builder.nodes())} countries, {len(builder.pair_weights)} flows, "
+          f"{int(builder.unresolved.sum())} unresolved mentions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
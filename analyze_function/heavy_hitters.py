@@ -0,0 +1,426 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+## ---------------streaming top-k counting---------------
+# Counters consume one chunk at a time, so only a chunk worth of exploded values
+# is ever materialised. Every counter supports ``merge`` so chunks can be counted
+# in parallel and the partial results combined afterwards.
+
+
+# Function to turn a chunk of comma separated values into per-value counts
+def count_chunk(values, sep=','):
+    """
+    Count the values of one chunk.
+
+    Parameters:
+        values (Series | list): Raw column values, e.g. "NSTDA,Thailand Research Fund".
+        sep (str): Separator between values in a cell. None counts whole cells.
+
+    Returns:
+        Series: Count per distinct non-empty value in the chunk.
+    """
+    values = pd.Series(values, dtype=object).dropna().astype(str)
+    if sep is not None:
+        values = values.str.split(sep).explode()
+    values = values.str.strip()
+    values = values[values != '']
+    return values.value_counts(sort=False)
+
+
+class ExactTopK:
+    """
+    Exact counter over dictionary-encoded values.
+    """
+
+    def __init__(self, sep=','):
+        """
+        Initialize the counter.
+
+        :param sep: Separator between values in a cell. None counts whole cells.
+        """
+        self.sep = sep
+        self.vocabulary = {}  # value -> id
+        self.values = []  # id -> value
+        self.counts = np.zeros(1024, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _encode(self, keys):
+        """Map values to ids, adding unseen values to the dictionary."""
+        vocabulary = self.vocabulary
+        ids = np.fromiter((vocabulary.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        unseen = np.flatnonzero(ids < 0)
+        for position in unseen:
+            key = keys[position]
+            ids[position] = vocabulary[key] = len(self.values)
+            self.values.append(key)
+        if len(self.values) > len(self.counts):
+            grown = np.zeros(max(len(self.values), 2 * len(self.counts)), dtype=np.int64)
+            grown[:len(self.counts)] = self.counts
+            self.counts = grown
+        return ids
+
+    def add_counts(self, chunk_counts):
+        """
+        Add precomputed per-value counts.
+
+        :param chunk_counts: Series of counts indexed by value.
+        """
+        if len(chunk_counts) == 0:
+            return self
+        ids = self._encode(chunk_counts.index.tolist())
+        np.add.at(self.counts, ids, chunk_counts.to_numpy(dtype=np.int64))
+        return self
+
+    def update(self, values):
+        """
+        Count one chunk of raw column values.
+
+        :param values: Series or list of raw cells.
+        """
+        return self.add_counts(count_chunk(values, self.sep))
+
+    def merge(self, other):
+        """
+        Merge the counts of another ExactTopK into this one.
+
+        :param other: Counter built over a different set of chunks.
+        """
+        return self.add_counts(other.to_series())
+
+    def to_series(self):
+        """Return every count as a Series indexed by value."""
+        return pd.Series(self.counts[:len(self.values)], index=pd.Index(self.values, dtype=object), dtype=np.int64)
+
+    def top(self, k=10):
+        """
+        Return the ``k`` most frequent values.
+
+        :param k: Number of values to return.
+        :return: Series of counts sorted in descending order.
+        """
+        counts = self.counts[:len(self.values)]
+        if len(counts) > k:
+            candidates = np.argpartition(-counts, k - 1)[:k]
+        else:
+            candidates = np.arange(len(counts))
+        order = candidates[np.lexsort((candidates, -counts[candidates]))]
+        return pd.Series(counts[order], index=pd.Index([self.values[i] for i in order], dtype=object), dtype=np.int64)
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch giving upper-bound frequency estimates in fixed memory.
+    """
+
+    def __init__(self, width=2 ** 16, depth=4, seed=42):
+        """
+        Initialize the sketch.
+
+        :param width: Number of counters per row.
+        :param depth: Number of hash rows.
+        :param seed: Seed for the per-row hash keys; sketches must share it to be merged.
+        """
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.hash_keys = [''.join(rng.choice(list('0123456789abcdef'), size=16)) for _ in range(depth)]
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _buckets(self, keys):
+        keys = np.asarray(keys, dtype=object)
+        return [pd.util.hash_array(keys, hash_key=hash_key) % np.uint64(self.width) for hash_key in self.hash_keys]
+
+    def add_counts(self, chunk_counts):
+        """
+        Add precomputed per-value counts.
+
+        :param chunk_counts: Series of counts indexed by value.
+        """
+        if len(chunk_counts) == 0:
+            return self
+        weights = chunk_counts.to_numpy(dtype=np.int64)
+        for row, buckets in enumerate(self._buckets(chunk_counts.index.to_numpy())):
+            np.add.at(self.table[row], buckets.astype(np.int64), weights)
+        return self
+
+    def estimate(self, keys):
+        """
+        Estimate the counts of ``keys``; estimates never undercount.
+
+        :param keys: Values to look up.
+        :return: Array of estimated counts.
+        """
+        if len(keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        rows = [self.table[row][buckets.astype(np.int64)] for row, buckets in enumerate(self._buckets(keys))]
+        return np.min(rows, axis=0)
+
+    def merge(self, other):
+        """
+        Add the counters of a sketch built with the same width, depth and seed.
+        """
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("Count-Min sketches must share width, depth and seed to be merged.")
+        self.table += other.table
+        return self
+
+
+class SpaceSavingTopK:
+    """
+    Approximate top-k with a Space-Saving summary refined by a Count-Min sketch.
+
+    The summary keeps at most ``capacity`` candidate values. Reported counts are
+    upper bounds that exceed the true count by at most the recorded error.
+    """
+
+    def __init__(self, capacity=1000, sep=',', width=2 ** 16, depth=4, seed=42):
+        """
+        Initialize the counter.
+
+        :param capacity: Maximum number of candidate values kept in memory.
+        :param sep: Separator between values in a cell. None counts whole cells.
+        :param width: Width of the Count-Min sketch.
+        :param depth: Depth of the Count-Min sketch.
+        :param seed: Hash seed of the Count-Min sketch.
+        """
+        self.capacity = capacity
+        self.sep = sep
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.sketch = CountMinSketch(width=width, depth=depth, seed=seed)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _floor(self):
+        """Smallest tracked count once the summary is full, 0 otherwise."""
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def _combine(self, counts, errors, floor):
+        """Merge another summary into this one (the mergeable Space-Saving rule)."""
+        own_floor = self._floor()
+        index = self.counts.index.union(counts.index)
+        merged_counts = (self.counts.reindex(index, fill_value=own_floor)
+                         + counts.reindex(index, fill_value=floor))
+        merged_errors = (self.errors.reindex(index, fill_value=own_floor)
+                         + errors.reindex(index, fill_value=floor))
+        if len(merged_counts) > self.capacity:
+            keep = merged_counts.nlargest(self.capacity, keep='first').index
+            merged_counts = merged_counts.loc[keep]
+            merged_errors = merged_errors.loc[keep]
+        self.counts = merged_counts.astype(np.int64)
+        self.errors = merged_errors.astype(np.int64)
+        return self
+
+    def add_counts(self, chunk_counts):
+        """
+        Add precomputed per-value counts.
+
+        :param chunk_counts: Series of counts indexed by value.
+        """
+        if len(chunk_counts) == 0:
+            return self
+        chunk_counts = chunk_counts.astype(np.int64)
+        self.sketch.add_counts(chunk_counts)
+        return self._combine(chunk_counts, pd.Series(0, index=chunk_counts.index, dtype=np.int64), 0)
+
+    def update(self, values):
+        """
+        Count one chunk of raw column values.
+
+        :param values: Series or list of raw cells.
+        """
+        return self.add_counts(count_chunk(values, self.sep))
+
+    def merge(self, other):
+        """
+        Merge another SpaceSavingTopK built over a different set of chunks.
+        """
+        self.sketch.merge(other.sketch)
+        return self._combine(other.counts, other.errors, other._floor())
+
+    def top(self, k=10):
+        """
+        Return the ``k`` values with the highest estimated counts.
+
+        :param k: Number of values to return.
+        :return: Series of estimated counts sorted in descending order.
+        """
+        if len(self.counts) == 0:
+            return pd.Series(dtype=np.int64)
+        estimates = np.minimum(self.counts.to_numpy(), self.sketch.estimate(self.counts.index.to_numpy()))
+        estimates = pd.Series(estimates, index=self.counts.index, dtype=np.int64)
+        return estimates.sort_values(ascending=False, kind='stable').head(k)
+
+
+def make_counter(mode='exact', sep=',', capacity=1000):
+    """
+    Create a streaming counter.
+
+    Parameters:
+        mode (str): 'exact' for ExactTopK, 'approx' for SpaceSavingTopK.
+        sep (str): Separator between values in a cell.
+        capacity (int): Candidate capacity of the approximate counter.
+
+    Returns:
+        ExactTopK | SpaceSavingTopK: An empty counter.
+    """
+    if mode == 'exact':
+        return ExactTopK(sep=sep)
+    if mode == 'approx':
+        return SpaceSavingTopK(capacity=capacity, sep=sep)
+    raise ValueError(f"Unknown counting mode: {mode}. Use 'exact' or 'approx'.")
+
+
+## ---------------chunk sources---------------
+# Function to iterate over a DataFrame column in chunks
+def iter_frame_chunks(data, column_name, chunk_size=50000):
+    for start in range(0, len(data), chunk_size):
+        yield data[column_name].iloc[start:start + chunk_size]
+
+
+# Function to iterate over a MongoDB collection field in chunks
+def iter_mongo_chunks(db_handler, collection_name, column_name, chunk_size=50000, query=None):
+    for records in db_handler.iter_chunks(collection_name, chunk_size=chunk_size,
+                                          projection={column_name: 1, '_id': 0}, query=query):
+        yield pd.Series([record.get(column_name) for record in records], dtype=object)
+
+
+# Function to iterate over a Parquet column in record batches
+def iter_parquet_chunks(file_path, column_name, chunk_size=50000):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=[column_name]):
+        yield batch.column(0).to_pandas()
+
+
+## ---------------top-k entry points---------------
+def _count_one_chunk(args):
+    values, mode, sep, capacity = args
+    return make_counter(mode, sep, capacity).update(values)
+
+
+def stream_top_k(chunks, top_n=10, mode='exact', sep=',', capacity=1000, n_workers=1):
+    """
+    Find the most frequent values in one pass over a stream of chunks.
+
+    Parameters:
+        chunks (iterable): Chunks of raw cells (Series or lists).
+        top_n (int): Number of values to return.
+        mode (str): 'exact' or 'approx'.
+        sep (str): Separator between values in a cell. None counts whole cells.
+        capacity (int): Candidate capacity of the approximate counter.
+        n_workers (int): Count chunks in this many processes and merge the partial results.
+
+    Returns:
+        Series: The ``top_n`` values with their counts, most frequent first.
+    """
+    counter = make_counter(mode, sep, capacity)
+    if n_workers <= 1:
+        for chunk in chunks:
+            counter.update(chunk)
+        return counter.top(top_n)
+
+    # Keep at most two chunks per worker in flight so memory stays bounded by the chunk size
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(_count_one_chunk, (chunk, mode, sep, capacity)))
+            if len(pending) >= 2 * n_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counter.merge(future.result())
+        for future in as_completed(pending):
+            counter.merge(future.result())
+    return counter.top(top_n)
+
+
+# Function to get the top N values of a comma separated column without exploding it all at once
+def top_values(data, column_name='Funding Agencies', top_n=10, mode='exact', chunk_size=50000):
+    return stream_top_k(iter_frame_chunks(data, column_name, chunk_size), top_n=top_n, mode=mode)
+
+## ---------------streaming top-k counting---------------
+
+
+## ---------------top values table---------------
+# The pipeline counts the top keywords and journals straight from MongoDB (or a
+# Parquet snapshot of it) into a small JSON table, so nothing has to load and
+# explode the whole column to draw them.
+
+TOP_VALUES_PATH = os.getenv("TOP_VALUES_PATH", os.path.join("dataset", "top_values.json"))
+# Counted columns and their separators; None counts whole cells (one journal per paper)
+TOP_VALUE_COLUMNS = {
+    'auth-keywords': ',',
+    'prism:publicationName': None,
+}
+
+
+# Function to count the top values of every column in TOP_VALUE_COLUMNS from one source
+def count_top_values(open_chunks, top_n=50, mode='exact', n_workers=1):
+    """
+    Count the top values of each column in TOP_VALUE_COLUMNS.
+
+    Parameters:
+        open_chunks (callable): Called with a column name; returns an iterator of chunks of that column.
+        top_n (int): Number of values kept per column.
+        mode (str): 'exact' or 'approx'.
+        n_workers (int): Worker processes per column.
+
+    Returns:
+        dict: Column name -> list of [value, count] pairs, most frequent first.
+    """
+    table = {}
+    for column_name, sep in TOP_VALUE_COLUMNS.items():
+        top = stream_top_k(open_chunks(column_name), top_n=top_n, mode=mode, sep=sep, n_workers=n_workers)
+        table[column_name] = [[str(value), int(count)] for value, count in top.items()]
+    return table
+
+## ---------------top values table---------------
+
+
+def main(argv=None):
+    """Command line entry point: write the top keyword and journal table."""
+    parser = argparse.ArgumentParser(description="Streaming top-k counts of keywords and journals")
+    parser.add_argument("--parquet", default=None, help="Read a Parquet snapshot instead of Mongo")
+    parser.add_argument("--collection", default="data")
+    parser.add_argument("--output", default=TOP_VALUES_PATH)
+    parser.add_argument("--top-n", type=int, default=50)
+    parser.add_argument("--mode", default="exact", choices=["exact", "approx"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    if args.parquet:
+        source = args.parquet
+        open_chunks = lambda column_name: iter_parquet_chunks(args.parquet, column_name, args.chunk_size)
+    else:
+        from app.data_collection.db import MongoDBHandler
+        db_handler = MongoDBHandler()
+        source = f"mongo:{args.collection}"
+        open_chunks = lambda column_name: iter_mongo_chunks(db_handler, args.collection, column_name, args.chunk_size)
+
+    table = count_top_values(open_chunks, top_n=args.top_n, mode=args.mode, n_workers=args.workers)
+    output = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "mode": args.mode,
+        "columns": table,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=4)
+    print(f"Wrote the top {args.top_n} values of {', '.join(table)} to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import os
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from analyze_function.cache import analysis_cache
+
+## ---------------k selection---------------
+# Fits one clustering per candidate k in a thread pool. Threads share the one
+# vectorized matrix, so no worker receives a copy of it; silhouette is scored on
+# a sample stratified by cluster so every cluster is represented.
+
+
+def matrix_fingerprint(X):
+    """Return a content hash of a dense or sparse matrix."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(X.shape).encode())
+    if sp.issparse(X):
+        X = sp.csr_matrix(X)
+        arrays = (X.indptr, X.indices, X.data)
+    else:
+        arrays = (np.asarray(X),)
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+# Function to draw a sample with the same share of rows from every cluster
+def stratified_sample_indices(labels, sample_size=5000, random_state=42):
+    """
+    Sample row indices proportionally to cluster sizes.
+
+    Parameters:
+        labels (ndarray): Cluster id of every row.
+        sample_size (int): Total number of rows to sample.
+        random_state (int): Seed of the sampler.
+
+    Returns:
+        ndarray: Sorted row indices, at least two per cluster when available.
+    """
+    labels = np.asarray(labels)
+    if len(labels) <= sample_size:
+        return np.arange(len(labels))
+    rng = np.random.default_rng(random_state)
+    clusters, counts = np.unique(labels, return_counts=True)
+    quotas = np.maximum(np.round(counts * sample_size / len(labels)).astype(int), 2)
+    quotas = np.minimum(quotas, counts)
+    picked = [rng.choice(np.flatnonzero(labels == cluster), size=quota, replace=False)
+              for cluster, quota in zip(clusters, quotas)]
+    return np.sort(np.concatenate(picked))
+
+
+def _fit_one(X, k, sample_size, random_state, minibatch):
+    """Fit one clustering and score it; runs in a worker thread."""
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+    start = time.perf_counter()
+    if minibatch:
+        model = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3)
+    else:
+        model = KMeans(n_clusters=k, random_state=random_state)
+    labels = model.fit_predict(X)
+    fit_seconds = time.perf_counter() - start
+
+    sample = stratified_sample_indices(labels, sample_size, random_state)
+    if len(np.unique(labels[sample])) > 1:
+        silhouette = silhouette_score(X[sample], labels[sample])
+    else:
+        silhouette = np.nan
+    return {
+        'k': k,
+        'inertia': float(model.inertia_),
+        'silhouette': float(silhouette),
+        'fit_seconds': fit_seconds,
+    }, model
+
+
+def find_elbow(k_values, inertias):
+    """
+    Locate the elbow of an inertia curve.
+
+    Parameters:
+        k_values (array): Candidate numbers of clusters, ascending.
+        inertias (array): Inertia of every candidate.
+
+    Returns:
+        int: The k farthest from the straight line joining the first and last points.
+    """
+    k_values = np.asarray(k_values, dtype=float)
+    inertias = np.asarray(inertias, dtype=float)
+    if len(k_values) < 3:
+        return int(k_values[0])
+    x = (k_values - k_values[0]) / (k_values[-1] - k_values[0])
+    span = inertias[0] - inertias[-1]
+    y = (inertias - inertias[-1]) / span if span else np.zeros_like(inertias)
+    # Distance to the chord from (0, 1) to (1, 0)
+    distance = np.abs(x + y - 1) / np.sqrt(2)
+    return int(k_values[distance.argmax()])
+
+
+class KSweepResult:
+    """
+    Scores of a k sweep with the fitted models.
+    """
+
+    def __init__(self, scores, models):
+        """
+        :param scores: DataFrame with k, inertia, silhouette and fit_seconds per candidate.
+        :param models: Mapping of k to the fitted clustering model.
+        """
+        self.scores = scores
+        self.models = models
+
+    @property
+    def best_k(self):
+        """k with the highest sampled silhouette score."""
+        return int(self.scores.loc[self.scores['silhouette'].idxmax(), 'k'])
+
+    @property
+    def elbow_k(self):
+        """k at the elbow of the inertia curve."""
+        return find_elbow(self.scores['k'], self.scores['inertia'])
+
+    @property
+    def best_model(self):
+        return self.models[self.best_k]
+
+
+def sweep_k(X, k_values=range(2, 16), n_jobs=-1, sample_size=5000, random_state=42, minibatch=False):
+    """
+    Fit and score one clustering per candidate k in parallel.
+
+    Parameters:
+        X (matrix): The shared vectorized matrix (sparse or dense). It is not copied.
+        k_values (iterable): Candidate numbers of clusters.
+        n_jobs (int): Worker threads; -1 uses every core.
+        sample_size (int): Rows in the stratified silhouette sample.
+        random_state (int): Seed for the clusterings and the samples.
+        minibatch (bool): Use MiniBatchKMeans, for very large matrices.
+
+    Returns:
+        KSweepResult: Scores per k and the fitted models. Results are cached per matrix
+        content and parameters.
+    """
+    k_values = sorted(set(int(k) for k in k_values if 1 < k < X.shape[0]))
+    key = hashlib.blake2b(repr(("sweep_k", matrix_fingerprint(X), k_values, sample_size, random_state,
+                                minibatch)).encode(), digest_size=16).hexdigest()
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        return cached
+
+    from joblib import Parallel, delayed
+    from threadpoolctl import threadpool_limits
+    n_workers = os.cpu_count() if n_jobs in (None, -1) else max(int(n_jobs), 1)
+    n_workers = min(n_workers, len(k_values)) or 1
+    # Split the cores between workers so the native k-means threads do not oversubscribe them
+    with threadpool_limits(limits=max((os.cpu_count() or 1) // n_workers, 1)):
+        outcomes = Parallel(n_jobs=n_workers, prefer="threads")(
+            delayed(_fit_one)(X, k, sample_size, random_state, minibatch) for k in k_values
+        )
+    scores = pd.DataFrame([score for score, _ in outcomes])
+    models = {score['k']: model for score, model in outcomes}
+    result = KSweepResult(scores, models)
+    analysis_cache.put(key, result)
+    return result
+
+
+def plot_k_sweep(result):
+    """
+    Plot the elbow (inertia) and silhouette curves of a k sweep.
+
+    Parameters:
+        result (KSweepResult): The sweep to plot.
+
+    Returns:
+        Figure: Inertia and silhouette against k, with the suggested values marked.
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    scores = result.scores
+    fig = make_subplots(rows=1, cols=2, subplot_titles=("Inertia (Elbow)", "Sampled Silhouette Score"))
+    fig.add_trace(go.Scatter(x=scores['k'], y=scores['inertia'], mode='lines+markers', name='Inertia'),
+                  row=1, col=1)
+    fig.add_trace(go.Scatter(x=scores['k'], y=scores['silhouette'], mode='lines+markers', name='Silhouette'),
+                  row=1, col=2)
+    fig.add_vline(x=result.elbow_k, line=dict(color='purple', dash='dash'), row=1, col=1,
+                  annotation_text=f"elbow k={result.elbow_k}")
+    fig.add_vline(x=result.best_k, line=dict(color='green', dash='dash'), row=1, col=2,
+                  annotation_text=f"best k={result.best_k}")
+    fig.update_xaxes(title_text="Number of Clusters (k)", dtick=1)
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+## ---------------k selection---------------
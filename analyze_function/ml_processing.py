@@ -1,137 +1,649 @@
-import streamlit as st
-import time
+import json
 import numpy as np
 import pandas as pd
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import networkx as nx
-from collections import Counter
+import scipy.sparse as sp
+from analyze_function.projection import SparseProjection, iter_row_chunks
+from analyze_function.model_registry import ModelRegistry
+from analyze_function.profiling import profiled
 
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-import plotly.express as px
-import numpy as np
+# scikit-learn and plotly are imported where they are used, so pages that only
+# read prebuilt artifacts do not pay for them at startup
+
+# Predefined categories with associated keywords used to auto-label clusters
+CATEGORY_KEYWORDS = {
+    'Computer Science': [
+        'Artificial Intelligence (AI)', 'Machine Learning (ML)', 'Deep Learning', 
+        'Neural Networks', 'Natural Language Processing (NLP)', 'Computer Vision', 
+        'Robotics', 'Data Science', 'Big Data', 'Data Mining', 'Cloud Computing', 
+        'Cybersecurity', 'Blockchain Technology', 'Software Engineering', 
+        'Human-Computer Interaction (HCI)', 'Quantum Computing', 'Internet of Things (IoT)', 
+        'Augmented Reality (AR)', 'Virtual Reality (VR)', 'Edge Computing', 
+        'Distributed Systems', 'Algorithm Design', 'Software Development', 'Predictive Analytics'
+    ],
+    'Engineering': [
+        'Mechanical Engineering', 'Civil Engineering', 'Electrical Engineering', 
+        'Aerospace Engineering', 'Nanotechnology', 'Biomedical Engineering', 
+        'Environmental Engineering', 'Chemical Engineering', 'Industrial Engineering', 
+        'Geotechnical Engineering', 'Structural Engineering', 'Energy Systems', 
+        'Automotive Engineering', 'Robotics Engineering', 'Control Systems', 
+        'Thermodynamics', 'Fluid Mechanics', 'Vibration Analysis', 'Materials Engineering', 
+        'Manufacturing Systems', 'Sustainable Engineering', 'Smart Infrastructure', 
+        'Additive Manufacturing (3D Printing)', 'Mechatronics', 'Power Systems'
+    ],
+    'Biology': [
+        'Genetics', 'Molecular Biology', 'Ecology', 'Neuroscience', 'Immunology', 
+        'Cell Biology', 'Microbiology', 'Biotechnology', 'Evolutionary Biology', 
+        'Pharmacology', 'Biochemistry', 'Biophysics', 'Physiology', 'Endocrinology', 
+        'Bioinformatics', 'Marine Biology', 'Plant Biology', 'Genomics', 'Proteomics', 
+        'Stem Cell Research', 'Human Biology', 'Synthetic Biology', 'Zoology', 
+        'Agricultural Biology', 'Microbial Pathogenesis', 'Human Disease Research'
+    ],
+    'Health': [
+        'Medicine', 'Public Health', 'Nursing', 'Epidemiology', 'Healthcare Management', 
+        'Health Policy', 'Medical Research', 'Pharmacology', 'Toxicology', 'Health Economics', 
+        'Mental Health', 'Global Health', 'Maternal and Child Health', 'Infectious Diseases', 
+        'Chronic Disease Management', 'Health Informatics', 'Biomedical Engineering', 
+        'Telemedicine', 'Nutritional Science', 'Healthcare Technology', 
+        'Clinical Trials', 'Medical Imaging', 'Genetic Counseling', 'Patient Care'
+    ],
+    'Physics': [
+        'Physics', 'Quantum Mechanics', 'Astrophysics', 'Material Science', 
+        'Condensed Matter Physics', 'Particle Physics', 'Theoretical Physics', 
+        'Experimental Physics', 'Optics', 'Laser Physics', 'Nuclear Physics', 
+        'Plasma Physics', 'High-Energy Physics', 'Quantum Field Theory', 
+        'Solid State Physics', 'Statistical Mechanics', 'Gravitational Physics', 
+        'String Theory', 'Fluid Dynamics', 'Nonlinear Dynamics', 'Cosmology', 
+        'Astroparticle Physics', 'Geophysics', 'Radio Frequency (RF) Physics', 
+        'Semiconductor Physics', 'Thermal Physics', 'Electromagnetism'
+    ]
+}
+
+
+# Above this many points the scatter is drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 5000
+# Above this many points the scatter is binned on the server before it is sent to the browser
+AGGREGATE_THRESHOLD = 50000
+
+
+# Function to bin points into hexagonal cells per colour group
+def hexbin_points(data, x='PCA1', y='PCA2', color='auto_label', gridsize=120, extent=None):
+    """
+    Aggregate points into hexagonal bins, keeping one row per (bin, colour group).
+
+    Parameters:
+        data (DataFrame): The points to aggregate.
+        x (str): Column of the x coordinate.
+        y (str): Column of the y coordinate.
+        color (str): Column of the colour group, e.g. 'auto_label'.
+        gridsize (int): Number of hexagons across the x range.
+        extent (tuple): (xmin, xmax, ymin, ymax); defaults to the data bounds.
+
+    Returns:
+        DataFrame: Columns x, y (hexagon centres), color and 'count'.
+    """
+    xs = data[x].to_numpy(dtype=np.float64)
+    ys = data[y].to_numpy(dtype=np.float64)
+    if len(xs) == 0:
+        return pd.DataFrame({x: [], y: [], color: [], 'count': []})
+    xmin, xmax, ymin, ymax = extent or (xs.min(), xs.max(), ys.min(), ys.max())
+    nx_cells = gridsize
+    ny_cells = max(int(gridsize / np.sqrt(3)), 1)
+    sx = (xmax - xmin) / nx_cells or 1.0
+    sy = (ymax - ymin) / ny_cells or 1.0
+
+    # Two offset rectangular lattices; each point goes to the nearest centre of either
+    ix = (xs - xmin) / sx
+    iy = (ys - ymin) / sy
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix), np.floor(iy)
+    d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+    d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+    on_first = d1 < d2
+    centre_x = np.where(on_first, xmin + ix1 * sx, xmin + (ix2 + 0.5) * sx)
+    centre_y = np.where(on_first, ymin + iy1 * sy, ymin + (iy2 + 0.5) * sy)
+
+    binned = pd.DataFrame({x: centre_x, y: centre_y, color: data[color].to_numpy()})
+    return binned.groupby([x, y, color], observed=True).size().reset_index(name='count')
 
-def analyze_category(data):
-    fig = px.scatter(data, x='PCA1', y='PCA2', color='auto_label', 
-                 hover_data={ "dc:title":True},
-                 title="Cluster Visualization with Auto-Labeling",
-                 labels={'auto_label': 'Research Field'},
-                 height=900
-                 )
 
+# Function to keep only the points inside the current view, downsampled per colour group
+def points_in_view(data, x_range=None, y_range=None, x='PCA1', y='PCA2', color='auto_label',
+                   max_points=AGGREGATE_THRESHOLD, random_state=42):
+    mask = np.ones(len(data), dtype=bool)
+    if x_range is not None:
+        mask &= data[x].between(*x_range).to_numpy()
+    if y_range is not None:
+        mask &= data[y].between(*y_range).to_numpy()
+    view = data[mask]
+    if len(view) > max_points:
+        # Sample the same fraction of every group so small fields stay visible
+        view = view.groupby(color, group_keys=False, observed=True).sample(
+            frac=max_points / len(view), random_state=random_state
+        )
+    return view
+
+
+def scatter_clusters(data, x='PCA1', y='PCA2', color='auto_label', hover_column=None,
+                     title="Cluster Visualization with Auto-Labeling", height=None,
+                     webgl_threshold=WEBGL_THRESHOLD, aggregate_threshold=AGGREGATE_THRESHOLD, gridsize=120):
+    """
+    Plot clustered points, switching rendering strategy with the number of points.
+
+    Small inputs are drawn as SVG markers, larger ones as WebGL markers, and inputs
+    above ``aggregate_threshold`` are hex-binned per colour group on the server so
+    the browser only receives one marker per occupied cell.
+
+    Parameters:
+        data (DataFrame): The points to plot.
+        hover_column (str): Column shown on hover (raw point modes only).
+        webgl_threshold (int): Point count above which WebGL traces are used.
+        aggregate_threshold (int): Point count above which points are binned.
+        gridsize (int): Hexagons across the x range when binning.
+
+    Returns:
+        Figure: The scatter plot.
+    """
+    import plotly.express as px
+    labels = {color: 'Research Field'}
+    layout = {'height': height} if height else {}
+    if len(data) > aggregate_threshold:
+        binned = hexbin_points(data, x, y, color, gridsize=gridsize)
+        binned['size'] = np.log1p(binned['count'])
+        fig = px.scatter(binned, x=x, y=y, color=color, size='size', size_max=12,
+                         hover_data={'count': True, 'size': False},
+                         title=f"{title} ({len(data):,} papers, binned)",
+                         labels=labels, render_mode='webgl', **layout)
+        fig.update_traces(marker=dict(line=dict(width=0), opacity=0.7))
+        return fig
+
+    hover_data = {hover_column: True} if hover_column and hover_column in data.columns else None
+    render_mode = 'webgl' if len(data) > webgl_threshold else 'svg'
+    return px.scatter(data, x=x, y=y, color=color, hover_data=hover_data, title=title,
+                      labels=labels, render_mode=render_mode, **layout)
+
+
+def analyze_category(data, x_range=None, y_range=None):
+    view = points_in_view(data, x_range, y_range, max_points=len(data))
+    fig = scatter_clusters(view, hover_column="dc:title", height=900)
     return fig
 
-def analyze_webscrape(df):
-    df['text'] = df['title'] + " " + df['field'] # Repeat the author keywords portion to increase weight
-    df['text'] = df['text'].fillna('')
+# Function to load a user-supplied category taxonomy (CSV with category,keyword rows or JSON {category: [keywords]})
+def load_category_taxonomy(file_path):
+    if str(file_path).endswith(".json"):
+        with open(file_path, "r") as f:
+            return {category: list(keywords) for category, keywords in json.load(f).items()}
+    taxonomy = pd.read_csv(file_path)
+    taxonomy = taxonomy.dropna(subset=['category', 'keyword'])
+    return taxonomy.groupby('category', sort=False)['keyword'].apply(list).to_dict()
 
 
-    # Vectorize the text using TF-IDF
+def label_clusters(cluster_centers, vectorizer, category_keywords=None):
+    """
+    Label every cluster with the category whose keyword prototype is closest.
+
+    All category prototypes are vectorized in one call into a sparse matrix, and the
+    distances between every cluster centre and every prototype come from a single
+    product, so large taxonomies cost one sparse-dense multiplication.
+
+    Parameters:
+        cluster_centers (ndarray): Cluster centres in the vectorizer's feature space.
+        vectorizer: The fitted vectorizer used to build the clustered matrix.
+        category_keywords (dict): Mapping of category name to a list of keywords.
+
+    Returns:
+        list: The category name of every cluster.
+    """
+    if category_keywords is None:
+        category_keywords = CATEGORY_KEYWORDS
+    categories = list(category_keywords)
+    prototypes = vectorizer.transform([' '.join(keywords) for keywords in category_keywords.values()])
+
+    # Squared Euclidean distance |c|^2 - 2 c.p + |p|^2 for every (cluster, category) pair
+    cluster_centers = np.asarray(cluster_centers)
+    center_norms = np.einsum('ij,ij->i', cluster_centers, cluster_centers)[:, None]
+    prototype_norms = np.asarray(prototypes.multiply(prototypes).sum(axis=1)).ravel()[None, :]
+    cross = np.asarray(prototypes @ cluster_centers.T).T
+    distances = center_norms - 2.0 * cross + prototype_norms
+    return [categories[i] for i in distances.argmin(axis=1)]
+
+
+# Name under which the fitted clustering pipeline is saved in the model registry
+CLUSTER_MODEL_NAME = "webscrape_clusters"
+
+
+# Function to join text columns into the clustered text; missing values only drop their own column
+def join_text_columns(df, columns=('title', 'field')):
+    texts = df[columns[0]].fillna('').astype(str)
+    for column in columns[1:]:
+        texts = texts + " " + df[column].fillna('').astype(str)
+    return texts
+
+
+class ClusterModel:
+    """
+    The fitted analyze_webscrape pipeline: vectorizer, cluster model, 2-D projection and label map.
+    """
+
+    def __init__(self, vectorizer, kmeans, projection, cluster_labels, text_columns=('title', 'field')):
+        """
+        Initialize the model from fitted components.
+
+        :param vectorizer: Fitted object with a ``transform(texts)`` method.
+        :param kmeans: Fitted clustering model with a ``predict`` method.
+        :param projection: Fitted SparseProjection.
+        :param cluster_labels: Category name of every cluster id.
+        :param text_columns: Columns concatenated into the clustered text.
+        """
+        self.vectorizer = vectorizer
+        self.kmeans = kmeans
+        self.projection = projection
+        self.cluster_labels = list(cluster_labels)
+        self.text_columns = list(text_columns)
+
+    def texts(self, df):
+        """Concatenate the text columns of ``df`` into the clustered text."""
+        return join_text_columns(df, self.text_columns)
+
+    def score_matrix(self, X, chunk_size=100000):
+        """
+        Assign clusters, labels and 2-D coordinates to vectorized rows.
+
+        :param X: Matrix produced by the model's vectorizer.
+        :param chunk_size: Rows projected per chunk.
+        :return: DataFrame with cluster, auto_label, PCA1 and PCA2.
+        """
+        clusters = self.kmeans.predict(X)
+        coordinates = np.vstack(list(self.projection.transform_chunks(iter_row_chunks(X, chunk_size))))
+        return pd.DataFrame({
+            'cluster': clusters,
+            'auto_label': np.asarray(self.cluster_labels, dtype=object)[clusters],
+            'PCA1': coordinates[:, 0],
+            'PCA2': coordinates[:, 1],
+        })
+
+    def predict(self, df, chunk_size=100000):
+        """
+        Score new rows with transform/predict only.
+
+        :param df: DataFrame with the text columns.
+        :return: DataFrame aligned with ``df`` holding cluster, auto_label, PCA1 and PCA2.
+        """
+        scores = self.score_matrix(self.vectorizer.transform(self.texts(df)), chunk_size)
+        scores.index = df.index
+        return scores
+
+    def save(self, registry=None, name=CLUSTER_MODEL_NAME, metadata=None):
+        """
+        Save the model as a new version in a ModelRegistry.
+
+        :return: The saved version string.
+        """
+        registry = registry or ModelRegistry()
+        artifacts = {
+            'vectorizer': self.vectorizer,
+            'kmeans': self.kmeans,
+            'projection': self.projection,
+            'label_map': {'cluster_labels': self.cluster_labels, 'text_columns': self.text_columns},
+        }
+        metadata = dict(metadata or {}, n_clusters=len(self.cluster_labels))
+        return registry.save(name, artifacts, metadata=metadata)
+
+    @classmethod
+    def load(cls, registry=None, name=CLUSTER_MODEL_NAME, version='latest'):
+        """
+        Load a saved version from a ModelRegistry.
+
+        :return: The ClusterModel.
+        """
+        registry = registry or ModelRegistry()
+        artifacts, _ = registry.load(name, version)
+        label_map = artifacts['label_map']
+        return cls(artifacts['vectorizer'], artifacts['kmeans'], artifacts['projection'],
+                   label_map['cluster_labels'], label_map['text_columns'])
+
+
+# Function to vectorize the title and field text with TF-IDF
+def vectorize_texts(df):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    texts = join_text_columns(df)
     vectorizer = TfidfVectorizer(stop_words='english',max_features=1000)
-    X = vectorizer.fit_transform(df['text'])
-
-    # Apply KMeans clustering (let's assume we want 5 clusters)
-    n_clusters = 10  # Adjust the number of clusters based on your dataset
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    df['cluster'] = kmeans.fit_predict(X)
-
-    # Define predefined categories with associated keywords (for example purposes)
-    category_keywords = {
-        'Computer Science': [
-            'Artificial Intelligence (AI)', 'Machine Learning (ML)', 'Deep Learning', 
-            'Neural Networks', 'Natural Language Processing (NLP)', 'Computer Vision', 
-            'Robotics', 'Data Science', 'Big Data', 'Data Mining', 'Cloud Computing', 
-            'Cybersecurity', 'Blockchain Technology', 'Software Engineering', 
-            'Human-Computer Interaction (HCI)', 'Quantum Computing', 'Internet of Things (IoT)', 
-            'Augmented Reality (AR)', 'Virtual Reality (VR)', 'Edge Computing', 
-            'Distributed Systems', 'Algorithm Design', 'Software Development', 'Predictive Analytics'
-        ],
-        'Engineering': [
-            'Mechanical Engineering', 'Civil Engineering', 'Electrical Engineering', 
-            'Aerospace Engineering', 'Nanotechnology', 'Biomedical Engineering', 
-            'Environmental Engineering', 'Chemical Engineering', 'Industrial Engineering', 
-            'Geotechnical Engineering', 'Structural Engineering', 'Energy Systems', 
-            'Automotive Engineering', 'Robotics Engineering', 'Control Systems', 
-            'Thermodynamics', 'Fluid Mechanics', 'Vibration Analysis', 'Materials Engineering', 
-            'Manufacturing Systems', 'Sustainable Engineering', 'Smart Infrastructure', 
-            'Additive Manufacturing (3D Printing)', 'Mechatronics', 'Power Systems'
-        ],
-        'Biology': [
-            'Genetics', 'Molecular Biology', 'Ecology', 'Neuroscience', 'Immunology', 
-            'Cell Biology', 'Microbiology', 'Biotechnology', 'Evolutionary Biology', 
-            'Pharmacology', 'Biochemistry', 'Biophysics', 'Physiology', 'Endocrinology', 
-            'Bioinformatics', 'Marine Biology', 'Plant Biology', 'Genomics', 'Proteomics', 
-            'Stem Cell Research', 'Human Biology', 'Synthetic Biology', 'Zoology', 
-            'Agricultural Biology', 'Microbial Pathogenesis', 'Human Disease Research'
-        ],
-        'Health': [
-            'Medicine', 'Public Health', 'Nursing', 'Epidemiology', 'Healthcare Management', 
-            'Health Policy', 'Medical Research', 'Pharmacology', 'Toxicology', 'Health Economics', 
-            'Mental Health', 'Global Health', 'Maternal and Child Health', 'Infectious Diseases', 
-            'Chronic Disease Management', 'Health Informatics', 'Biomedical Engineering', 
-            'Telemedicine', 'Nutritional Science', 'Healthcare Technology', 
-            'Clinical Trials', 'Medical Imaging', 'Genetic Counseling', 'Patient Care'
-        ],
-        'Physics': [
-            'Physics', 'Quantum Mechanics', 'Astrophysics', 'Material Science', 
-            'Condensed Matter Physics', 'Particle Physics', 'Theoretical Physics', 
-            'Experimental Physics', 'Optics', 'Laser Physics', 'Nuclear Physics', 
-            'Plasma Physics', 'High-Energy Physics', 'Quantum Field Theory', 
-            'Solid State Physics', 'Statistical Mechanics', 'Gravitational Physics', 
-            'String Theory', 'Fluid Dynamics', 'Nonlinear Dynamics', 'Cosmology', 
-            'Astroparticle Physics', 'Geophysics', 'Radio Frequency (RF) Physics', 
-            'Semiconductor Physics', 'Thermal Physics', 'Electromagnetism'
-        ]
-    }
-
-
-    # Function to label a cluster based on the most common words in that cluster
-    def label_cluster(cluster_center, category_keywords):
-        # Find the closest category based on common keywords
-        min_distance = float('inf')
-        closest_category = None
-        
-        for category, keywords in category_keywords.items():
-            # Calculate the distance between the cluster center and the keywords of each category
-            category_vec = vectorizer.transform([' '.join(keywords)])
-            dist = np.linalg.norm(cluster_center - category_vec.mean(axis=0))
-            
-            if dist < min_distance:
-                min_distance = dist
-                closest_category = category
-        
-        return closest_category
+    X = vectorizer.fit_transform(texts)
+    return vectorizer, X
+
+
+@profiled()
+def fit_cluster_model(df, category_keywords=None, n_clusters=10, chunk_size=100000, vectorized=None, kmeans=None):
+    """
+    Fit the clustering pipeline on a DataFrame with 'title' and 'field' columns.
+
+    Parameters:
+        df (DataFrame): The training data.
+        category_keywords (dict): Category taxonomy; defaults to CATEGORY_KEYWORDS.
+        n_clusters (int): Number of clusters.
+        chunk_size (int): Rows per chunk when fitting the projection.
+        vectorized (tuple): Optional (vectorizer, X) already fitted on ``df``.
+        kmeans: Optional clustering model already fitted on X (e.g. the best model of a k sweep).
+
+    Returns:
+        tuple: (ClusterModel, the fitted TF-IDF matrix of ``df``)
+    """
+    # Vectorize the text using TF-IDF
+    vectorizer, X = vectorized if vectorized is not None else vectorize_texts(df)
+
+    # Apply KMeans clustering
+    if kmeans is None:
+        from sklearn.cluster import KMeans
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        kmeans.fit(X)
 
     # Assign a label to each cluster based on the category keywords
-    cluster_centers = kmeans.cluster_centers_
-    cluster_labels = []
+    cluster_labels = label_clusters(kmeans.cluster_centers_, vectorizer, category_keywords)
+
+    # Use PCA to reduce the dimensionality of the data to 2D for visualization,
+    # computed on the sparse matrix in row chunks instead of a dense copy of X
+    projection = SparseProjection(n_components=2, random_state=42)
+    projection.fit_chunks(lambda: iter_row_chunks(X, chunk_size))
+
+    return ClusterModel(vectorizer, kmeans, projection, cluster_labels), X
+
+
+@profiled()
+def select_k(df, k_values=range(2, 16), n_jobs=-1, sample_size=5000):
+    """
+    Vectorize ``df`` once and sweep the number of clusters over ``k_values`` in parallel.
 
-    for center in cluster_centers:
-        label = label_cluster(center, category_keywords)
-        cluster_labels.append(label)
+    Parameters:
+        df (DataFrame): Data with 'title' and 'field' columns.
+        k_values (iterable): Candidate numbers of clusters.
+        n_jobs (int): Worker threads; -1 uses every core.
+        sample_size (int): Rows in the stratified silhouette sample.
 
-    # Add the auto-label to the dataframe
-    df['auto_label'] = df['cluster'].apply(lambda x: cluster_labels[x])
+    Returns:
+        tuple: (KSweepResult, (vectorizer, X)) so the chosen model can be finished
+        with ``fit_cluster_model(df, vectorized=..., kmeans=result.best_model)``.
+    """
+    from analyze_function.k_selection import sweep_k
+    vectorized = vectorize_texts(df)
+    result = sweep_k(vectorized[1], k_values, n_jobs=n_jobs, sample_size=sample_size)
+    return result, vectorized
 
-    # Use PCA to reduce the dimensionality of the data to 2D for visualization
-    pca = PCA(n_components=2)
-    pca_result = pca.fit_transform(X.toarray())
 
-    # Add PCA components to the dataframe
-    df['PCA1'] = pca_result[:, 0]
-    df['PCA2'] = pca_result[:, 1]
+@profiled()
+def analyze_webscrape(df, category_keywords=None, chunk_size=100000, model=None, n_clusters=10):
+    df['text'] = join_text_columns(df) # Repeat the author keywords portion to increase weight
+
+    if model is None:
+        # Fit vectorizer, clusters, labels and projection from scratch
+        # Adjust the number of clusters based on your dataset (select_k suggests one)
+        model, X = fit_cluster_model(df, category_keywords, n_clusters=n_clusters, chunk_size=chunk_size)
+    else:
+        # Predict-only path with a saved model: consistent cluster ids across uploads
+        X = model.vectorizer.transform(model.texts(df))
+
+    scores = model.score_matrix(X, chunk_size)
+    for column in ('cluster', 'auto_label', 'PCA1', 'PCA2'):
+        df[column] = scores[column].to_numpy()
 
     # Plot the clusters using Plotly, with HTML line breaks in the hover data
-    fig = px.scatter(df, x='PCA1', y='PCA2', color='auto_label', 
-                    hover_data={'title': True},
-                    title="Cluster Visualization with Auto-Labeling",
-                    labels={'auto_label': 'Research Field'})
+    fig = scatter_clusters(df, hover_column='title')
     # fig.show(renderer="browser")
     # fig.show(renderer="browser")
     return fig
 
-    
\ No newline at end of file
+
+## ---------------streaming clustering for large uploads---------------
+# Function to read a CSV path or uploaded file in chunks, rewinding file objects first
+def iter_csv_chunks(source, chunk_size=20000, usecols=None):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    for chunk in pd.read_csv(source, chunksize=chunk_size, usecols=usecols):
+        yield chunk
+
+
+# Function to read chunks from a CSV source or from a callable returning an iterator of DataFrames
+def iter_source_chunks(source, chunk_size=20000, usecols=None):
+    if callable(source):
+        for chunk in source():
+            yield chunk.reindex(columns=usecols) if usecols is not None else chunk
+    else:
+        yield from iter_csv_chunks(source, chunk_size, usecols)
+
+
+def _read_fraction(source):
+    """Fraction of a seekable upload consumed so far, or None when unknown."""
+    size = getattr(source, 'size', None)
+    if size and hasattr(source, 'tell'):
+        return min(source.tell() / size, 1.0)
+    return None
+
+
+class HashedTfidfVectorizer:
+    """
+    Stateless hashing vectorizer with IDF weights accumulated across chunks.
+    """
+
+    def __init__(self, n_features=2 ** 16):
+        """
+        Initialize the vectorizer.
+
+        :param n_features: Size of the hashed feature space.
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.hasher = HashingVectorizer(stop_words='english', n_features=n_features,
+                                        alternate_sign=False, norm=None)
+        self.document_frequency = np.zeros(n_features, dtype=np.int64)
+        self.n_documents = 0
+        self.idf_ = None
+
+    @property
+    def n_features(self):
+        return self.hasher.n_features
+
+    def partial_fit(self, texts):
+        """
+        Add the document frequencies of one chunk of texts.
+        """
+        counts = self.hasher.transform(texts)
+        self.document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_documents += counts.shape[0]
+        # Smoothed IDF, as in TfidfVectorizer
+        self.idf_ = np.log((1 + self.n_documents) / (1 + self.document_frequency)) + 1
+        return self
+
+    def transform(self, texts):
+        """
+        Vectorize raw texts into L2-normalised TF-IDF rows in the hashed feature space.
+
+        :param texts: Iterable of strings.
+        :return: Sparse matrix of shape (len(texts), n_features).
+        """
+        from sklearn.preprocessing import normalize
+        counts = self.hasher.transform(texts)
+        return normalize(counts @ sp.diags(self.idf_), norm='l2', copy=False)
+
+
+class StreamingTextClusterer:
+    """
+    Out-of-core version of the analyze_webscrape pipeline for uploads that do not fit in memory.
+
+    Text is vectorized statelessly with a HashingVectorizer; document frequencies are
+    accumulated across chunks to build the IDF weights, and a MiniBatchKMeans model
+    is fitted incrementally, so memory is bounded by the chunk size.
+    """
+
+    def __init__(self, n_clusters=10, n_features=2 ** 16, chunk_size=20000, sample_size=20000,
+                 text_columns=('title', 'field'), random_state=42):
+        """
+        Initialize the clusterer.
+
+        :param n_clusters: Number of clusters.
+        :param n_features: Size of the hashed feature space.
+        :param chunk_size: Rows read per chunk.
+        :param sample_size: Rows kept in a reservoir sample to fit the 2-D projection.
+        :param text_columns: Columns concatenated into the clustered text.
+        :param random_state: Seed for the clustering, the sampling and the projection.
+        """
+        self.n_clusters = n_clusters
+        self.chunk_size = chunk_size
+        self.sample_size = sample_size
+        self.text_columns = list(text_columns)
+        self.random_state = random_state
+        from sklearn.cluster import MiniBatchKMeans
+        self.vectorizer = HashedTfidfVectorizer(n_features=n_features)
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+        self.projection = SparseProjection(n_components=2, random_state=random_state)
+        self.cluster_labels_ = None
+
+    def _texts(self, chunk):
+        return join_text_columns(chunk, self.text_columns)
+
+    @property
+    def n_documents_(self):
+        return self.vectorizer.n_documents
+
+    def fit(self, source, category_keywords=None, progress_callback=None):
+        """
+        Fit IDF weights, clusters, labels and the 2-D projection in three passes over ``source``.
+
+        :param source: CSV path or file object with the text columns, or a callable returning
+            a fresh iterator of DataFrame chunks (it is called once per pass).
+        :param category_keywords: Category taxonomy used to auto-label clusters.
+        :param progress_callback: Optional callable(fraction, message) for progress reporting.
+        :return: self
+        """
+        def report(fraction, message):
+            if progress_callback is not None:
+                progress_callback(fraction, message)
+
+        # Pass 1: document frequencies
+        n_chunks = 0
+        for chunk in iter_source_chunks(source, self.chunk_size, usecols=self.text_columns):
+            self.vectorizer.partial_fit(self._texts(chunk))
+            n_chunks += 1
+            fraction = _read_fraction(source)
+            report(0.3 * fraction if fraction is not None else 0.0,
+                   f"Counting terms: {self.n_documents_:,} rows")
+        if not self.n_documents_:
+            raise ValueError("The uploaded file has no rows.")
+
+        # Pass 2: incremental k-means and a reservoir sample for the projection
+        rng = np.random.default_rng(self.random_state)
+        sample, sample_keys = None, None
+        pending = None
+        for i, chunk in enumerate(iter_source_chunks(source, self.chunk_size, usecols=self.text_columns)):
+            X = self.vectorizer.transform(self._texts(chunk))
+            # partial_fit needs at least n_clusters rows; carry small chunks over
+            pending = X if pending is None else sp.vstack([pending, X]).tocsr()
+            if pending.shape[0] >= self.n_clusters:
+                self.kmeans.partial_fit(pending)
+                pending = None
+            keys = rng.random(X.shape[0])
+            if sample is None:
+                sample, sample_keys = X, keys
+            else:
+                sample, sample_keys = sp.vstack([sample, X]).tocsr(), np.concatenate([sample_keys, keys])
+            if sample.shape[0] > self.sample_size:
+                keep = np.argpartition(sample_keys, self.sample_size)[:self.sample_size]
+                sample, sample_keys = sample[keep], sample_keys[keep]
+            report(0.3 + 0.4 * (i + 1) / n_chunks, f"Clustering: chunk {i + 1} of {n_chunks}")
+        if pending is not None:
+            if not hasattr(self.kmeans, 'cluster_centers_'):
+                raise ValueError(f"Streaming mode needs at least {self.n_clusters} rows.")
+            self.kmeans.partial_fit(pending)
+
+        self.cluster_labels_ = label_clusters(self.kmeans.cluster_centers_, self.vectorizer, category_keywords)
+        self.projection.fit(sample)
+        return self
+
+    def to_model(self):
+        """Return the fitted pipeline as a ClusterModel for saving or predict-only scoring."""
+        return ClusterModel(self.vectorizer, self.kmeans, self.projection, self.cluster_labels_, self.text_columns)
+
+    def predict(self, source, keep_columns=('title',), progress_callback=None, start_fraction=0.7):
+        """
+        Assign clusters, labels and 2-D coordinates chunk by chunk.
+
+        :param source: CSV path, file object or chunk factory, as for ``fit``.
+        :param keep_columns: Input columns copied to the output (e.g. for hover text).
+        :param progress_callback: Optional callable(fraction, message).
+        :return: DataFrame with the kept columns plus cluster, auto_label, PCA1 and PCA2.
+        """
+        return predict_csv(self.to_model(), source, self.chunk_size, keep_columns, progress_callback,
+                           start_fraction, n_rows=self.n_documents_)
+
+
+def iter_predict_chunks(model, source, chunk_size=20000, keep_columns=('title',), progress_callback=None,
+                        start_fraction=0.0, n_rows=None):
+    """
+    Score a source chunk by chunk with a fitted ClusterModel, yielding one result per chunk.
+
+    Parameters:
+        model (ClusterModel): The fitted pipeline.
+        source: CSV path, file object or chunk factory with the model's text columns.
+        chunk_size (int): Rows read per chunk.
+        keep_columns (tuple): Input columns copied to the output.
+        progress_callback (callable): Optional callable(fraction, message).
+        start_fraction (float): Progress already reported before scoring starts.
+        n_rows (int): Total number of rows, when known, for progress reporting.
+
+    Returns:
+        generator: DataFrames with the kept columns plus cluster, auto_label, PCA1 and PCA2.
+    """
+    columns = list(dict.fromkeys(model.text_columns + list(keep_columns)))
+    n_chunks = max(-(-n_rows // chunk_size), 1) if n_rows else None
+    for i, chunk in enumerate(iter_source_chunks(source, chunk_size, usecols=columns)):
+        scores = model.predict(chunk, chunk_size)
+        yield pd.concat([chunk[list(keep_columns)].reset_index(drop=True), scores.reset_index(drop=True)], axis=1)
+        if progress_callback is not None:
+            if n_chunks:
+                fraction = start_fraction + (1 - start_fraction) * min((i + 1) / n_chunks, 1.0)
+            else:
+                fraction = _read_fraction(source) or start_fraction
+            progress_callback(fraction, f"Scoring: chunk {i + 1}" + (f" of {n_chunks}" if n_chunks else ""))
+
+
+def predict_csv(model, source, chunk_size=20000, keep_columns=('title',), progress_callback=None,
+                start_fraction=0.0, n_rows=None):
+    """
+    Score a CSV chunk by chunk with a fitted ClusterModel.
+
+    Parameters:
+        model (ClusterModel): The fitted pipeline.
+        source: CSV path or file object with the model's text columns.
+        chunk_size (int): Rows read per chunk.
+        keep_columns (tuple): Input columns copied to the output.
+        progress_callback (callable): Optional callable(fraction, message).
+        start_fraction (float): Progress already reported before scoring starts.
+        n_rows (int): Total number of rows, when known, for progress reporting.
+
+    Returns:
+        DataFrame: The kept columns plus cluster, auto_label, PCA1 and PCA2.
+    """
+    return pd.concat(list(iter_predict_chunks(model, source, chunk_size, keep_columns, progress_callback,
+                                              start_fraction, n_rows)), ignore_index=True)
+
+
+@profiled()
+def analyze_webscrape_streaming(source, category_keywords=None, n_clusters=10, chunk_size=20000,
+                                progress_callback=None, model=None):
+    """
+    Cluster, auto-label and plot a large CSV without loading it into memory at once.
+
+    Parameters:
+        source: CSV path or uploaded file with 'title' and 'field' columns.
+        category_keywords (dict): Category taxonomy; defaults to CATEGORY_KEYWORDS.
+        n_clusters (int): Number of clusters.
+        chunk_size (int): Rows read per chunk.
+        progress_callback (callable): Optional callable(fraction, message).
+        model (ClusterModel): Saved model; when given the upload is only scored, not refitted.
+
+    Returns:
+        Figure: The cluster scatter plot.
+    """
+    if model is not None:
+        result = predict_csv(model, source, chunk_size, progress_callback=progress_callback)
+        return scatter_clusters(result, hover_column='title')
+    clusterer = StreamingTextClusterer(n_clusters=n_clusters, chunk_size=chunk_size)
+    clusterer.fit(source, category_keywords, progress_callback)
+    result = clusterer.predict(source, progress_callback=progress_callback)
+    return scatter_clusters(result, hover_column='title')
@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import datetime
+
+## ---------------model registry---------------
+# Fitted models are stored as versioned directories:
+#   <root>/<name>/<version>/<artifact>.joblib
+#   <root>/<name>/<version>/manifest.json
+# so a page can score new data with transform/predict only and get the same
+# cluster ids for every upload.
+
+DEFAULT_MODEL_DIR = os.getenv("MODEL_DIR", "models")
+
+
+class ModelRegistry:
+    """
+    A class to save and load versioned model artifacts on disk.
+    """
+
+    def __init__(self, root: str = DEFAULT_MODEL_DIR):
+        """
+        Initialize the registry.
+
+        :param root: Directory holding one sub-directory per model name.
+        """
+        self.root = root
+
+    def _model_dir(self, name: str):
+        return os.path.join(self.root, name)
+
+    def versions(self, name: str):
+        """
+        List the saved versions of a model, oldest first.
+
+        :param name: The model name.
+        :return: List of version strings.
+        """
+        model_dir = self._model_dir(name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(
+            version for version in os.listdir(model_dir)
+            if os.path.exists(os.path.join(model_dir, version, "manifest.json"))
+        )
+
+    def latest_version(self, name: str):
+        """
+        Return the newest version of a model, or None when nothing is saved.
+        """
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def save(self, name: str, artifacts: dict, metadata: dict = None, version: str = None):
+        """
+        Save a set of artifacts as a new version.
+
+        :param name: The model name.
+        :param artifacts: Mapping of artifact name to a picklable object.
+        :param metadata: Optional JSON-serialisable metadata stored in the manifest.
+        :param version: Version string. Defaults to a timestamp.
+        :return: The saved version string.
+        """
+        if version is None:
+            version = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        version_dir = os.path.join(self._model_dir(name), version)
+        if os.path.exists(version_dir):
+            raise ValueError(f"Version {version} of model '{name}' already exists.")
+        os.makedirs(version_dir)
+
+        import joblib
+        files = {}
+        for artifact_name, artifact in artifacts.items():
+            file_name = f"{artifact_name}.joblib"
+            file_path = os.path.join(version_dir, file_name)
+            joblib.dump(artifact, file_path)
+            with open(file_path, "rb") as f:
+                files[artifact_name] = {"file": file_name, "sha256": hashlib.sha256(f.read()).hexdigest()}
+
+        manifest = {
+            "name": name,
+            "version": version,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "artifacts": files,
+            "metadata": metadata or {},
+        }
+        with open(os.path.join(version_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=4)
+        print(f"Saved model '{name}' version {version} to {version_dir}")
+        return version
+
+    def load_manifest(self, name: str, version: str = "latest"):
+        """
+        Read the manifest of a saved version.
+
+        :param name: The model name.
+        :param version: Version string or 'latest'.
+        :return: The manifest dictionary.
+        """
+        if version == "latest":
+            version = self.latest_version(name)
+            if version is None:
+                raise FileNotFoundError(f"No saved versions of model '{name}' in {self.root}.")
+        manifest_path = os.path.join(self._model_dir(name), version, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Model '{name}' has no version {version}.")
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    def load(self, name: str, version: str = "latest"):
+        """
+        Load every artifact of a saved version.
+
+        :param name: The model name.
+        :param version: Version string or 'latest'.
+        :return: Tuple of (artifacts dict, manifest dict).
+        :raises ValueError: If an artifact file does not match the sha256 recorded by save().
+        """
+        import joblib
+        manifest = self.load_manifest(name, version)
+        version_dir = os.path.join(self._model_dir(name), manifest["version"])
+        artifacts = {}
+        for artifact_name, info in manifest["artifacts"].items():
+            file_path = os.path.join(version_dir, info["file"])
+            # Check the file before unpickling it; a modified or truncated artifact is never loaded
+            with open(file_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if digest != info["sha256"]:
+                raise ValueError(
+                    f"Artifact '{artifact_name}' of model '{name}' version {manifest['version']} "
+                    f"does not match its recorded sha256."
+                )
+            artifacts[artifact_name] = joblib.load(file_path)
+        return artifacts, manifest
+
+## ---------------model registry---------------
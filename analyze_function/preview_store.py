@@ -0,0 +1,168 @@
+import os
+import json
+import shutil
+import datetime
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+## ---------------year-partitioned preview store---------------
+# The DataFrame Preview page reads from a Hive-partitioned Parquet copy of the
+# source CSV (<store>/year=2018/part-0.parquet, ...). A year filter prunes the
+# scan to one directory, only the selected columns are decoded, and sorting and
+# pagination happen in Arrow, so a page interaction only ever sends one page of
+# rows to the browser. The manifest records the per-year row counts and the
+# size/mtime of the source CSV so a stale store is rebuilt automatically.
+
+SOURCE_CSV = "dataset/updated_with_year.csv"
+STORE_DIR = os.getenv("PREVIEW_STORE_DIR", "dataset/preview_store")
+PARTITION_COLUMN = "year"
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"path": os.path.abspath(csv_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def store_version(csv_path=SOURCE_CSV, store_dir=STORE_DIR):
+    """Key for caches of an opened store: changes when the source CSV changes or the store is rebuilt."""
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    source = _source_signature(csv_path)
+    return source["size"], source["mtime"], os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else None
+
+
+def build_preview_store(csv_path=SOURCE_CSV, store_dir=STORE_DIR, partition_column=PARTITION_COLUMN,
+                        row_group_size=50000):
+    """
+    Convert the source CSV into a year-partitioned Parquet dataset.
+
+    Parameters:
+        csv_path (str): The source CSV.
+        store_dir (str): Destination directory; replaced atomically.
+        partition_column (str): Column used as the partition key.
+        row_group_size (int): Maximum rows per Parquet row group.
+
+    Returns:
+        dict: The manifest written alongside the data.
+    """
+    data = pd.read_csv(csv_path, low_memory=False)
+    data[partition_column] = pd.to_numeric(data[partition_column], errors='coerce').astype('Int64')
+    table = pa.Table.from_pandas(data, preserve_index=False)
+
+    temporary_dir = f"{store_dir}.tmp"
+    shutil.rmtree(temporary_dir, ignore_errors=True)
+    partitioning = ds.partitioning(pa.schema([(partition_column, pa.int64())]), flavor='hive')
+    ds.write_dataset(table, temporary_dir, format='parquet', partitioning=partitioning,
+                     max_rows_per_group=row_group_size, existing_data_behavior='overwrite_or_ignore')
+
+    counts = data[partition_column].value_counts().sort_index()
+    manifest = {
+        "source": _source_signature(csv_path),
+        "partition_column": partition_column,
+        "columns": [column for column in data.columns],
+        "row_counts": {str(int(key)): int(count) for key, count in counts.items()},
+        "n_rows": int(len(data)),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(temporary_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(temporary_dir, store_dir)
+    return manifest
+
+
+class PreviewStore:
+    """
+    Paginated, column-pruned reads from a year-partitioned Parquet dataset.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR, cache_size: int = 8):
+        """
+        Open a store created by build_preview_store.
+
+        :param store_dir: The store directory.
+        :param cache_size: Number of (year, columns) tables kept in memory between page requests.
+        """
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "manifest.json"), "r") as f:
+            self.manifest = json.load(f)
+        self.partition_column = self.manifest["partition_column"]
+        partitioning = ds.partitioning(pa.schema([(self.partition_column, pa.int64())]), flavor='hive')
+        self.dataset = ds.dataset(store_dir, format='parquet', partitioning=partitioning,
+                                  exclude_invalid_files=True)
+        self.cache_size = cache_size
+        self._tables = OrderedDict()
+
+    @classmethod
+    def open(cls, csv_path=SOURCE_CSV, store_dir=STORE_DIR):
+        """
+        Open the store, (re)building it first when it is missing or older than the CSV.
+
+        :return: The PreviewStore.
+        """
+        manifest_path = os.path.join(store_dir, "manifest.json")
+        current = False
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                current = json.load(f).get("source") == _source_signature(csv_path)
+        if not current:
+            build_preview_store(csv_path, store_dir)
+        return cls(store_dir)
+
+    @property
+    def years(self):
+        """Partition values, ascending."""
+        return sorted(int(year) for year in self.manifest["row_counts"])
+
+    @property
+    def columns(self):
+        return self.manifest["columns"]
+
+    def count(self, year):
+        """Number of rows in one partition, from the manifest."""
+        return self.manifest["row_counts"].get(str(int(year)), 0)
+
+    def _partition_table(self, year, columns):
+        key = (int(year), tuple(columns))
+        if key in self._tables:
+            self._tables.move_to_end(key)
+            return self._tables[key]
+        # The partition filter is resolved from the directory names, so other years are never opened
+        table = self.dataset.to_table(columns=list(columns),
+                                      filter=ds.field(self.partition_column) == int(year))
+        self._tables[key] = table
+        if len(self._tables) > self.cache_size:
+            self._tables.popitem(last=False)
+        return table
+
+    def page(self, year, page=0, page_size=100, columns=None, sort_by=None, ascending=True):
+        """
+        Return one page of rows of one year.
+
+        :param year: Partition value.
+        :param page: Zero-based page number.
+        :param page_size: Rows per page.
+        :param columns: Columns to return; defaults to every column.
+        :param sort_by: Optional column to sort by before slicing.
+        :param ascending: Sort direction.
+        :return: DataFrame with at most ``page_size`` rows.
+        """
+        columns = list(columns) if columns else list(self.columns)
+        needed = columns + ([sort_by] if sort_by and sort_by not in columns else [])
+        table = self._partition_table(year, needed)
+        start = max(int(page), 0) * page_size
+        if sort_by:
+            order = 'ascending' if ascending else 'descending'
+            indices = pc.sort_indices(table, sort_keys=[(sort_by, order)], null_placement='at_end')
+            table = table.take(indices.slice(start, page_size))
+        else:
+            table = table.slice(start, page_size)
+        return table.select(columns).to_pandas()
+
+    def n_pages(self, year, page_size=100):
+        """Number of pages of one year."""
+        return max(-(-self.count(year) // page_size), 1)
+
+## ---------------year-partitioned preview store---------------
@@ -0,0 +1,307 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import inspect
+import datetime
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+## ---------------profiling hooks---------------
+# Lightweight instrumentation shared by the analysis functions, MongoDBHandler
+# and the pages. Every instrumented call appends one record (stage, seconds,
+# rows, RSS delta, thread, timestamp) to an in-process ring buffer that the
+# Performance page summarises. A stage can be armed so its next call runs under
+# cProfile; stages slower than PROFILE_SNAPSHOT_SECONDS arm themselves.
+#
+# Environment:
+#   PROFILING=0                 disable recording
+#   PROFILE_BUFFER_SIZE         records kept in memory (default 20000)
+#   PROFILE_LOG                 also append every record to this JSON-lines file
+#   PROFILE_SNAPSHOT_SECONDS    auto-arm threshold in seconds (default 5, 0 disables)
+#   PROFILE_SNAPSHOT_DIR        also dump snapshots there as .prof files
+
+ENABLED = os.getenv("PROFILING", "1") != "0"
+BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", 20000))
+LOG_PATH = os.getenv("PROFILE_LOG")
+SNAPSHOT_SECONDS = float(os.getenv("PROFILE_SNAPSHOT_SECONDS", 5))
+SNAPSHOT_DIR = os.getenv("PROFILE_SNAPSHOT_DIR")
+SIZED_TYPES = (list, tuple, dict)
+
+
+def rss_bytes():
+    """Resident set size of the process (Linux /proc), or None where unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def count_rows(value):
+    """Number of rows of a frame, array or sequence; None for anything else."""
+    if hasattr(value, "shape") and getattr(value, "shape", None):
+        return int(value.shape[0])
+    if isinstance(value, SIZED_TYPES):
+        return len(value)
+    return None
+
+
+class ProfileRecorder:
+    """
+    Thread-safe ring buffer of timed calls plus the cProfile snapshots they triggered.
+    """
+
+    def __init__(self, size: int = BUFFER_SIZE, log_path: str = LOG_PATH,
+                 snapshot_seconds: float = SNAPSHOT_SECONDS, snapshot_dir: str = SNAPSHOT_DIR):
+        """
+        :param size: Number of records kept.
+        :param log_path: Optional JSON-lines file every record is appended to.
+        :param snapshot_seconds: Calls slower than this arm their stage for a cProfile snapshot (0 disables).
+        :param snapshot_dir: Optional directory receiving the raw .prof file of every snapshot.
+        """
+        self.records = deque(maxlen=size)
+        self.snapshots = deque(maxlen=20)
+        self.log_path = log_path
+        self.snapshot_seconds = snapshot_seconds
+        self.snapshot_dir = snapshot_dir
+        self.enabled = ENABLED
+        self._armed = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, stage, seconds, rows=None, memory_delta=None):
+        """
+        Append one call to the buffer (and the log file when configured).
+
+        :param stage: Dotted stage name, e.g. 'data_insights.analyze_connection_node'.
+        :param seconds: Wall time of the call.
+        :param rows: Rows processed, when known.
+        :param memory_delta: Change of the process RSS in bytes over the call, when known.
+        """
+        entry = {
+            "stage": stage,
+            "seconds": seconds,
+            "rows": rows,
+            "memory_delta": memory_delta,
+            "thread": threading.current_thread().name,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self.records.append(entry)
+            if self.snapshot_seconds and seconds > self.snapshot_seconds:
+                self._armed.add(stage)
+        if self.log_path:
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print(f"Error writing profile record to {self.log_path}: {e}")
+
+    def arm(self, stage):
+        """Run the next call of ``stage`` under cProfile."""
+        with self._lock:
+            self._armed.add(stage)
+
+    @property
+    def armed(self):
+        with self._lock:
+            return sorted(self._armed)
+
+    def _take_armed(self, stage):
+        # cProfile hooks the current thread only; a snapshot nested in another would replace it
+        if getattr(self._local, "profiling", False):
+            return False
+        with self._lock:
+            if stage in self._armed:
+                self._armed.discard(stage)
+                return True
+        return False
+
+    def _save_snapshot(self, stage, profiler, seconds):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(40)
+        snapshot = {
+            "stage": stage,
+            "seconds": seconds,
+            "timestamp": time.time(),
+            "report": stream.getvalue(),
+        }
+        if self.snapshot_dir:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            snapshot["path"] = os.path.join(self.snapshot_dir, f"{stage}-{stamp}.prof")
+            stats.dump_stats(snapshot["path"])
+        with self._lock:
+            self.snapshots.append(snapshot)
+
+    @contextmanager
+    def measure(self, stage, rows=None):
+        """
+        Time a block of code as one call of ``stage``.
+
+        :param stage: Stage name.
+        :param rows: Rows processed, if known up front.
+        :return: Context manager yielding a dict; set its 'rows' key to report rows found inside the block.
+        """
+        info = {"rows": rows}
+        if not self.enabled:
+            yield info
+            return
+        snapshot = self._take_armed(stage)
+        profiler = cProfile.Profile() if snapshot else None
+        memory_before = rss_bytes()
+        start = time.perf_counter()
+        if profiler:
+            self._local.profiling = True
+            profiler.enable()
+        try:
+            yield info
+        finally:
+            if profiler:
+                profiler.disable()
+                self._local.profiling = False
+            seconds = time.perf_counter() - start
+            memory_after = rss_bytes()
+            memory_delta = memory_after - memory_before if memory_before is not None and memory_after is not None else None
+            self.record(stage, seconds, info["rows"], memory_delta)
+            if profiler:
+                self._save_snapshot(stage, profiler, seconds)
+
+    def frame(self):
+        """The buffered records as a DataFrame, oldest first."""
+        import pandas as pd
+        with self._lock:
+            records = list(self.records)
+        return pd.DataFrame(records, columns=["stage", "seconds", "rows", "memory_delta", "thread", "timestamp"])
+
+    def summary(self):
+        """
+        Aggregate the buffer per stage.
+
+        :return: DataFrame with calls, latency percentiles, total time, rows, throughput and
+            mean memory delta per stage, slowest total first.
+        """
+        import pandas as pd
+        data = self.frame()
+        if data.empty:
+            return pd.DataFrame(columns=["stage", "calls", "p50", "p95", "p99", "max", "total_seconds",
+                                         "rows", "rows_per_second", "mean_memory_delta_mb"])
+        grouped = data.groupby("stage")
+        summary = pd.DataFrame({
+            "calls": grouped.size(),
+            "p50": grouped["seconds"].quantile(0.5),
+            "p95": grouped["seconds"].quantile(0.95),
+            "p99": grouped["seconds"].quantile(0.99),
+            "max": grouped["seconds"].max(),
+            "total_seconds": grouped["seconds"].sum(),
+            "rows": grouped["rows"].sum(min_count=1),
+            "mean_memory_delta_mb": grouped["memory_delta"].mean() / 2 ** 20,
+        })
+        summary["rows_per_second"] = summary["rows"] / summary["total_seconds"]
+        summary = summary[["calls", "p50", "p95", "p99", "max", "total_seconds", "rows", "rows_per_second",
+                           "mean_memory_delta_mb"]]
+        return summary.sort_values("total_seconds", ascending=False).reset_index()
+
+    def snapshot_list(self):
+        """The cProfile snapshots, oldest first (a copy, safe to iterate while calls are recorded)."""
+        with self._lock:
+            return list(self.snapshots)
+
+    def export(self, destination):
+        """
+        Write the buffered records as JSON lines.
+
+        :param destination: File path (overwritten) or a writable text stream such as io.StringIO.
+        :return: Number of records written.
+        """
+        with self._lock:
+            records = list(self.records)
+        if hasattr(destination, "write"):
+            for entry in records:
+                destination.write(json.dumps(entry) + "\n")
+            return len(records)
+        with open(destination, "w") as f:
+            return self.export(f)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self.snapshots.clear()
+            self._armed.clear()
+
+
+# Process-wide recorder: Streamlit runs every page and session in one process
+recorder = ProfileRecorder()
+
+
+# Context manager timing a page section or any other block
+def profile_section(stage, rows=None):
+    return recorder.measure(stage, rows)
+
+
+# Decorator recording every call of a function
+def profiled(stage=None, rows=None):
+    """
+    Record the calls of a function in the profiling buffer.
+
+    Parameters:
+        stage (str): Stage name; defaults to '<module>.<qualname>' without the package prefix.
+        rows (callable): Optional ``rows(result)`` returning the rows processed. By default
+            the length of the first frame, array or list argument is used. Generator functions
+            are timed across the whole iteration and count the items of the chunks they yield.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        name = stage or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not recorder.enabled:
+                    yield from func(*args, **kwargs)
+                    return
+                generator = func(*args, **kwargs)
+                seconds, n_rows = 0.0, 0
+                memory_before = rss_bytes()
+                try:
+                    while True:
+                        # Only the time spent inside the generator counts, not the consumer's
+                        start = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            break
+                        finally:
+                            seconds += time.perf_counter() - start
+                        item_rows = count_rows(item)
+                        n_rows += 1 if item_rows is None else item_rows
+                        yield item
+                finally:
+                    generator.close()
+                    memory_after = rss_bytes()
+                    memory_delta = memory_after - memory_before if memory_before is not None and memory_after is not None else None
+                    recorder.record(name, seconds, n_rows, memory_delta)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return func(*args, **kwargs)
+            sized = next((n for n in map(count_rows, args) if n is not None), None)
+            with recorder.measure(name, sized) as info:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    info["rows"] = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+## ---------------profiling hooks---------------
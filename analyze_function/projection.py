@@ -0,0 +1,136 @@
+import numpy as np
+import scipy.sparse as sp
+
+## ---------------sparse 2-D projection---------------
+# PCA of a sparse TF-IDF matrix without ever densifying it. The matrix is centred
+# implicitly (X - 1 mean^T is never formed) and the principal axes come from a
+# randomized subspace iteration on the covariance operator, which only needs
+# products of sparse row chunks with small dense blocks. The same code serves an
+# in-memory matrix (one chunk) and inputs streamed from disk in many chunks.
+
+
+class SparseProjection:
+    """
+    Randomized PCA for sparse matrices, fitted in memory or over row chunks.
+    """
+
+    def __init__(self, n_components=2, n_oversamples=10, n_iter=5, random_state=42):
+        """
+        Initialize the projection.
+
+        :param n_components: Number of output dimensions.
+        :param n_oversamples: Extra random directions used to stabilise the subspace.
+        :param n_iter: Number of power iterations (one pass over the data each).
+        :param random_state: Seed of the random starting subspace, for reproducible coordinates.
+        """
+        self.n_components = n_components
+        self.n_oversamples = n_oversamples
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.mean_ = None
+        self.components_ = None
+        self.explained_variance_ = None
+        self.n_samples_ = 0
+
+    def _covariance_product(self, chunk_factory, block):
+        """Compute (X - 1 mean^T)^T (X - 1 mean^T) @ block with one pass over the chunks."""
+        result = np.zeros_like(block)
+        for chunk in chunk_factory():
+            result += chunk.T @ (chunk @ block)
+        result -= self.n_samples_ * np.outer(self.mean_, self.mean_ @ block)
+        return result
+
+    def fit_chunks(self, chunk_factory):
+        """
+        Fit the projection over row chunks.
+
+        :param chunk_factory: Callable returning a fresh iterator of sparse row chunks that
+            share the same columns. It is called once per pass: one mean pass, n_iter power
+            iterations and one Rayleigh-Ritz pass (n_iter + 2 passes).
+        :return: self
+        """
+        total = None
+        n_samples = 0
+        for chunk in chunk_factory():
+            chunk = sp.csr_matrix(chunk)
+            column_sums = np.asarray(chunk.sum(axis=0)).ravel()
+            total = column_sums if total is None else total + column_sums
+            n_samples += chunk.shape[0]
+        if not n_samples:
+            raise ValueError("Cannot fit a projection on an empty input.")
+        self.n_samples_ = n_samples
+        self.mean_ = total / n_samples
+
+        n_features = len(self.mean_)
+        n_random = min(self.n_components + self.n_oversamples, n_features)
+        rng = np.random.default_rng(self.random_state)
+        basis, _ = np.linalg.qr(rng.standard_normal((n_features, n_random)))
+        for _ in range(self.n_iter):
+            basis, _ = np.linalg.qr(self._covariance_product(chunk_factory, basis))
+
+        # Rayleigh-Ritz step on the small projected covariance
+        projected = basis.T @ self._covariance_product(chunk_factory, basis)
+        eigenvalues, eigenvectors = np.linalg.eigh((projected + projected.T) / 2)
+        order = np.argsort(eigenvalues)[::-1][:self.n_components]
+        components = (basis @ eigenvectors[:, order]).T
+
+        # Deterministic signs: the largest loading of every component is positive
+        signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+        signs[signs == 0] = 1
+        self.components_ = components * signs[:, None]
+        self.explained_variance_ = eigenvalues[order] / max(n_samples - 1, 1)
+        return self
+
+    def fit(self, X):
+        """
+        Fit the projection on an in-memory (sparse or dense) matrix.
+
+        :param X: Matrix of shape (n_samples, n_features).
+        :return: self
+        """
+        X = sp.csr_matrix(X)
+        return self.fit_chunks(lambda: iter([X]))
+
+    def transform(self, X):
+        """
+        Project rows onto the fitted components.
+
+        :param X: Sparse or dense matrix with the fitted number of columns.
+        :return: Dense array of shape (n_samples, n_components).
+        """
+        if self.components_ is None:
+            raise ValueError("The projection has not been fitted yet.")
+        projected = X @ self.components_.T
+        return np.asarray(projected) - self.mean_ @ self.components_.T
+
+    def transform_chunks(self, chunks):
+        """
+        Project row chunks one at a time.
+
+        :param chunks: Iterable of sparse row chunks.
+        :return: Generator of dense (chunk_rows, n_components) arrays.
+        """
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def fit_transform(self, X):
+        """Fit on ``X`` and return its projected coordinates."""
+        return self.fit(X).transform(X)
+
+
+def iter_row_chunks(X, chunk_size=100000):
+    """
+    Split an in-memory sparse matrix into row chunks.
+
+    Parameters:
+        X (sparse matrix): The matrix to split.
+        chunk_size (int): Rows per chunk.
+
+    Returns:
+        generator: CSR row slices of ``X``.
+    """
+    X = sp.csr_matrix(X)
+    for start in range(0, X.shape[0], chunk_size):
+        yield X[start:start + chunk_size]
+
+## ---------------sparse 2-D projection---------------
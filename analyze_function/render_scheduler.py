@@ -0,0 +1,121 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from analyze_function.cache import make_cache_key
+from analyze_function.profiling import count_rows, profile_section
+
+## ---------------figure render scheduler---------------
+# Computes the independent figures of a page in a thread pool and hands each
+# one to its render callback (normally a placeholder) on the script thread as
+# soon as it is ready, so a slow chart no longer holds back the cheap ones.
+# Every task is keyed by its function and arguments (make_cache_key); a task
+# whose key matches the previous run is rendered from the memo without being
+# recomputed, so changing one widget only recomputes the figures that read it.
+
+MAX_WORKERS = int(os.getenv("RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class RenderTask:
+    """
+    One figure to compute and where to draw it.
+    """
+
+    def __init__(self, name, func, args, kwargs, render):
+        """
+        :param name: Unique name of the figure on the page.
+        :param func: Function computing the figure (runs in a worker thread, must not call streamlit).
+        :param args: Positional arguments of ``func``.
+        :param kwargs: Keyword arguments of ``func``.
+        :param render: Callable drawing the result; runs on the script thread.
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.render = render
+        # Fingerprinting happens here, on the script thread, before any worker reads the data
+        self.key = make_cache_key(func, args, kwargs)
+        self.seconds = None
+        self.from_memo = False
+
+
+class RenderScheduler:
+    """
+    Concurrent, incremental computation of the figures of one script run.
+    """
+
+    def __init__(self, memo=None, max_workers: int = MAX_WORKERS):
+        """
+        :param memo: Dict kept across reruns (e.g. in st.session_state) mapping figure
+            name to (key, result) of the last run.
+        :param max_workers: Size of the worker pool.
+        """
+        self.memo = memo if memo is not None else {}
+        self.max_workers = max_workers
+        self.tasks = []
+        self.last_run = []
+
+    def add(self, name, func, *args, render=None, **kwargs):
+        """
+        Register a figure.
+
+        :param name: Unique name of the figure on the page.
+        :param func: Function returning the figure (or whatever ``render`` expects).
+        :param render: Callable receiving the result; typically ``placeholder.plotly_chart``.
+        :return: The RenderTask.
+        """
+        task = RenderTask(name, func, args, kwargs, render)
+        self.tasks.append(task)
+        return task
+
+    def _compute(self, task):
+        start = time.perf_counter()
+        with profile_section(f"render.{task.name}", rows=count_rows(task.args[0]) if task.args else None):
+            result = task.func(*task.args, **task.kwargs)
+        task.seconds = time.perf_counter() - start
+        return result
+
+    def run(self):
+        """
+        Render every registered figure, unchanged ones first, the rest as they finish.
+
+        :return: Dict of figure name to result.
+        """
+        results, pending = {}, []
+        for task in self.tasks:
+            cached = self.memo.get(task.name)
+            if cached is not None and cached[0] == task.key:
+                task.from_memo, task.seconds = True, 0.0
+                results[task.name] = cached[1]
+                if task.render is not None:
+                    task.render(cached[1])
+            else:
+                pending.append(task)
+
+        errors = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+                futures = {executor.submit(self._compute, task): task for task in pending}
+                for future in as_completed(futures):
+                    task = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Keep drawing the other figures; the first failure is raised at the end
+                        print(f"Error computing figure '{task.name}': {e}")
+                        errors.append(e)
+                        continue
+                    self.memo[task.name] = (task.key, result)
+                    results[task.name] = result
+                    if task.render is not None:
+                        task.render(result)
+        self.last_run, self.tasks = self.tasks, []
+        if errors:
+            raise errors[0]
+        return results
+
+    def timings(self):
+        """Seconds spent per figure in the last run (0 for memo hits)."""
+        return {task.name: task.seconds for task in self.last_run}
+
+## ---------------figure render scheduler---------------
@@ -0,0 +1,136 @@
+import pandas as pd
+from analyze_function.profiling import profiled
+
+## ---------------analytics frame schema---------------
+# Declared dtypes of the Scopus 'data' collection columns read by
+# analyze_function. Low-cardinality text becomes categorical, counts become
+# nullable small integers and free text becomes Arrow-backed strings, so the
+# frame behind the Data Insights page stays a fraction of its object-dtype size.
+# Columns missing from the schema are dropped at load time.
+
+ANALYTICS_SCHEMA = {
+    '_id': 'string[pyarrow]',
+    'year': 'Int16',
+    'citedby-count': 'Int32',
+    'prism:publicationName': 'category',
+    'openaccessFlag': 'category',
+    'srctype': 'category',
+    'Funding Agencies': 'string[pyarrow]',
+    'Organizations': 'string[pyarrow]',
+    'Countries': 'string[pyarrow]',
+    'auth-keywords': 'string[pyarrow]',
+    'dc:title': 'string[pyarrow]',
+}
+
+# Columns the Data Insights page needs (charts, year filter and search filter)
+INSIGHTS_COLUMNS = ['_id', 'year', 'citedby-count', 'prism:publicationName', 'openaccessFlag',
+                    'Funding Agencies', 'Organizations']
+
+
+# Function to build the MongoDB projection fetching only the given columns
+def mongo_projection(columns=INSIGHTS_COLUMNS):
+    """
+    Build a MongoDB projection for a list of columns.
+
+    Parameters:
+        columns (list): Columns to fetch.
+
+    Returns:
+        dict: Projection usable with find() and MongoDBHandler.get_all_data.
+    """
+    return {column: 1 for column in columns}
+
+
+# Function to convert one column to its declared dtype
+def cast_column(values, dtype):
+    if dtype.startswith('Int') or dtype.startswith('UInt'):
+        return pd.to_numeric(values, errors='coerce').round().astype(dtype)
+    if dtype == 'category':
+        # Mixed values (e.g. True and 'gold') are compared as text
+        return values.where(values.isna(), values.astype(str)).astype('category')
+    return values.astype(dtype)
+
+
+# Function to load records or a DataFrame into the typed, column-pruned analytics frame
+@profiled()
+def load_typed_frame(data, columns=INSIGHTS_COLUMNS, schema=ANALYTICS_SCHEMA):
+    """
+    Build the typed analytics DataFrame.
+
+    Parameters:
+        data (list | DataFrame): Mongo records or an existing DataFrame.
+        columns (list): Columns to keep; the rest are dropped before any conversion.
+        schema (dict): Column name to dtype.
+
+    Returns:
+        DataFrame: Only ``columns``, cast to their declared dtypes.
+    """
+    if isinstance(data, pd.DataFrame):
+        frame = data.reindex(columns=columns)
+    else:
+        frame = pd.DataFrame.from_records(data, columns=columns)
+    typed = {}
+    for column in columns:
+        dtype = schema.get(column)
+        typed[column] = cast_column(frame[column], dtype) if dtype else frame[column]
+    return pd.DataFrame(typed, index=frame.index)
+
+
+# Function to append typed frames without losing the categorical columns
+def concat_typed_frames(frames):
+    """
+    Concatenate frames built by ``load_typed_frame`` with the same columns.
+
+    Categorical columns are given the union of their categories first, so they
+    stay categorical instead of falling back to object dtype.
+
+    Parameters:
+        frames (list): Typed DataFrames.
+
+    Returns:
+        DataFrame: The rows of every frame with a fresh RangeIndex.
+    """
+    frames = list(frames)
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals([frame[column] for frame in frames]).categories
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+# Function to report the memory of every column
+def memory_report(data, baseline=None):
+    """
+    Report the deep memory usage of every column.
+
+    Parameters:
+        data (DataFrame): The frame to measure.
+        baseline (DataFrame): Optional frame with the same columns (e.g. the untyped
+            original) to compare against.
+
+    Returns:
+        DataFrame: dtype and bytes per column (plus baseline bytes and ratio), with a total row.
+    """
+    usage = data.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': data.dtypes.astype(str), 'bytes': usage})
+    if baseline is not None:
+        report['baseline_bytes'] = baseline.memory_usage(deep=True, index=False).reindex(report.index)
+        report['ratio'] = report['baseline_bytes'] / report['bytes']
+    total = report.sum(numeric_only=True)
+    if 'ratio' in report:
+        total['ratio'] = total['baseline_bytes'] / total['bytes']
+    report.loc['total'] = total
+    report.loc['total', 'dtype'] = ''
+    return report
+
+## ---------------analytics frame schema---------------
+
+
+if __name__ == "__main__":
+    import sys
+    # Usage: python -m analyze_function.schema dataset.csv
+    original = pd.read_csv(sys.argv[1], low_memory=False)
+    typed = load_typed_frame(original)
+    print(memory_report(typed, baseline=original[typed.columns.intersection(original.columns)]).to_string())
+    print(f"Whole CSV frame: {original.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB, "
+          f"typed frame: {typed.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB")
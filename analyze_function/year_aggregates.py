@@ -0,0 +1,222 @@
+import os
+import sys
+import pickle
+import argparse
+import pandas as pd
+from analyze_function.cache import cached_analysis
+from analyze_function.profiling import profiled
+from analyze_function.schema import load_typed_frame, mongo_projection
+
+## ---------------per-year partial aggregates---------------
+# Each year keeps a handful of small tables (citations per journal, open-access
+# counts, agency counts, article count). A year-range query only merges the
+# partials of the selected years instead of rescanning the whole corpus. New
+# papers are folded in by reading only the documents above a saved _id
+# watermark, as the country flow tables are.
+
+YEAR_PARTIALS_PATH = "dataset/year_partials.pkl"
+# Columns read from the data collection to compute the partials
+YEAR_COLUMNS = ['_id', 'year', 'citedby-count', 'prism:publicationName', 'openaccessFlag', 'Funding Agencies']
+
+OPEN_ACCESS_MAPPING = {"gold": "True", "bronze": "True", "green": "True", "hybrid": "True", "diamond": "True", "True": "True"}
+
+
+# Function to compute the partial tables for every year present in the data
+def compute_year_partials(data, journal_column='prism:publicationName', citation_column='citedby-count',
+                          open_access_column='openaccessFlag', agency_column='Funding Agencies'):
+    """
+    Compute the per-year partial aggregates of a dataset.
+
+    Parameters:
+        data (DataFrame): The dataset containing a 'year' column.
+
+    Returns:
+        dict: Mapping of year to a dict of partial tables (Series).
+    """
+    data = data[data['year'].notna()]
+    years = data['year'].astype(int)
+    partials = {year: {'articles': 0} for year in years.unique().tolist()}
+
+    for year, count in years.value_counts().items():
+        partials[year]['articles'] = int(count)
+
+    citations = data[citation_column].fillna(0).groupby([years, data[journal_column]], observed=True).sum()
+    for year, table in citations.groupby(level=0):
+        partials[year]['journal_citations'] = table.droplevel(0)
+
+    # Missing flags stay NaN and are not counted, as in analyze_open_access_trends
+    open_access = data[open_access_column].astype(object).replace(OPEN_ACCESS_MAPPING)
+    open_access_counts = open_access.groupby(years).value_counts()
+    for year, table in open_access_counts.groupby(level=0):
+        partials[year]['open_access'] = table.droplevel(0)
+
+    agencies = pd.DataFrame({'year': years, 'agency': data[agency_column].fillna('').str.split(',')}).explode('agency')
+    agencies['agency'] = agencies['agency'].str.strip()
+    agencies = agencies[agencies['agency'].notna() & (agencies['agency'] != '')]
+    agency_counts = agencies.groupby(['year', 'agency']).size()
+    for year, table in agency_counts.groupby(level=0):
+        partials[year]['agency_counts'] = table.droplevel(0)
+
+    return partials
+
+
+def _merge_tables(tables):
+    """Sum a list of Series sharing the same kind of index."""
+    tables = [table for table in tables if table is not None and len(table)]
+    if not tables:
+        return pd.Series(dtype='int64')
+    return pd.concat(tables).groupby(level=0, observed=True).sum()
+
+
+class YearPartials:
+    """
+    Per-year partial aggregates that answer year-range queries by merging small tables.
+    """
+
+    TABLES = ('journal_citations', 'open_access', 'agency_counts')
+
+    def __init__(self, partials=None, watermark=None):
+        """
+        Initialize the aggregates.
+
+        :param partials: Mapping of year to partial tables as returned by ``compute_year_partials``.
+        :param watermark: Highest Mongo _id already counted, so updates only read newer documents.
+        """
+        self.partials = dict(partials or {})
+        self.watermark = watermark
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Build the aggregates from a full dataset.
+
+        :param data: DataFrame with a 'year' column (and '_id', which sets the watermark).
+        :return: A new YearPartials instance.
+        """
+        watermark = str(data['_id'].max()) if '_id' in data.columns and data['_id'].notna().any() else None
+        return cls(compute_year_partials(data), watermark)
+
+    @property
+    def years(self):
+        return sorted(self.partials)
+
+    def update(self, data, replace=False, watermark=None):
+        """
+        Fold newly ingested records into the aggregates.
+
+        The per-year dicts are never modified in place: touched years get new dicts
+        in a new mapping, so copies sharing the old ones (e.g. a cached instance) keep
+        their counts.
+
+        :param data: DataFrame holding only the new records.
+        :param replace: Overwrite the partials of the years present in ``data`` instead of adding to them.
+        :param watermark: Optional highest _id of the records; the highest seen is kept.
+        :return: self
+        """
+        partials = dict(self.partials)
+        for year, partial in (compute_year_partials(data).items() if len(data) else ()):
+            current = partials.get(year)
+            if replace or current is None:
+                partials[year] = partial
+                continue
+            merged = {'articles': current['articles'] + partial['articles']}
+            for name in self.TABLES:
+                merged[name] = _merge_tables([current.get(name), partial.get(name)])
+            partials[year] = merged
+        self.partials = partials
+        if watermark is not None and (self.watermark is None or watermark > self.watermark):
+            self.watermark = watermark
+        return self
+
+    def query(self, start_year=None, end_year=None):
+        """
+        Merge the partials of every year in ``[start_year, end_year]``.
+
+        :param start_year: First year of the range (inclusive). Defaults to the earliest year.
+        :param end_year: Last year of the range (inclusive). Defaults to the latest year.
+        :return: Dict with 'journal_citations', 'open_access', 'agency_counts' and 'articles_per_year'.
+        """
+        years = [year for year in self.years
+                 if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)]
+        result = {
+            name: _merge_tables([self.partials[year].get(name) for year in years])
+            for name in self.TABLES
+        }
+        result['articles_per_year'] = pd.Series(
+            [self.partials[year]['articles'] for year in years], index=pd.Index(years, name='year'), dtype='int64'
+        )
+        return result
+
+    def save(self, file_path: str):
+        """
+        Save the aggregates to a pickle file.
+
+        :param file_path: Path to save the file.
+        """
+        with open(file_path, "wb") as f:
+            pickle.dump({'partials': self.partials, 'watermark': self.watermark}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Load aggregates saved with ``save``.
+
+        :param file_path: Path of the pickle file.
+        :return: A YearPartials instance.
+        """
+        with open(file_path, "rb") as f:
+            state = pickle.load(f)
+        # Files written before the watermark was saved hold only the year mapping
+        if 'partials' not in state:
+            state = {'partials': state}
+        return cls(state['partials'], state.get('watermark'))
+
+
+@cached_analysis
+@profiled()
+def build_year_partials(data):
+    """
+    Build (and cache) the per-year partial aggregates of a dataset.
+
+    Parameters:
+        data (DataFrame): The dataset containing a 'year' column.
+
+    Returns:
+        YearPartials: The aggregates, reused across reruns for the same data.
+    """
+    return YearPartials.from_data(data)
+
+## ---------------per-year partial aggregates---------------
+
+
+def main(argv=None):
+    """Command line entry point: count new papers into the saved per-year partials."""
+    parser = argparse.ArgumentParser(description="Per-year partial aggregates of the Data Insights page")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser("update", help="Count new papers into the saved partials")
+    update_parser.add_argument("--path", default=YEAR_PARTIALS_PATH)
+    update_parser.add_argument("--collection", default="data")
+    update_parser.add_argument("--chunk-size", type=int, default=50000)
+    update_parser.add_argument("--rebuild", action="store_true", help="Discard the saved partials first")
+    args = parser.parse_args(argv)
+
+    from bson import ObjectId
+    from app.data_collection.db import MongoDBHandler
+    partials = YearPartials.load(args.path) if os.path.exists(args.path) and not args.rebuild else YearPartials()
+    query = {'_id': {'$gt': ObjectId(partials.watermark)}} if partials.watermark else None
+    n_new = 0
+    # Read in _id order so the watermark is the highest _id counted, whatever the natural order
+    for records in MongoDBHandler().iter_chunks(args.collection, args.chunk_size,
+                                                projection=mongo_projection(YEAR_COLUMNS), query=query,
+                                                sort=[('_id', 1)]):
+        chunk = load_typed_frame(records, columns=YEAR_COLUMNS)
+        partials.update(chunk, watermark=str(chunk['_id'].max()))
+        n_new += len(chunk)
+    partials.save(args.path)
+    print(f"Counted {n_new} new papers; {len(partials.years)} years saved to {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,13 @@ import json
 import pandas as pd
 from typing import List
 
+try:
+    from analyze_function.profiling import profiled
+except ImportError:
+    # Scripts run from their own folder without the repository root on sys.path
+    def profiled(stage=None, rows=None):
+        return lambda func: func
+
 
 class MongoDBHandler:
     """
@@ -22,17 +29,42 @@ class MongoDBHandler:
         self.client = pymongo.MongoClient(self.mongo_url)
         self.db = self.client['dsde']
 
-    def get_all_data(self, limit: int = 100):
+    @profiled("mongo.get_all_data", rows=lambda result: sum(len(part) for part in result))
+    def get_all_data(self, limit: int = 100, projection: dict = None):
         """
         Fetch all data from MongoDB.
 
         :param limit: Number of records to fetch.
+        :param projection: Optional MongoDB projection applied to both collections, so unused fields are never transferred.
         :return: Tuple of lists containing data from 'openAlex_data' and 'data' collections.
         """
-        openalex_data = self.db['openAlex_data'].find(limit=limit)
-        data = self.db['data'].find(limit=limit)
+        openalex_data = self.db['openAlex_data'].find(projection=projection, limit=limit)
+        data = self.db['data'].find(projection=projection, limit=limit)
         return list(openalex_data), list(data)
 
+    @profiled("mongo.iter_chunks")
+    def iter_chunks(self, collection_name: str, chunk_size: int = 10000, projection: dict = None,
+                    query: dict = None, sort: list = None):
+        """
+        Stream a collection in chunks instead of loading it all at once.
+
+        :param collection_name: The name of the collection to read.
+        :param chunk_size: Number of records per chunk.
+        :param projection: Optional MongoDB projection limiting the returned fields.
+        :param query: Optional MongoDB filter.
+        :param sort: Optional list of (field, direction) pairs, e.g. [('_id', 1)] for incremental readers.
+        :return: Generator of lists of records.
+        """
+        cursor = self.db[collection_name].find(query or {}, projection, batch_size=chunk_size, sort=sort)
+        chunk = []
+        for record in cursor:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
     def upload_json_csv_to_mongo(self, file_path: str, collection_name: str):
         """
         Upload a JSON or CSV file to MongoDB.
@@ -57,6 +89,36 @@ class MongoDBHandler:
         except Exception as e:
             print(f"Error uploading file to MongoDB: {e}")
 
+    @profiled("mongo.upsert_csv_to_mongo")
+    def upsert_csv_to_mongo(self, file_path: str, collection_name: str, key: str = "dc:identifier",
+                            chunk_size: int = 5000):
+        """
+        Upload a CSV to MongoDB, replacing the documents that already have the same key, so repeated
+        uploads of the same records do not duplicate them. Errors are raised to the caller.
+
+        :param file_path: Path to the CSV file.
+        :param collection_name: The name of the collection to upload the data to.
+        :param key: Column identifying a record; rows without it are skipped.
+        :param chunk_size: Rows sent per bulk write.
+        :return: Tuple of (inserted, replaced, skipped) counts.
+        """
+        collection = self.db[collection_name]
+        collection.create_index(key)
+        inserted = replaced = skipped = 0
+        for df in pd.read_csv(file_path, chunksize=chunk_size):
+            keyed = df[key].notna() if key in df.columns else pd.Series(False, index=df.index)
+            skipped += int((~keyed).sum())
+            operations = [pymongo.ReplaceOne({key: record[key]}, record, upsert=True)
+                          for record in df[keyed].to_dict(orient="records")]
+            if operations:
+                result = collection.bulk_write(operations, ordered=False)
+                inserted += result.upserted_count
+                replaced += result.matched_count
+        print(f"Uploaded {file_path} to '{collection_name}': {inserted} new, {replaced} replaced, "
+              f"{skipped} skipped without '{key}'.")
+        return inserted, replaced, skipped
+
+    @profiled("mongo.upload_data_to_mongo")
     def upload_data_to_mongo(self, data: List[dict], collection_name: str):
         """
         Upload data to MongoDB.
@@ -1,8 +1,11 @@
 import os
+import sys
 import json
+import argparse
 import pandas as pd
 from tqdm import tqdm
 from db import MongoDBHandler
+from search_index import SearchIndex, SEARCH_INDEX_DIR
 from glob import glob
 
 def ensure_list(variable):
@@ -110,7 +113,8 @@ def process_record(file_path):
 
 def process_year(folder_path, year):
     """Process all records for a given year."""
-    records = os.listdir(folder_path)
+    # Sorted so the same records always produce the same CSV (the pipeline compares content hashes)
+    records = sorted(os.listdir(folder_path))
     coredata_list = []
 
     for record in tqdm(records, desc=f"Processing records for year {year}"):
@@ -122,11 +126,11 @@ def process_year(folder_path, year):
     return coredata_list
 
 
-def save_to_csv(data, year):
+def save_to_csv(data, year, output_dir="."):
     """Save processed data to a CSV file."""
     if data:
         df_coredata = pd.DataFrame(data)
-        output_file_path = f"processed_data_{year}.csv"
+        output_file_path = os.path.join(output_dir, f"processed_data_{year}.csv")
         df_coredata.to_csv(output_file_path, index=False)
         print(f"DataFrame saved to {output_file_path}")
     else:
@@ -141,19 +145,20 @@ def add_json_extension(file_path):
             return file_path + ".json"
 
 
-def process_project_data(project_path="Project/"):
+def process_project_data(project_path="Project/", output_dir="."):
     """Main function to process JSON files in the specified directory."""
     data_dir = os.listdir(project_path)
     data_dir = [d for d in data_dir if not d.startswith(".")]
+    os.makedirs(output_dir, exist_ok=True)
     for year in data_dir:
         folder_path = os.path.join(project_path, year)
         data = process_year(folder_path, year)
-        save_to_csv(data, year)
+        save_to_csv(data, year, output_dir)
 
 def merge_csv_files(path: str, output_file: str = "all_processed_data.csv"):
     """Merge all CSV files in the specified directory into a single CSV file."""
     print(f"Merging CSV files in '{path}*.csv' directory...")
-    all_files = glob(path + "*.csv")
+    all_files = sorted(glob(path + "*.csv"))
     print(f"Found {len(all_files)} CSV files in the directory.")
     if not all_files:
         print("No CSV files found in the directory.")
@@ -163,18 +168,37 @@ def merge_csv_files(path: str, output_file: str = "all_processed_data.csv"):
     print(f"Successfully merged {len(all_files)} CSV files into '{output_file}'.")
 
 
-def main():
-    # WARN: Expecting the data to be in the 'Project/' directory
-    PROJECT_PATH = "Project/"
-    add_json_extension(PROJECT_PATH)
-    process_project_data(PROJECT_PATH)
-
-    data_file = "all_processed_data.csv"
-    merge_csv_files(path="./", output_file=data_file)
-
-    mongodb = MongoDBHandler()
-    mongodb.upload_json_csv_to_mongo(file_path=data_file, collection_name="data")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flatten the Scopus JSON records, upload them and index them")
+    parser.add_argument("--project-path", default="Project/", help="Folder with one sub-folder of records per year")
+    parser.add_argument("--output", default="all_processed_data.csv", help="Merged CSV")
+    parser.add_argument("--work-dir", default=".", help="Folder receiving the per-year CSVs")
+    parser.add_argument("--collection", default="data")
+    parser.add_argument("--steps", nargs="+", choices=["clean", "upload", "index"], default=["clean", "upload", "index"],
+                        help="Run only some of the steps (the pipeline runs them as separate stages)")
+    args = parser.parse_args(argv)
+
+    if "clean" in args.steps:
+        if not os.path.isdir(args.project_path):
+            print(f"Project folder '{args.project_path}' not found.")
+            return 1
+        add_json_extension(args.project_path)
+        process_project_data(args.project_path, args.work_dir)
+        merge_csv_files(path=os.path.join(args.work_dir, "processed_data_"), output_file=args.output)
+
+    if "upload" in args.steps or "index" in args.steps:
+        mongodb = MongoDBHandler()
+        if "upload" in args.steps:
+            try:
+                mongodb.upsert_csv_to_mongo(file_path=args.output, collection_name=args.collection)
+            except Exception as e:
+                print(f"Error uploading {args.output} to MongoDB: {e}")
+                return 1
+        if "index" in args.steps:
+            # Index the newly uploaded papers for full-text search
+            SearchIndex.open_or_create(SEARCH_INDEX_DIR).sync_collection(mongodb, args.collection)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
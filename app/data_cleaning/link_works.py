@@ -0,0 +1,381 @@
+import re
+import argparse
+import unicodedata
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+# Cross-source deduplication of the Scopus (`data`) and OpenAlex (`openAlex_data`)
+# collections. Every record gets up to three match keys:
+#   doi         normalised DOI
+#   title_year  normalised title + publication year
+#   issn_title  each ISSN of the venue + normalised title
+# The keys are hashed to 64-bit integers and kept in sorted arrays, so each chunk
+# is matched against everything seen before with one binary search per key
+# (no pairwise comparison). Within a chunk, records sharing any key and the earlier
+# works they reach form connected components; each component becomes one work,
+# merging the earlier works it bridges (union-find over work ids), and the
+# canonical DOI, title, year and ISSNs combine every record of the work. The
+# `match` of a link is the strongest key that joined it. The result is written as a
+# `works` collection with one document per canonical work and the ids of the
+# source records linked to it.
+
+MATCH_KEYS = ['doi', 'title_year', 'issn_title']
+NO_WORK = np.iinfo(np.int64).max
+SOURCE_COLLECTIONS = {'scopus': 'data', 'openalex': 'openAlex_data'}
+SCOPUS_FIELDS = ['prism:doi', 'dc:title', 'prism:coverDate', 'prism:issn', 'prism:eIssn', 'year']
+OPENALEX_FIELDS = ['id', 'doi', 'title', 'publication_year', 'primary_location', 'locations']
+
+
+def _ascii_lower(text: pd.Series) -> pd.Series:
+    """Strip accents and case-fold a string Series."""
+    return text.fillna('').astype(str).map(
+        lambda value: unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode().casefold()
+    )
+
+
+def normalize_doi(doi: pd.Series) -> pd.Series:
+    """Lower-case DOIs without resolver prefixes; missing values become ''."""
+    doi = doi.fillna('').astype(str).str.strip().str.lower()
+    return doi.str.replace(r'^(https?://(dx\.)?doi\.org/|doi:\s*)', '', regex=True)
+
+
+def normalize_title(title: pd.Series) -> pd.Series:
+    """Accent-free, lower-case titles with punctuation removed and whitespace collapsed."""
+    return _ascii_lower(title).str.replace(r'<[^>]+>', ' ', regex=True) \
+        .str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+
+
+def normalize_issn(issn: str) -> str:
+    """Digits and check character of one ISSN, e.g. '1234-567x' -> '1234567X'."""
+    return re.sub(r'[^0-9X]', '', str(issn).upper())
+
+
+def hash_keys(keys: pd.Series) -> np.ndarray:
+    """Hash string keys to uint64; empty keys hash to 0, which is never matched."""
+    values = keys.fillna('').astype(str).to_numpy(dtype=object)
+    hashed = pd.util.hash_array(values, hash_key='work-link-keys-1') if len(values) else np.zeros(0, np.uint64)
+    hashed[values == ''] = 0
+    return hashed
+
+
+def scopus_frame(records: list) -> pd.DataFrame:
+    """
+    Extract the linking fields of Scopus records from the `data` collection.
+
+    :param records: Raw records.
+    :return: DataFrame with record_id, doi, title, year and issns (list) columns.
+    """
+    df = pd.DataFrame.from_records(records).reindex(columns=['_id'] + SCOPUS_FIELDS)
+    year = pd.to_numeric(df['prism:coverDate'].astype(str).str[:4], errors='coerce')
+    year = year.fillna(pd.to_numeric(df['year'], errors='coerce'))
+    issns = (df['prism:issn'].fillna('').astype(str) + ' ' + df['prism:eIssn'].fillna('').astype(str)).str.split()
+    return pd.DataFrame({
+        'record_id': df['_id'].astype(str),
+        'doi': df['prism:doi'],
+        'title': df['dc:title'],
+        'year': year.astype('Int64'),
+        'issns': issns,
+    })
+
+
+def _openalex_issns(primary_location, locations) -> list:
+    """ISSNs of the primary venue, falling back to every listed location."""
+    venues = [primary_location] if isinstance(primary_location, dict) else []
+    if not venues and isinstance(locations, list):
+        venues = locations
+    issns = []
+    for venue in venues:
+        source = venue.get('source') if isinstance(venue, dict) else None
+        if isinstance(source, dict):
+            issns.extend(source.get('issn') or [])
+    return issns
+
+
+def openalex_frame(records: list) -> pd.DataFrame:
+    """
+    Extract the linking fields of OpenAlex records from the `openAlex_data` collection.
+
+    :param records: Raw records.
+    :return: DataFrame with record_id, doi, title, year and issns (list) columns.
+    """
+    df = pd.DataFrame.from_records(records).reindex(columns=['_id'] + OPENALEX_FIELDS)
+    return pd.DataFrame({
+        'record_id': df['id'].fillna(df['_id']).astype(str),
+        'doi': df['doi'],
+        'title': df['title'],
+        'year': pd.to_numeric(df['publication_year'], errors='coerce').astype('Int64'),
+        'issns': [_openalex_issns(primary, locations)
+                  for primary, locations in zip(df['primary_location'], df['locations'])],
+    })
+
+
+def match_keys(frame: pd.DataFrame):
+    """
+    Compute the hashed match keys of a chunk.
+
+    :param frame: Output of scopus_frame/openalex_frame.
+    :return: Tuple of (doi keys, title_year keys, (row, issn_title key) arrays).
+    """
+    title = normalize_title(frame['title'])
+    year = frame['year'].astype(str).where(frame['year'].notna(), '')
+    doi_keys = hash_keys(normalize_doi(frame['doi']))
+    title_year_keys = hash_keys((title + '|' + year).where((title != '') & (year != ''), ''))
+
+    issns = frame['issns'].explode()
+    issns = issns[issns.notna()].map(normalize_issn)
+    rows = frame.index.get_indexer(issns.index)
+    issn_title = (issns.to_numpy(dtype=object) + '|' + title.to_numpy(dtype=object)[rows])
+    issn_title = pd.Series(issn_title).where((issns.to_numpy() != '') & (title.to_numpy()[rows] != ''), '')
+    return doi_keys, title_year_keys, (rows, hash_keys(issn_title))
+
+
+class KeyIndex:
+    """
+    A sorted uint64 -> work id index with vectorized lookups.
+    """
+
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.work_ids = np.zeros(0, dtype=np.int64)
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Find the work of each key.
+
+        :param keys: uint64 keys (0 means no key).
+        :return: Work ids, -1 where the key is unknown.
+        """
+        found = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self.keys) or not len(keys):
+            return found
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        hit = (self.keys[positions] == keys) & (keys != 0)
+        found[hit] = self.work_ids[positions[hit]]
+        return found
+
+    def add(self, keys: np.ndarray, work_ids: np.ndarray):
+        """
+        Insert keys that are not indexed yet; the first work seen for a key is kept.
+
+        :param keys: uint64 keys (0 is skipped).
+        :param work_ids: Work id of each key.
+        """
+        new = (keys != 0) & (self.lookup(keys) < 0)
+        keys, first = np.unique(keys[new], return_index=True)
+        self.keys = np.concatenate([self.keys, keys])
+        self.work_ids = np.concatenate([self.work_ids, work_ids[new][first]])
+        # Both halves are sorted, so the stable sort is a linear merge
+        order = np.argsort(self.keys, kind='stable')
+        self.keys, self.work_ids = self.keys[order], self.work_ids[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def merge_canonical(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine the fields of the records of each work: the first non-empty DOI, title and year, and every
+    (normalised) ISSN.
+
+    :param records: DataFrame with work_id, doi, title, year and issns (list) columns, in record order.
+    :return: One row per work_id with the same columns.
+    """
+    grouped = records.assign(doi=records['doi'].mask(records['doi'] == ''),
+                             title=records['title'].mask(records['title'] == '')).groupby('work_id', sort=True)
+    canonical = grouped[['doi', 'title', 'year']].first()
+    canonical['doi'] = canonical['doi'].fillna('')
+    canonical['year'] = pd.to_numeric(canonical['year'], errors='coerce').astype('Int64')
+    # Split the work-sorted ISSNs at the work boundaries instead of a per-group Python aggregation
+    issns = records[['work_id', 'issns']].explode('issns').dropna()
+    # Scopus and OpenAlex format ISSNs differently ('12345678' vs '1234-5678')
+    issns['issns'] = issns['issns'].map(normalize_issn)
+    issns = issns[issns['issns'] != ''].drop_duplicates()
+    order = np.argsort(issns['work_id'].to_numpy(), kind='stable')
+    work_ids, values = issns['work_id'].to_numpy()[order], issns['issns'].to_numpy(dtype=object)[order]
+    starts = np.flatnonzero(np.r_[True, work_ids[1:] != work_ids[:-1]]) if len(work_ids) else np.zeros(0, int)
+    lists = dict(zip(work_ids[starts], (list(group) for group in np.split(values, starts[1:]))))
+    canonical['issns'] = [lists.get(work_id, []) for work_id in canonical.index]
+    return canonical.reset_index()
+
+
+class WorkLinker:
+    """
+    Streaming linker assigning every record of every source to a canonical work.
+    """
+
+    def __init__(self):
+        self.indexes = {name: KeyIndex() for name in MATCH_KEYS}
+        # Union-find over work ids; a root is always the smallest id of its set
+        self.parent = np.zeros(0, dtype=np.int64)
+        self.canonical = []
+        self.links = []
+
+    @property
+    def n_works(self) -> int:
+        return int((self.parent == np.arange(len(self.parent))).sum())
+
+    def find(self, work_ids: np.ndarray) -> np.ndarray:
+        """
+        Resolve work ids to the id of the work they were merged into.
+
+        :param work_ids: Work ids; negative values are returned unchanged.
+        :return: Root work ids.
+        """
+        work_ids = np.asarray(work_ids, dtype=np.int64)
+        roots = work_ids.copy()
+        valid = roots >= 0
+        while True:
+            parents = self.parent[roots[valid]]
+            if (parents == roots[valid]).all():
+                break
+            roots[valid] = parents
+        self.parent[work_ids[valid]] = roots[valid]
+        return roots
+
+    def add_chunk(self, frame: pd.DataFrame, source: str):
+        """
+        Link one chunk of records.
+
+        :param frame: Output of scopus_frame/openalex_frame.
+        :param source: Name of the source the records come from.
+        :return: DataFrame of links (source, record_id, work_id, match) for the chunk.
+        """
+        frame = frame.reset_index(drop=True)
+        n_rows = len(frame)
+        doi_keys, title_year_keys, (issn_rows, issn_keys) = match_keys(frame)
+        key_sets = (('doi', doi_keys, np.arange(n_rows)),
+                    ('title_year', title_year_keys, np.arange(n_rows)),
+                    ('issn_title', issn_keys, issn_rows))
+        match = np.full(n_rows, 'new', dtype=object)
+        shared = np.full(n_rows, '', dtype=object)
+        sources, targets = [], []
+        previous_rows, previous_works = [], []
+
+        for name, keys, rows in key_sets:
+            # Works of earlier chunks reached by this key, labelled with the strongest key that hit
+            found = self.find(self.indexes[name].lookup(keys))
+            hit = found >= 0
+            match[rows[hit][match[rows[hit]] == 'new']] = name
+            previous_rows.append(rows[hit])
+            previous_works.append(found[hit])
+
+            # Records of this chunk sharing a key: connect each to the first record holding it
+            valid = keys != 0
+            pairs = pd.DataFrame({'key': keys[valid], 'row': rows[valid]}).drop_duplicates()
+            first = pairs.groupby('key')['row'].transform('min').to_numpy()
+            sources.append(pairs['row'].to_numpy())
+            targets.append(first)
+            linked = pairs['row'].to_numpy()[pairs.duplicated('key', keep=False).to_numpy()]
+            shared[linked[shared[linked] == '']] = name
+
+        # Connected components over the records and the earlier works they reach
+        previous_rows, previous_works = np.concatenate(previous_rows), np.concatenate(previous_works)
+        work_codes, touched = pd.factorize(previous_works, sort=True)
+        n_nodes = n_rows + len(touched)
+        sources = np.concatenate(sources + [previous_rows])
+        targets = np.concatenate(targets + [n_rows + work_codes])
+        graph = sp.coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n_nodes, n_nodes))
+        n_components, component = connected_components(graph, directed=False)
+
+        # Every component keeps its smallest earlier work and merges the others into it,
+        # or starts a new work when it reaches none
+        touched = np.asarray(touched, dtype=np.int64)
+        component_work = np.full(n_components, NO_WORK, dtype=np.int64)
+        np.minimum.at(component_work, component[n_rows:], touched)
+        self.parent[touched] = component_work[component[n_rows:]]
+        fresh = component_work == NO_WORK
+        component_work[fresh] = len(self.parent) + np.arange(fresh.sum())
+        self.parent = np.concatenate([self.parent, component_work[fresh]])
+        work = component_work[component[:n_rows]]
+
+        # Records joining a work through another record of this chunk are labelled with the key they share;
+        # the first record of a new work stays 'new'
+        starts = pd.Series(np.arange(n_rows)).groupby(work).transform('min').to_numpy()
+        joined = (match == 'new') & ~(fresh[component[:n_rows]] & (starts == np.arange(n_rows)))
+        match[joined] = shared[joined]
+
+        self.canonical.append(merge_canonical(pd.DataFrame({
+            'work_id': work,
+            'doi': normalize_doi(frame['doi']).to_numpy(),
+            'title': frame['title'].to_numpy(),
+            'year': frame['year'].to_numpy(),
+            'issns': frame['issns'].to_numpy(),
+        })))
+        for name, keys, rows in key_sets:
+            self.indexes[name].add(keys, work[rows])
+
+        links = pd.DataFrame({'source': source, 'record_id': frame['record_id'], 'work_id': work, 'match': match})
+        self.links.append(links)
+        return links
+
+    def works(self) -> pd.DataFrame:
+        """
+        Canonical works with the records linked to each of them.
+
+        :return: DataFrame with work_id, doi, title, year, issns, links (list of dicts) and n_sources.
+        """
+        columns = ['work_id', 'doi', 'title', 'year', 'issns']
+        canonical = pd.concat(self.canonical, ignore_index=True) if self.canonical else pd.DataFrame(columns=columns)
+        # Works merged by a later chunk are combined under their root id, earliest chunk first
+        canonical['work_id'] = self.find(canonical['work_id'].to_numpy(dtype=np.int64))
+        canonical = merge_canonical(canonical) if len(canonical) else canonical
+        links = pd.concat(self.links, ignore_index=True) if self.links else pd.DataFrame(
+            columns=['source', 'record_id', 'work_id', 'match'])
+        links['work_id'] = self.find(links['work_id'].to_numpy(dtype=np.int64))
+        links['link'] = [{'source': source, 'record_id': record_id, 'match': match}
+                         for source, record_id, match in zip(links['source'], links['record_id'], links['match'])]
+        grouped = links.groupby('work_id')
+        canonical['links'] = canonical['work_id'].map(grouped['link'].agg(list))
+        canonical['n_sources'] = canonical['work_id'].map(grouped['source'].nunique()).fillna(0).astype(int)
+        return canonical
+
+    def summary(self) -> dict:
+        """Counts of records, works and matches per key."""
+        links = pd.concat(self.links, ignore_index=True) if self.links else pd.DataFrame(columns=['match'])
+        return {'records': int(len(links)), 'works': self.n_works,
+                **{f"matched_{name}": int((links['match'] == name).sum()) for name in MATCH_KEYS}}
+
+
+def link_collections(mongo_handler, output_collection: str = 'works', chunk_size: int = 50000):
+    """
+    Link the Scopus and OpenAlex collections and write the canonical works collection.
+
+    :param mongo_handler: Connected MongoDBHandler.
+    :param output_collection: Collection replaced with the canonical works.
+    :param chunk_size: Records read per chunk.
+    :return: Summary counts.
+    """
+    linker = WorkLinker()
+    readers = (('scopus', SCOPUS_FIELDS, scopus_frame), ('openalex', OPENALEX_FIELDS, openalex_frame))
+    for source, fields, to_frame in readers:
+        projection = {field: 1 for field in fields}
+        for records in mongo_handler.iter_chunks(SOURCE_COLLECTIONS[source], chunk_size, projection=projection):
+            linker.add_chunk(to_frame(records), source)
+        print(f"Linked {source}: {linker.summary()}")
+
+    works = linker.works()
+    works['year'] = works['year'].astype(object).where(works['year'].notna(), None)
+    collection = mongo_handler.db[output_collection]
+    collection.drop()
+    for start in range(0, len(works), chunk_size):
+        collection.insert_many(works.iloc[start:start + chunk_size].to_dict('records'))
+    collection.create_index('work_id', unique=True)
+    collection.create_index('links.record_id')
+    print(f"Wrote {len(works)} works to '{output_collection}'")
+    return linker.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link Scopus and OpenAlex records into canonical works")
+    parser.add_argument("--output", default="works", help="Collection to write the works to")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+    # pymongo is only needed to run the linker against the database
+    from db import MongoDBHandler
+    print(link_collections(MongoDBHandler(), args.output, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
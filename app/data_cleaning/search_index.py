@@ -0,0 +1,544 @@
+import os
+import re
+import json
+import shutil
+import datetime
+import numpy as np
+import pandas as pd
+
+# On-disk inverted index with BM25 ranking over paper titles, keywords and abstracts.
+#
+# The index is a directory of immutable segments, one per indexed batch, plus a
+# manifest with the global statistics BM25 needs:
+#   <index>/manifest.json
+#   <index>/seg_00000/ids.npy                 external paper ids (bytes)
+#   <index>/seg_00000/lengths.npy             tokens per document and field (uint16)
+#   <index>/seg_00000/<field>.terms.bin       sorted vocabulary, utf-8, concatenated
+#   <index>/seg_00000/<field>.term_offsets.npy
+#   <index>/seg_00000/<field>.df.npy          document frequency per term
+#   <index>/seg_00000/<field>.postings.bin    varint (doc delta, term frequency) pairs
+#   <index>/seg_00000/<field>.post_offsets.npy
+#   <index>/seg_00000/<field>.positions.bin   varint position deltas, for phrase queries
+#   <index>/seg_00000/<field>.pos_offsets.npy
+# Posting lists are delta + varint compressed and read through memory maps, so a
+# query only touches the bytes of its own terms. Encoding and decoding are
+# vectorized with numpy.
+#
+# Query syntax: plain terms, "quoted phrases" and field-scoped clauses such as
+# title:graph or keywords:"machine learning". All clauses must match (AND);
+# matches are ranked by BM25 summed over the searched fields.
+
+SEARCH_INDEX_DIR = os.getenv(
+    "SEARCH_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'dataset', 'search_index'),
+)
+FIELDS = ['title', 'keywords', 'abstract']
+FIELD_WEIGHTS = {'title': 2.0, 'keywords': 1.5, 'abstract': 1.0}
+# Source columns of every indexed field, per Mongo collection
+COLLECTION_FIELDS = {
+    'data': {'title': 'dc:title', 'keywords': 'auth-keywords', 'abstract': 'dc:description'},
+    'openAlex_data': {'title': 'title', 'keywords': None, 'abstract': 'abstract_inverted_index'},
+}
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# Separators take up a position without being indexed, so phrases never span two keywords
+SEPARATED_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[,;.]')
+QUERY_PATTERN = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+MAX_TOKEN_LENGTH = 40
+# Positions are packed with the document number into one int64 for phrase matching
+POSITION_BITS = 20
+K1 = 1.2
+B = 0.75
+
+
+## ---------------varint coding---------------
+def varint_sizes(values):
+    """Number of bytes of every value in LEB128 varint coding."""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    return sizes
+
+
+def varint_encode(values):
+    """Encode non-negative integers as a uint8 varint stream."""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = varint_sizes(values)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    owner = np.repeat(np.arange(len(values)), sizes)
+    shift = (7 * (np.arange(sizes.sum()) - starts[owner])).astype(np.uint64)
+    encoded = ((values[owner] >> shift) & np.uint64(127)).astype(np.uint8)
+    continued = np.ones(len(encoded), dtype=bool)
+    continued[starts + sizes - 1] = False
+    encoded[continued] |= 128
+    return encoded
+
+
+def varint_decode(encoded):
+    """Decode a uint8 varint stream into uint64 values."""
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if not len(encoded):
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(encoded < 128)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    shift = (7 * (np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1))).astype(np.uint64)
+    return np.add.reduceat((encoded & 127).astype(np.uint64) << shift, starts)
+
+## ---------------varint coding---------------
+
+
+## ---------------tokenizing---------------
+def fold_text(texts):
+    """Lower-case, accent-free text; missing values become ''."""
+    return pd.Series(texts, dtype=object).fillna('').astype(str).str.normalize('NFKD') \
+        .str.encode('ascii', 'ignore').str.decode('ascii').str.lower()
+
+
+def tokenize(texts):
+    """
+    Split texts into tokens with their positions.
+
+    :param texts: Iterable of strings, one per document.
+    :return: Tuple of (document number, token, position) arrays.
+    """
+    lists = fold_text(texts).str.findall(SEPARATED_TOKEN_PATTERN)
+    lengths = lists.str.len().to_numpy()
+    documents = np.repeat(np.arange(len(lists)), lengths)
+    tokens = np.array([token[:MAX_TOKEN_LENGTH] for tokens in lists for token in tokens], dtype=object)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    positions = np.arange(len(tokens)) - np.repeat(starts, lengths)
+    words = ~np.isin(tokens, [',', ';', '.'])
+    return documents[words], tokens[words], positions[words]
+
+
+def abstract_text(inverted_index):
+    """Rebuild an OpenAlex abstract from its inverted index."""
+    if not isinstance(inverted_index, dict):
+        return inverted_index if isinstance(inverted_index, str) else ''
+    words = sorted((position, word) for word, places in inverted_index.items() for position in places)
+    return ' '.join(word for _, word in words)
+
+
+def parse_query(query):
+    """
+    Parse a query string into clauses.
+
+    :param query: e.g. 'graph title:"neural network" keywords:dengue'
+    :return: List of (fields, tokens) clauses; several tokens form a phrase.
+    """
+    clauses = []
+    for field, phrase, term in QUERY_PATTERN.findall(query):
+        field = field.lower()
+        if field and field not in FIELDS:
+            # Not a known field: treat "word:rest" as plain text
+            term = f"{field} {phrase or term}"
+            field = ''
+        tokens = TOKEN_PATTERN.findall(fold_text([phrase or term]).iloc[0])
+        tokens = [token[:MAX_TOKEN_LENGTH] for token in tokens]
+        if not tokens:
+            continue
+        fields = [field] if field else list(FIELDS)
+        if phrase:
+            clauses.append((fields, tokens))
+        else:
+            # Unquoted text splits into one clause per token, as in a plain search box
+            clauses.extend((fields, [token]) for token in tokens)
+    return clauses
+
+## ---------------tokenizing---------------
+
+
+## ---------------segments---------------
+def write_segment(path, ids, fields):
+    """
+    Write one immutable segment.
+
+    :param path: Segment directory (created).
+    :param ids: External ids of the documents.
+    :param fields: Mapping of field name to the texts of the documents.
+    :return: Segment statistics for the manifest.
+    """
+    os.makedirs(path)
+    n_docs = len(ids)
+    np.save(os.path.join(path, 'ids.npy'), np.asarray(pd.Series(ids).astype(str), dtype='S'))
+    lengths = np.zeros((n_docs, len(FIELDS)), dtype=np.uint16)
+    stats = {'n_docs': n_docs, 'field_lengths': {}}
+
+    for field_number, field in enumerate(FIELDS):
+        documents, tokens, positions = tokenize(fields.get(field, [''] * n_docs))
+        lengths[:, field_number] = np.minimum(np.bincount(documents, minlength=n_docs), 65535)
+        stats['field_lengths'][field] = int(len(tokens))
+        codes, vocabulary = pd.factorize(tokens, sort=True)
+        n_terms = len(vocabulary)
+
+        # Order by (term, document, position); tokens are already in document order
+        order = np.argsort(codes, kind='stable')
+        codes, documents, positions = codes[order], documents[order], positions[order]
+        new_pair = np.ones(len(codes), dtype=bool)
+        new_pair[1:] = (codes[1:] != codes[:-1]) | (documents[1:] != documents[:-1])
+        pair_starts = np.flatnonzero(new_pair)
+        pair_terms, pair_docs = codes[pair_starts], documents[pair_starts]
+        frequencies = np.diff(np.append(pair_starts, len(codes)))
+
+        # Document numbers are delta coded within each term
+        deltas = pair_docs - np.concatenate([[0], pair_docs[:-1]])
+        first_of_term = np.ones(len(pair_terms), dtype=bool)
+        first_of_term[1:] = pair_terms[1:] != pair_terms[:-1]
+        deltas[first_of_term] = pair_docs[first_of_term]
+        stream = np.empty(2 * len(pair_terms), dtype=np.uint64)
+        stream[0::2], stream[1::2] = deltas, frequencies
+        sizes = varint_sizes(stream)
+        term_bytes = np.bincount(pair_terms, weights=sizes[0::2] + sizes[1::2], minlength=n_terms)
+        post_offsets = np.concatenate([[0], np.cumsum(term_bytes)]).astype(np.int64)
+
+        # Positions are delta coded within each (term, document)
+        position_deltas = positions - np.concatenate([[0], positions[:-1]])
+        position_deltas[new_pair] = positions[new_pair]
+        position_bytes = np.bincount(codes, weights=varint_sizes(position_deltas), minlength=n_terms)
+        pos_offsets = np.concatenate([[0], np.cumsum(position_bytes)]).astype(np.int64)
+
+        encoded_terms = [term.encode() for term in vocabulary]
+        term_offsets = np.concatenate([[0], np.cumsum([len(term) for term in encoded_terms])]).astype(np.int64)
+        with open(os.path.join(path, f'{field}.terms.bin'), 'wb') as f:
+            f.write(b''.join(encoded_terms))
+        np.save(os.path.join(path, f'{field}.term_offsets.npy'), term_offsets)
+        np.save(os.path.join(path, f'{field}.df.npy'), np.bincount(pair_terms, minlength=n_terms).astype(np.int32))
+        varint_encode(stream).tofile(os.path.join(path, f'{field}.postings.bin'))
+        np.save(os.path.join(path, f'{field}.post_offsets.npy'), post_offsets)
+        varint_encode(position_deltas).tofile(os.path.join(path, f'{field}.positions.bin'))
+        np.save(os.path.join(path, f'{field}.pos_offsets.npy'), pos_offsets)
+
+    np.save(os.path.join(path, 'lengths.npy'), lengths)
+    return stats
+
+
+def _memmap_bytes(path):
+    """Memory-map a binary file; empty files become empty arrays (mmap cannot map them)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+class Segment:
+    """
+    Read access to one segment through memory maps.
+    """
+
+    def __init__(self, path: str, base: int):
+        """
+        :param path: Segment directory.
+        :param base: Global number of the segment's first document.
+        """
+        self.path = path
+        self.base = base
+        self.ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r')
+        self.lengths = np.load(os.path.join(path, 'lengths.npy'), mmap_mode='r')
+        self.fields = {}
+        for field in FIELDS:
+            load = lambda name: np.load(os.path.join(path, f'{field}.{name}.npy'), mmap_mode='r')
+            self.fields[field] = {
+                'terms': _memmap_bytes(os.path.join(path, f'{field}.terms.bin')),
+                'term_offsets': load('term_offsets'),
+                'df': load('df'),
+                'postings': _memmap_bytes(os.path.join(path, f'{field}.postings.bin')),
+                'post_offsets': load('post_offsets'),
+                'positions': _memmap_bytes(os.path.join(path, f'{field}.positions.bin')),
+                'pos_offsets': load('pos_offsets'),
+            }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find_term(self, field, term):
+        """Binary search of the vocabulary; returns the term number or -1."""
+        data = self.fields[field]
+        offsets, terms = data['term_offsets'], data['terms']
+        target = term.encode()
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            current = bytes(terms[offsets[middle]:offsets[middle + 1]])
+            if current < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(offsets) - 1 and bytes(terms[offsets[low]:offsets[low + 1]]) == target:
+            return low
+        return -1
+
+    def document_frequency(self, field, term):
+        number = self.find_term(field, term)
+        return int(self.fields[field]['df'][number]) if number >= 0 else 0
+
+    def postings(self, field, term, with_positions=False):
+        """
+        Decode the posting list of a term.
+
+        :return: (local document numbers, term frequencies[, positions per posting]) or None.
+        """
+        number = self.find_term(field, term)
+        if number < 0:
+            return None
+        data = self.fields[field]
+        start, end = data['post_offsets'][number], data['post_offsets'][number + 1]
+        values = varint_decode(data['postings'][start:end])
+        documents = np.cumsum(values[0::2]).astype(np.int64)
+        frequencies = values[1::2].astype(np.int64)
+        if not with_positions:
+            return documents, frequencies
+        start, end = data['pos_offsets'][number], data['pos_offsets'][number + 1]
+        deltas = varint_decode(data['positions'][start:end]).astype(np.int64)
+        # Undo the per-document delta coding
+        totals = np.cumsum(deltas)
+        group_starts = np.concatenate([[0], np.cumsum(frequencies)[:-1]])
+        positions = totals - np.repeat(totals[group_starts] - deltas[group_starts], frequencies)
+        return documents, frequencies, positions
+
+## ---------------segments---------------
+
+
+## ---------------index---------------
+class SearchIndex:
+    """
+    An incrementally built, segment-based full-text index with BM25 ranking.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_DIR):
+        """
+        Open an existing index.
+
+        :param path: Index directory.
+        """
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r') as f:
+            self.manifest = json.load(f)
+        self._segments = None
+
+    @classmethod
+    def open_or_create(cls, path: str = SEARCH_INDEX_DIR):
+        """Open the index at ``path``, creating an empty one when there is none."""
+        if not os.path.exists(os.path.join(path, 'manifest.json')):
+            os.makedirs(path, exist_ok=True)
+            manifest = {'n_docs': 0, 'field_lengths': {field: 0 for field in FIELDS}, 'segments': [],
+                        'watermarks': {}, 'created': datetime.datetime.now().isoformat(timespec='seconds')}
+            with open(os.path.join(path, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f, indent=4)
+        return cls(path)
+
+    def _write_manifest(self):
+        temporary = os.path.join(self.path, 'manifest.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(temporary, os.path.join(self.path, 'manifest.json'))
+
+    @property
+    def n_docs(self):
+        return self.manifest['n_docs']
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self._segments = []
+            base = 0
+            for segment in self.manifest['segments']:
+                self._segments.append(Segment(os.path.join(self.path, segment['name']), base))
+                base += segment['n_docs']
+        return self._segments
+
+    def add(self, ids, fields):
+        """
+        Index a batch of documents as a new segment.
+
+        :param ids: External ids of the documents.
+        :param fields: Mapping of field name (title, keywords, abstract) to texts.
+        :return: Number of indexed documents.
+        """
+        if len(ids) == 0:
+            return 0
+        name = f"seg_{len(self.manifest['segments']):05d}"
+        temporary = os.path.join(self.path, f'{name}.tmp')
+        shutil.rmtree(temporary, ignore_errors=True)
+        stats = write_segment(temporary, ids, fields)
+        os.replace(temporary, os.path.join(self.path, name))
+        self.manifest['segments'].append({'name': name, 'n_docs': stats['n_docs']})
+        self.manifest['n_docs'] += stats['n_docs']
+        for field, length in stats['field_lengths'].items():
+            self.manifest['field_lengths'][field] += length
+        self._write_manifest()
+        self._segments = None
+        return stats['n_docs']
+
+    def add_records(self, records, collection='data', watermark=None):
+        """
+        Index raw Mongo records of a collection.
+
+        :param records: List of records with an _id.
+        :param collection: Source collection; selects the columns of COLLECTION_FIELDS.
+        :param watermark: Optional highest _id of the batch, stored (if above the current one) so syncs resume after it.
+        :return: Number of indexed documents.
+        """
+        columns = COLLECTION_FIELDS[collection]
+        frame = pd.DataFrame.from_records(records)
+        fields = {}
+        for field, column in columns.items():
+            texts = frame[column] if column and column in frame.columns else pd.Series([''] * len(frame))
+            if column == 'abstract_inverted_index':
+                texts = texts.map(abstract_text)
+            fields[field] = texts.tolist()
+        added = self.add(frame['_id'].astype(str).tolist(), fields)
+        current = self.manifest['watermarks'].get(collection)
+        if watermark is not None and (current is None or watermark > current):
+            self.manifest['watermarks'][collection] = watermark
+            self._write_manifest()
+        return added
+
+    def sync_collection(self, mongo_handler, collection='data', chunk_size=200000):
+        """
+        Index the documents of a collection added since the last sync.
+
+        :param mongo_handler: Connected MongoDBHandler.
+        :param collection: Collection to index.
+        :param chunk_size: Documents per segment.
+        :return: Number of newly indexed documents.
+        """
+        from bson import ObjectId
+        watermark = self.manifest['watermarks'].get(collection)
+        query = {'_id': {'$gt': ObjectId(watermark)}} if watermark else None
+        projection = {column: 1 for column in COLLECTION_FIELDS[collection].values() if column}
+        added = 0
+        # Read in _id order so the stored watermark is the highest _id indexed, whatever the natural order
+        for records in mongo_handler.iter_chunks(collection, chunk_size, projection=projection, query=query,
+                                                 sort=[('_id', 1)]):
+            added += self.add_records(records, collection, watermark=str(max(record['_id'] for record in records)))
+        print(f"Indexed {added} new documents from '{collection}' ({self.n_docs} in total)")
+        return added
+
+    def _bm25(self, field, frequencies, lengths, document_frequency):
+        n_docs = max(self.n_docs, 1)
+        average_length = max(self.manifest['field_lengths'][field] / n_docs, 1e-9)
+        idf = np.log(1 + (n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = K1 * (1 - B + B * lengths / average_length)
+        return FIELD_WEIGHTS[field] * idf * frequencies * (K1 + 1) / (frequencies + norm)
+
+    def _term_clause(self, fields, term):
+        documents, scores = [], []
+        for field in fields:
+            field_number = FIELDS.index(field)
+            document_frequency = sum(segment.document_frequency(field, term) for segment in self.segments)
+            if not document_frequency:
+                continue
+            for segment in self.segments:
+                found = segment.postings(field, term)
+                if found is None:
+                    continue
+                local, frequencies = found
+                lengths = np.asarray(segment.lengths[local, field_number], dtype=np.float64)
+                documents.append(local + segment.base)
+                scores.append(self._bm25(field, frequencies, lengths, document_frequency))
+        return documents, scores
+
+    def _phrase_clause(self, fields, tokens):
+        matches = []
+        for field in fields:
+            field_number = FIELDS.index(field)
+            for segment in self.segments:
+                keys = None
+                for offset, token in enumerate(tokens):
+                    found = segment.postings(field, token, with_positions=True)
+                    if found is None:
+                        keys = None
+                        break
+                    local, frequencies, positions = found
+                    # Shift every token back to the phrase start so matches share one key
+                    start = positions - offset
+                    token_keys = (np.repeat(local, frequencies) << POSITION_BITS) + start
+                    token_keys = token_keys[start >= 0]
+                    keys = token_keys if keys is None else np.intersect1d(keys, token_keys)
+                    if not len(keys):
+                        break
+                if keys is not None and len(keys):
+                    local, frequencies = np.unique(keys >> POSITION_BITS, return_counts=True)
+                    lengths = np.asarray(segment.lengths[local, field_number], dtype=np.float64)
+                    matches.append((field, local + segment.base, frequencies, lengths))
+        documents, scores = [], []
+        for field in fields:
+            field_matches = [match for match in matches if match[0] == field]
+            document_frequency = sum(len(match[1]) for match in field_matches)
+            for _, found, frequencies, lengths in field_matches:
+                documents.append(found)
+                scores.append(self._bm25(field, frequencies, lengths, document_frequency))
+        return documents, scores
+
+    def search(self, query, top_k=None):
+        """
+        Find the documents matching every clause of a query, ranked by BM25.
+
+        :param query: Query string (see parse_query).
+        :param top_k: Optional maximum number of results.
+        :return: DataFrame with id and score columns, best first.
+        """
+        clauses = parse_query(query)
+        total = None
+        for fields, tokens in clauses:
+            if len(tokens) == 1:
+                documents, scores = self._term_clause(fields, tokens[0])
+            else:
+                documents, scores = self._phrase_clause(fields, tokens)
+            if not documents:
+                return pd.DataFrame({'id': pd.Series(dtype=str), 'score': pd.Series(dtype=float)})
+            clause = pd.Series(np.concatenate(scores)).groupby(np.concatenate(documents)).sum()
+            total = clause if total is None else total[total.index.isin(clause.index)] + clause[clause.index.isin(total.index)]
+            if not len(total):
+                return pd.DataFrame({'id': pd.Series(dtype=str), 'score': pd.Series(dtype=float)})
+        if total is None:
+            return pd.DataFrame({'id': pd.Series(dtype=str), 'score': pd.Series(dtype=float)})
+        total = total.sort_values(ascending=False)
+        if top_k:
+            total = total.head(top_k)
+        return pd.DataFrame({'id': self.ids_of(total.index.to_numpy()), 'score': total.to_numpy()})
+
+    def ids_of(self, documents):
+        """Map global document numbers to external ids."""
+        documents = np.asarray(documents, dtype=np.int64)
+        bases = np.array([segment.base for segment in self.segments], dtype=np.int64)
+        owners = np.searchsorted(bases, documents, side='right') - 1
+        ids = np.empty(len(documents), dtype=object)
+        for number in np.unique(owners):
+            selected = owners == number
+            segment = self.segments[number]
+            ids[selected] = np.asarray(segment.ids[documents[selected] - segment.base]).astype(str)
+        return ids
+
+    def match_ids(self, query):
+        """Ids of every document matching a query, for filtering other views."""
+        return self.search(query)['id'].to_numpy()
+
+## ---------------index---------------
+
+
+def main():
+    import argparse
+    from db import MongoDBHandler
+    parser = argparse.ArgumentParser(description="Build or query the full-text search index")
+    parser.add_argument("--index-dir", default=SEARCH_INDEX_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subparsers.add_parser("sync", help="Index documents added to Mongo since the last sync")
+    sync_parser.add_argument("--collections", nargs="+", default=list(COLLECTION_FIELDS))
+    query_parser = subparsers.add_parser("query", help="Print the best matches of a query")
+    query_parser.add_argument("query")
+    query_parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = SearchIndex.open_or_create(args.index_dir)
+    if args.command == "sync":
+        mongo_handler = MongoDBHandler()
+        for collection in args.collections:
+            index.sync_collection(mongo_handler, collection)
+    else:
+        print(index.search(args.query, top_k=args.k).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
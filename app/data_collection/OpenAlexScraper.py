@@ -79,7 +79,9 @@ class OpenAlexScraper:
         :return: List of transformed data dictionaries.
         """
         df = pd.DataFrame(data)
+        # id, doi and primary_location are the keys used to link works across sources
         columns_to_keep = [
+            'id', 'doi', 'primary_location',
             'title', 'fwci', 'cited_by_count', 'type', 'type_crossref', 'topics',
             'locations', 'locations_count', 'primary_topic', 'concepts',
             'relevance_score', 'publication_date', 'authorships',
@@ -87,7 +89,7 @@ class OpenAlexScraper:
             'referenced_works', 'apc_list', 'apc_paid'
         ]
 
-        df = df[columns_to_keep]
+        df = df.reindex(columns=columns_to_keep)
         return df.to_dict(orient="records")
 
     def save_file(self, file_path: str, data):
@@ -0,0 +1,431 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import datetime
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analyze_function.geo_flows import NODES_PATH, FLOWS_PATH, COUNTRY_COORD_PATH
+from analyze_function.cluster_artifact import ARTIFACT_PATH
+from analyze_function.model_registry import DEFAULT_MODEL_DIR
+from analyze_function.field_classifier import FIELD_MODEL_NAME, DEFAULT_TRAINING_FILE
+from analyze_function.similarity_index import DEFAULT_INDEX_DIR
+from analyze_function.heavy_hitters import TOP_VALUES_PATH
+from analyze_function.year_aggregates import YEAR_PARTIALS_PATH
+from app.data_cleaning.search_index import SEARCH_INDEX_DIR
+
+## ---------------pipeline orchestrator---------------
+# One command for the whole data path, declared as a DAG of stages:
+#   collect -> clean -> load -> aggregate (geo flows, year partials, top values,
+#   work links, search index) -> model (field classifier, similarity index)
+#   -> viz artifact (clusters)
+# Every stage runs its existing script in a subprocess. A stage is keyed by a
+# hash of its command, its input files and the output hashes of the stages it
+# depends on; when the key and its outputs match the last successful run it is
+# skipped. A stage that reruns but writes identical outputs therefore does not
+# invalidate the stages below it. Stages whose dependencies are done run in
+# parallel, and every run ends with a per-stage timing report.
+#
+# Stages that write to MongoDB have no output files; their output hash is their
+# key, so they rerun exactly when their inputs change. Every stage must be safe
+# to rerun: the upload upserts on the Scopus identifier and the similarity index
+# is rebuilt next to the old one and swapped in.
+
+PIPELINE_STATE_PATH = os.getenv("PIPELINE_STATE", os.path.join(ROOT, "dataset", "pipeline_state.json"))
+PIPELINE_LOG_DIR = os.getenv("PIPELINE_LOG_DIR", os.path.join(ROOT, "dataset", "pipeline_logs"))
+PROJECT_PATH = os.getenv("PROJECT_PATH", os.path.join(ROOT, "app", "data_cleaning", "Project"))
+PROCESSED_DIR = os.path.join(ROOT, "dataset", "processed")
+PROCESSED_CSV = os.path.join(ROOT, "dataset", "all_processed_data.csv")
+COLLECT_OUTPUT = os.path.join(ROOT, "app", "data_collection", "data", "scraped_papers_random2.json")
+DATA_CLEANING_DIR = os.path.join(ROOT, "app", "data_cleaning")
+DATA_COLLECTION_DIR = os.path.join(ROOT, "app", "data_collection")
+HASH_BLOCK_SIZE = 1 << 20
+# Most stages wait on MongoDB or the disk, so they overlap well even on few cores
+DEFAULT_JOBS = int(os.getenv("PIPELINE_JOBS", 4))
+
+
+def _resolve(path):
+    return path if os.path.isabs(path) else os.path.join(ROOT, path)
+
+
+class Stage:
+    """
+    One step of the pipeline.
+    """
+
+    def __init__(self, name, command, group, cwd=ROOT, deps=(), inputs=(), outputs=(), description=""):
+        """
+        :param name: Unique stage name.
+        :param command: Argument list run in a subprocess.
+        :param group: Pipeline phase shown in the report (collect, clean, load, aggregate, model, viz).
+        :param cwd: Working directory of the command.
+        :param deps: Names of the stages that must finish first.
+        :param inputs: Files or folders whose contents key the stage.
+        :param outputs: Files or folders the stage writes; hashed after each run.
+        :param description: One line shown by ``list``.
+        """
+        self.name = name
+        self.command = list(command)
+        self.group = group
+        self.cwd = cwd
+        self.deps = list(deps)
+        self.inputs = [_resolve(path) for path in inputs]
+        self.outputs = [_resolve(path) for path in outputs]
+        self.description = description
+
+
+# Function to declare the stages of the data path
+def default_stages(project_path=PROJECT_PATH):
+    """
+    Build the default DAG.
+
+    Parameters:
+        project_path (str): Folder of raw Scopus records (one sub-folder per year).
+
+    Returns:
+        list: Stage objects in declaration order.
+    """
+    python = sys.executable
+    return [
+        Stage("collect", [python, "main.py"], "collect", cwd=DATA_COLLECTION_DIR,
+              outputs=[COLLECT_OUTPUT],
+              description="Scrape OpenAlex papers into openAlex_data (runs once; --force collect to re-scrape)"),
+        Stage("clean", [python, "formatdata.py", "--project-path", _resolve(project_path), "--work-dir", PROCESSED_DIR,
+                        "--output", PROCESSED_CSV, "--steps", "clean"], "clean", cwd=DATA_CLEANING_DIR,
+              inputs=[project_path], outputs=[PROCESSED_CSV],
+              description="Flatten the raw Scopus records into one CSV"),
+        Stage("load", [python, "formatdata.py", "--output", PROCESSED_CSV, "--steps", "upload"], "load",
+              cwd=DATA_CLEANING_DIR, deps=["clean"],
+              description="Upsert the cleaned CSV into the data collection (keyed on dc:identifier)"),
+        Stage("search_index", [python, "search_index.py", "sync"], "aggregate", cwd=DATA_CLEANING_DIR, deps=["load"],
+              outputs=[os.path.join(SEARCH_INDEX_DIR, "manifest.json")],
+              description="Add new papers to the BM25 full-text index"),
+        Stage("link_works", [python, "link_works.py"], "aggregate", cwd=DATA_CLEANING_DIR, deps=["load", "collect"],
+              description="Link Scopus and OpenAlex records into the works collection"),
+        Stage("geo_flows", [python, "-m", "analyze_function.geo_flows", "update"], "aggregate", deps=["load"],
+              inputs=[COUNTRY_COORD_PATH], outputs=[NODES_PATH, FLOWS_PATH],
+              description="Count new papers into the country node and flow tables"),
+        Stage("year_partials", [python, "-m", "analyze_function.year_aggregates", "update"], "aggregate",
+              deps=["load"], outputs=[YEAR_PARTIALS_PATH],
+              description="Count new papers into the per-year aggregates of the Data Insights page"),
+        Stage("top_values", [python, "-m", "analyze_function.heavy_hitters"], "aggregate", deps=["load"],
+              outputs=[TOP_VALUES_PATH],
+              description="Stream the top keywords and journals out of the data collection"),
+        Stage("field_classifier", [python, "-m", "analyze_function.field_classifier", "train"], "model",
+              inputs=[DEFAULT_TRAINING_FILE], outputs=[os.path.join(DEFAULT_MODEL_DIR, FIELD_MODEL_NAME)],
+              description="Train a new title -> field classifier version"),
+        Stage("similarity_index", [python, "-m", "analyze_function.similarity_index", "build", PROCESSED_CSV,
+                                   "--title-column", "dc:title", "--overwrite"], "model", deps=["clean"],
+              outputs=[DEFAULT_INDEX_DIR],
+              description="Rebuild the similar-paper index from the cleaned CSV"),
+        Stage("cluster_artifact", [python, "-m", "analyze_function.cluster_artifact"], "viz", deps=["load"],
+              outputs=[ARTIFACT_PATH],
+              description="Rebuild the ML page's cluster scatter artifact"),
+    ]
+
+
+class FileHasher:
+    """
+    Content hashes of files and folders, memoised by size and modification time.
+    """
+
+    def __init__(self, memo=None):
+        """
+        :param memo: Dict of path -> [size, mtime_ns, digest] kept from previous runs.
+        """
+        self.memo = memo if memo is not None else {}
+        self._lock = threading.Lock()
+
+    def file_digest(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self.memo.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        with self._lock:
+            self.memo[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def digest(self, path):
+        """
+        Hash a file, or every file under a folder together with its relative path.
+
+        :param path: File or folder.
+        :return: Hex digest, or None when the path does not exist.
+        """
+        if os.path.isfile(path):
+            return self.file_digest(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.blake2b(digest_size=16)
+        for folder, subfolders, files in os.walk(path):
+            subfolders.sort()
+            for name in sorted(files):
+                file_path = os.path.join(folder, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                digest.update(self.file_digest(file_path).encode())
+        return digest.hexdigest()
+
+
+class Pipeline:
+    """
+    Runs a DAG of stages, skipping the ones whose inputs did not change.
+    """
+
+    def __init__(self, stages, state_path=PIPELINE_STATE_PATH, log_dir=PIPELINE_LOG_DIR):
+        """
+        :param stages: List of Stage objects.
+        :param state_path: JSON file keeping the keys and output hashes of the last successful runs.
+        :param log_dir: Folder receiving one log file per stage run.
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+        self.state_path = state_path
+        self.log_dir = log_dir
+        self.state = self._load_state()
+        self.hasher = FileHasher(self.state.setdefault("files", {}))
+        self._check_acyclic()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading pipeline state {self.state_path}, starting fresh: {e}")
+        return {"stages": {}, "files": {}}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temporary_path = self.state_path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(temporary_path, self.state_path)
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in pipeline: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+    def closure(self, targets=None):
+        """
+        The targets and every stage they depend on, in declaration order.
+
+        :param targets: Stage names; None selects every stage.
+        :return: List of stage names.
+        """
+        if not targets:
+            return list(self.stages)
+        unknown = [name for name in targets if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}; choose from {list(self.stages)}")
+        selected, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in selected]
+
+    def stage_key(self, stage):
+        """Hash of the command, the input contents and the recorded outputs of the dependencies."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps([stage.name, stage.command, os.path.relpath(stage.cwd, ROOT)]).encode())
+        for path in stage.inputs:
+            digest.update(f"{os.path.relpath(path, ROOT)}={self.hasher.digest(path)}".encode())
+        for dep in stage.deps:
+            digest.update(f"{dep}={self.state['stages'].get(dep, {}).get('output')}".encode())
+        return digest.hexdigest()
+
+    def output_hash(self, stage, key):
+        if not stage.outputs:
+            return key
+        digest = hashlib.blake2b(digest_size=16)
+        for path in stage.outputs:
+            digest.update(f"{os.path.relpath(path, ROOT)}={self.hasher.digest(path)}".encode())
+        return digest.hexdigest()
+
+    def is_fresh(self, stage, key):
+        """True when the last successful run had the same key and its outputs are unchanged."""
+        recorded = self.state["stages"].get(stage.name)
+        if not recorded or recorded.get("key") != key:
+            return False
+        if any(not os.path.exists(path) for path in stage.outputs):
+            return False
+        return self.output_hash(stage, key) == recorded.get("output")
+
+    def _execute(self, stage):
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_path = os.path.join(self.log_dir, f"{stage.name}.log")
+        env = dict(os.environ)
+        # Script-style stages import analyze_function from the repository root
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+        start = time.perf_counter()
+        with open(log_path, "w") as log:
+            returncode = subprocess.run(stage.command, cwd=stage.cwd, env=env, stdout=log,
+                                        stderr=subprocess.STDOUT).returncode
+        return returncode, time.perf_counter() - start, log_path
+
+    def run(self, targets=None, force=(), jobs=None, dry_run=False):
+        """
+        Run the selected stages and their dependencies.
+
+        :param targets: Stage names to bring up to date; None runs every stage.
+        :param force: Stage names to rerun even when fresh (``'all'`` forces every stage).
+        :param jobs: Stages run at the same time; defaults to DEFAULT_JOBS.
+        :param dry_run: Only report which stages would run.
+        :return: List of report rows (stage, group, status, seconds, log).
+        """
+        selected = self.closure(targets)
+        force = set(selected) if "all" in force else set(force)
+        jobs = jobs or DEFAULT_JOBS
+        status, report = {}, {}
+        remaining = list(selected)
+        running = {}
+
+        def finish(name, result, seconds=0.0, log=None):
+            status[name] = result
+            report[name] = {"stage": name, "group": self.stages[name].group, "status": result,
+                            "seconds": seconds, "log": log}
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while remaining or running:
+                for name in list(remaining):
+                    stage = self.stages[name]
+                    if any(status.get(dep) in ("failed", "blocked") for dep in stage.deps if dep in selected):
+                        remaining.remove(name)
+                        finish(name, "blocked")
+                        continue
+                    if any(dep in selected and dep not in status for dep in stage.deps):
+                        continue
+                    remaining.remove(name)
+                    key = self.stage_key(stage)
+                    if dry_run:
+                        # Without running, a dependency that would rerun makes its dependents stale too
+                        stale = name in force or not self.is_fresh(stage, key) or any(
+                            status.get(dep) == "would run" for dep in stage.deps)
+                        finish(name, "would run" if stale else "fresh")
+                    elif name not in force and self.is_fresh(stage, key):
+                        finish(name, "skipped")
+                    else:
+                        print(f"[{datetime.datetime.now():%H:%M:%S}] start {name}")
+                        running[executor.submit(self._execute, stage)] = (name, key)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    stage = self.stages[name]
+                    try:
+                        returncode, seconds, log_path = future.result()
+                    except OSError as e:
+                        print(f"Error starting stage '{name}': {e}")
+                        finish(name, "failed")
+                        continue
+                    if returncode != 0:
+                        print(f"Stage '{name}' failed with exit code {returncode}; see {log_path}")
+                        finish(name, "failed", seconds, log_path)
+                        continue
+                    missing = [path for path in stage.outputs if not os.path.exists(path)]
+                    if missing:
+                        print(f"Stage '{name}' did not write {missing}; see {log_path}")
+                        finish(name, "failed", seconds, log_path)
+                        continue
+                    self.state["stages"][name] = {
+                        "key": key,
+                        "output": self.output_hash(stage, key),
+                        "seconds": seconds,
+                        "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+                    }
+                    self._save_state()
+                    print(f"[{datetime.datetime.now():%H:%M:%S}] done  {name} ({seconds:.1f}s)")
+                    finish(name, "ran", seconds, log_path)
+        return [report[name] for name in selected]
+
+## ---------------pipeline orchestrator---------------
+
+
+def format_report(rows, wall_seconds):
+    """Render the per-stage timing report."""
+    lines = [f"{'stage':<18} {'group':<10} {'status':<10} {'seconds':>9}"]
+    for row in rows:
+        seconds = f"{row['seconds']:.1f}" if row["status"] in ("ran", "failed") else "-"
+        lines.append(f"{row['stage']:<18} {row['group']:<10} {row['status']:<10} {seconds:>9}")
+    busy = sum(row["seconds"] for row in rows)
+    lines.append(f"wall {wall_seconds:.1f}s, stage time {busy:.1f}s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Command line entry point: run, plan or list the pipeline stages."""
+    parser = argparse.ArgumentParser(description="Run the data pipeline as a cached, parallel DAG of stages")
+    parser.add_argument("--project-path", default=PROJECT_PATH, help="Raw Scopus records, one sub-folder per year")
+    parser.add_argument("--state", default=PIPELINE_STATE_PATH, help="Where stage keys and output hashes are kept")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Bring the given stages (default: all) up to date")
+    run_parser.add_argument("stages", nargs="*")
+    run_parser.add_argument("--force", nargs="+", default=[], help="Stage names to rerun anyway, or 'all'")
+    run_parser.add_argument("--jobs", "-j", type=int, default=None, help="Stages run in parallel")
+    run_parser.add_argument("--report", default=None, help="Also write the timing report as JSON")
+    plan_parser = subparsers.add_parser("plan", help="Show which stages would run")
+    plan_parser.add_argument("stages", nargs="*")
+    plan_parser.add_argument("--force", nargs="+", default=[])
+    subparsers.add_parser("list", help="Show the stages and their dependencies")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(default_stages(args.project_path), state_path=args.state)
+    if args.command == "list":
+        for stage in pipeline.stages.values():
+            recorded = pipeline.state["stages"].get(stage.name, {})
+            last = f"last run {recorded['finished']} ({recorded['seconds']:.1f}s)" if recorded else "never run"
+            print(f"{stage.name:<18} {stage.group:<10} after {', '.join(stage.deps) or '-':<16} {last}")
+            print(f"{'':<18} {stage.description}")
+        return 0
+
+    try:
+        if args.command == "plan":
+            rows = pipeline.run(args.stages, force=args.force, dry_run=True)
+            for row in rows:
+                print(f"{row['stage']:<18} {row['status']}")
+            return 0
+        start = time.perf_counter()
+        rows = pipeline.run(args.stages, force=args.force, jobs=args.jobs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    wall_seconds = time.perf_counter() - start
+    print(format_report(rows, wall_seconds))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"wall_seconds": wall_seconds, "stages": rows}, f, indent=1)
+    return 1 if any(row["status"] in ("failed", "blocked") for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+## ---------------import-time budget---------------
+# Cold-start import profile of every Streamlit page. The top-level import
+# statements of a page are executed in a fresh interpreter started with
+# -X importtime, so the numbers are what a new Streamlit session pays before
+# the page draws anything. A page over its budget makes the script exit
+# non-zero.
+#
+# Usage (from the repository root):
+#   python benchmarks/import_budget.py              # every page
+#   python benchmarks/import_budget.py --top 15     # also list the slowest modules
+#   python benchmarks/import_budget.py --json out.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['Introduction.py'] + sorted(os.path.join('pages', name) for name in os.listdir(os.path.join(ROOT, 'pages'))
+                                     if name.endswith('.py'))
+# Seconds of imports allowed per page; streamlit itself accounts for most of it
+DEFAULT_BUDGET = 1.25
+PAGE_BUDGETS = {
+    'Introduction.py': 1.0,
+    # These pages cannot draw anything without pandas (and pydeck for the map), so lazy
+    # imports would only move the cost past the measurement. The map measured 1.26s on a
+    # slow machine; both pages get that plus headroom.
+    os.path.join('pages', '2_🌍_Mapping_Demo.py'): 1.6,
+    os.path.join('pages', '3_🤖_ML_Predictions.py'): 1.6,
+}
+IMPORTTIME_PATTERN = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# Runs inside the child interpreter: every import statement is tried on its own so a
+# missing optional dependency is reported instead of hiding the cost of the rest
+CHILD_SCRIPT = """
+import sys, json, time
+preloaded = sorted(sys.modules)
+failed = []
+start = time.perf_counter()
+for statement in json.loads(sys.argv[1]):
+    try:
+        exec(statement, {})
+    except Exception as e:
+        failed.append([statement, f"{type(e).__name__}: {e}"])
+print(json.dumps({"seconds": time.perf_counter() - start, "failed": failed, "preloaded": preloaded}))
+"""
+
+
+# Function to collect the top-level import statements of a page
+def page_imports(page_path):
+    with open(page_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+# Function to profile the cold-start imports of one page
+def profile_page(page, python=sys.executable):
+    """
+    Import everything a page imports in a fresh interpreter.
+
+    Parameters:
+        page (str): Page path relative to the repository root.
+        python (str): Interpreter to use.
+
+    Returns:
+        dict: Wall seconds, failed imports and the cumulative time of every module imported.
+    """
+    statements = page_imports(os.path.join(ROOT, page))
+    completed = subprocess.run([python, '-X', 'importtime', '-c', CHILD_SCRIPT, json.dumps(statements)],
+                               cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Profiling {page} failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    preloaded = set(result.pop('preloaded'))
+    modules = {}
+    for self_us, cumulative_us, indent, name in IMPORTTIME_PATTERN.findall(completed.stderr):
+        # Only top-level entries (no extra indentation) carry the full cost of a package;
+        # modules loaded by interpreter startup are not the page's cost
+        if len(indent) == 1 and name not in preloaded:
+            modules[name] = modules.get(name, 0) + int(cumulative_us) / 1e6
+    result['modules'] = dict(sorted(modules.items(), key=lambda item: -item[1]))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cold-start import time of every page")
+    parser.add_argument("pages", nargs="*", default=PAGES)
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level modules to list per page")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page; the fastest one counts")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results, over_budget = {}, []
+    for page in args.pages:
+        runs = [profile_page(page) for _ in range(args.repeat)]
+        result = min(runs, key=lambda run: run['seconds'])
+        budget = PAGE_BUDGETS.get(page, DEFAULT_BUDGET)
+        result['budget'] = budget
+        results[page] = result
+        status = 'ok' if result['seconds'] <= budget else 'OVER BUDGET'
+        print(f"{page}: {result['seconds']:.2f}s (budget {budget:.1f}s) {status}")
+        for name, seconds in list(result['modules'].items())[:args.top]:
+            print(f"    {seconds:6.3f}s  {name}")
+        for statement, error in result['failed']:
+            print(f"    not measured: {statement} ({error})")
+        if result['seconds'] > budget:
+            over_budget.append(page)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+    if over_budget:
+        print(f"{len(over_budget)} page(s) over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+## ---------------import-time budget---------------
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The ingestion scripts import their siblings script-style (`from db import MongoDBHandler`)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'app', 'data_cleaning')]
+
+import synthetic
+
+## ---------------benchmark suite---------------
+# End-to-end benchmarks of ingestion, analytics and ML on seeded synthetic data
+# (10k, 100k and 1M papers). Every case reports wall time (best of --repeat
+# runs), peak Python memory (a separate tracemalloc run, so tracing does not
+# inflate the timings) and throughput. Results are written as JSON; with
+# --baseline the run fails when a case is slower or larger than the baseline by
+# more than --threshold.
+#
+# MongoDB cases use mongomock when it is installed, or a real server with
+# --mongo-url (a throwaway 'dsde_benchmark' database is used and dropped).
+# Cases whose dependencies are missing are reported as skipped.
+#
+# Usage (from the repository root):
+#   python benchmarks/run_benchmarks.py --sizes 10k 100k --output benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --sizes 10k 100k --baseline benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --cases analytics.* --sizes 1m
+
+DEFAULT_SIZES = ['10k', '100k']
+DEFAULT_THRESHOLD = 0.25
+# Differences below these are noise, whatever the relative change
+MIN_SECONDS_DELTA = 0.02
+MIN_MEMORY_DELTA_MB = 2.0
+
+CASES = []
+
+
+class Skip(Exception):
+    """Raised by a case whose optional dependency or service is unavailable."""
+
+
+class BenchmarkCase:
+    """
+    One benchmarked operation.
+    """
+
+    def __init__(self, name, func, max_size=None, unit='papers'):
+        """
+        :param name: Dotted name, e.g. 'analytics.create_edges'.
+        :param func: Callable taking the Context and returning a zero-argument callable to time,
+            or (callable, items processed per call) when the items are not the papers.
+        :param max_size: Largest dataset the case runs on (None for all).
+        :param unit: What the throughput counts.
+        """
+        self.name = name
+        self.func = func
+        self.max_size = max_size
+        self.unit = unit
+
+
+# Decorator registering a benchmark case
+def benchmark(name, max_size=None, unit='papers'):
+    def decorator(func):
+        CASES.append(BenchmarkCase(name, func, max_size, unit))
+        return func
+    return decorator
+
+
+def uncached(func):
+    """The function behind a cached_analysis wrapper, so every run does the work."""
+    return getattr(func, '__wrapped__', func)
+
+
+class Context:
+    """
+    Lazily built inputs shared by the cases of one dataset size.
+    """
+
+    def __init__(self, n, seed=42, mongo_url=None, work_dir=None):
+        self.n = n
+        self.seed = seed
+        self.mongo_url = mongo_url
+        self.work_dir = work_dir
+        self._values = {}
+
+    def get(self, name, build):
+        if name not in self._values:
+            self._values[name] = build()
+        return self._values[name]
+
+    @property
+    def papers(self):
+        return self.get('papers', lambda: synthetic.papers_frame(self.n, self.seed))
+
+    @property
+    def records(self):
+        return self.get('records', lambda: self.papers.to_dict('records'))
+
+    @property
+    def training(self):
+        return self.get('training', lambda: synthetic.training_frame(self.n, self.seed))
+
+    def path(self, name):
+        return os.path.join(self.work_dir, f"{name}_{self.n}")
+
+    def mongo_handler(self):
+        """A MongoDBHandler on mongomock or on the --mongo-url server, with empty collections."""
+        try:
+            from db import MongoDBHandler
+        except ImportError as e:
+            raise Skip(f"db module unavailable ({e})")
+        handler = MongoDBHandler.__new__(MongoDBHandler)
+        if self.mongo_url:
+            import pymongo
+            handler.client = pymongo.MongoClient(self.mongo_url)
+        else:
+            try:
+                import mongomock
+            except ImportError:
+                raise Skip("mongomock is not installed and no --mongo-url was given")
+            handler.client = mongomock.MongoClient()
+        handler.client.drop_database('dsde_benchmark')
+        handler.db = handler.client['dsde_benchmark']
+        return handler
+
+
+## ---------------ingestion cases---------------
+@benchmark('ingestion.process_record', max_size=100000, unit='files')
+def bench_process_record(ctx):
+    from formatdata import process_record
+    paths = ctx.get('scopus_files', lambda: synthetic.write_scopus_files(ctx.papers, ctx.path('scopus_files')))
+    return lambda: [process_record(path) for path in paths]
+
+
+@benchmark('ingestion.upload_data_to_mongo', max_size=100000, unit='records')
+def bench_upload(ctx):
+    handler = ctx.mongo_handler()
+
+    def run():
+        handler.db['data'].drop()
+        # insert_many adds _id to the dicts it receives, so upload fresh copies
+        handler.upload_data_to_mongo([dict(record) for record in ctx.records], 'data')
+    return run
+
+
+@benchmark('ingestion.get_all_data', max_size=100000, unit='records')
+def bench_get_all_data(ctx):
+    from analyze_function.schema import INSIGHTS_COLUMNS, mongo_projection
+    handler = ctx.mongo_handler()
+    handler.db['data'].insert_many([dict(record) for record in ctx.records])
+    return lambda: handler.get_all_data(limit=0, projection=mongo_projection(INSIGHTS_COLUMNS))
+
+
+@benchmark('ingestion.iter_chunks', max_size=100000, unit='records')
+def bench_iter_chunks(ctx):
+    handler = ctx.mongo_handler()
+    handler.db['data'].insert_many([dict(record) for record in ctx.records])
+    return lambda: sum(len(chunk) for chunk in handler.iter_chunks('data', 20000))
+
+
+@benchmark('ingestion.load_typed_frame', unit='records')
+def bench_load_typed_frame(ctx):
+    from analyze_function.schema import load_typed_frame
+    records = ctx.records
+    return lambda: load_typed_frame(records)
+
+
+@benchmark('ingestion.search_index_add', unit='papers')
+def bench_search_index_add(ctx):
+    from search_index import SearchIndex
+    records = ctx.records
+
+    def run():
+        shutil.rmtree(ctx.path('search_index'), ignore_errors=True)
+        index = SearchIndex.open_or_create(ctx.path('search_index'))
+        for start in range(0, len(records), 200000):
+            index.add_records(records[start:start + 200000], 'data')
+    return run
+
+
+@benchmark('ingestion.link_works', unit='records')
+def bench_link_works(ctx):
+    from link_works import WorkLinker, scopus_frame, openalex_frame
+    scopus = scopus_frame(ctx.records)
+    openalex = openalex_frame(ctx.get('openalex', lambda: synthetic.openalex_records(ctx.papers, seed=ctx.seed)))
+
+    def run():
+        linker = WorkLinker()
+        linker.add_chunk(scopus, 'scopus')
+        linker.add_chunk(openalex, 'openalex')
+        return linker.works()
+    return run
+
+## ---------------ingestion cases---------------
+
+
+## ---------------analytics cases---------------
+@benchmark('analytics.search_query', unit='queries')
+def bench_search_query(ctx):
+    from search_index import SearchIndex
+    path = ctx.path('search_query_index')
+
+    def build():
+        shutil.rmtree(path, ignore_errors=True)
+        index = SearchIndex.open_or_create(path)
+        for start in range(0, len(ctx.records), 200000):
+            index.add_records(ctx.records[start:start + 200000], 'data')
+        return SearchIndex(path)
+    index = ctx.get('search_index', build)
+    queries = ['deep learning', '"neural network"', 'title:protein', 'keywords:dengue climate', 'term1 term2 term3']
+    return (lambda: [index.match_ids(query) for query in queries]), len(queries)
+
+
+@benchmark('analytics.compute_year_partials')
+def bench_year_partials(ctx):
+    from analyze_function.year_aggregates import compute_year_partials
+    return lambda: compute_year_partials(ctx.papers)
+
+
+@benchmark('analytics.analyze_top_cited_journals')
+def bench_top_cited(ctx):
+    from analyze_function.data_insights import analyze_top_cited_journals
+    return lambda: uncached(analyze_top_cited_journals)(ctx.papers)
+
+
+@benchmark('analytics.analyze_open_access_trends')
+def bench_open_access(ctx):
+    from analyze_function.data_insights import analyze_open_access_trends
+    return lambda: uncached(analyze_open_access_trends)(ctx.papers)
+
+
+@benchmark('analytics.analyze_funding_agencies')
+def bench_funding_agencies(ctx):
+    from analyze_function.data_insights import analyze_funding_agencies
+    return lambda: uncached(analyze_funding_agencies)(ctx.papers, keyword='Chulalongkorn')
+
+
+@benchmark('analytics.create_edges')
+def bench_create_edges(ctx):
+    from analyze_function.data_insights import create_edges
+    from analyze_function.heavy_hitters import top_values
+    top_agencies = top_values(ctx.papers, 'Funding Agencies', 10).index
+    return lambda: create_edges(ctx.papers, 'Funding Agencies', top_agencies)
+
+
+@benchmark('analytics.analyze_connection_node')
+def bench_connection_node(ctx):
+    from analyze_function.data_insights import analyze_connection_node
+    return lambda: uncached(analyze_connection_node)(ctx.papers)
+
+
+@benchmark('analytics.article_per_year')
+def bench_article_per_year(ctx):
+    from analyze_function.data_insights import article_per_year
+    return lambda: uncached(article_per_year)(ctx.papers)
+
+
+@benchmark('analytics.top_values')
+def bench_top_values(ctx):
+    from analyze_function.heavy_hitters import top_values
+    return lambda: top_values(ctx.papers, 'Organizations', 10)
+
+
+@benchmark('analytics.collaboration_graph')
+def bench_collaboration_graph(ctx):
+    from analyze_function.collaboration_graph import CollaborationGraph
+
+    def run():
+        graph = CollaborationGraph.from_data(ctx.papers, 'Funding Agencies')
+        return graph.communities(), graph.pagerank()
+    return run
+
+
+@benchmark('analytics.count_country_links')
+def bench_country_links(ctx):
+    from analyze_function.geo_flows import CountryAliasIndex, count_country_links
+    alias_index = CountryAliasIndex.build()
+    return lambda: count_country_links(ctx.papers['Countries'], alias_index)
+
+## ---------------analytics cases---------------
+
+
+## ---------------ML cases---------------
+@benchmark('ml.analyze_webscrape', max_size=100000, unit='titles')
+def bench_analyze_webscrape(ctx):
+    from analyze_function.ml_processing import analyze_webscrape
+    return lambda: analyze_webscrape(ctx.training.copy())
+
+
+@benchmark('ml.streaming_clusterer', unit='titles')
+def bench_streaming_clusterer(ctx):
+    from analyze_function.ml_processing import StreamingTextClusterer
+    chunks = lambda: (ctx.training.iloc[start:start + 50000] for start in range(0, ctx.n, 50000))
+    return lambda: StreamingTextClusterer(n_clusters=10, chunk_size=50000).fit(chunks)
+
+
+@benchmark('ml.field_classifier_fit', max_size=100000, unit='titles')
+def bench_field_classifier_fit(ctx):
+    from analyze_function.field_classifier import FieldClassifier
+    return lambda: FieldClassifier().fit(ctx.training['title'], ctx.training['field'])
+
+
+@benchmark('ml.field_classifier_predict', unit='titles')
+def bench_field_classifier_predict(ctx):
+    from analyze_function.field_classifier import FieldClassifier
+    sample = ctx.training.head(20000)
+    classifier = FieldClassifier().fit(sample['title'], sample['field'])
+    return lambda: classifier.predict(ctx.training['title'])
+
+
+@benchmark('ml.similarity_build', max_size=100000, unit='papers')
+def bench_similarity_build(ctx):
+    from analyze_function.similarity_index import SimilarityIndex
+
+    def run():
+        shutil.rmtree(ctx.path('similarity'), ignore_errors=True)
+        return SimilarityIndex.build(ctx.path('similarity'), ctx.papers['_id'], ctx.papers['dc:title'], dim=64)
+    return run
+
+## ---------------ML cases---------------
+
+
+# Function to measure one case on one context
+def measure(case, ctx, repeat=3, memory=True):
+    """
+    Time a case and measure its peak memory.
+
+    Parameters:
+        case (BenchmarkCase): The case.
+        ctx (Context): Inputs of one dataset size.
+        repeat (int): Timed runs; the fastest counts.
+        memory (bool): Also run once under tracemalloc.
+
+    Returns:
+        dict: seconds, peak_mb, throughput and the per-run timings.
+    """
+    run, items = case.func(ctx), ctx.n
+    if isinstance(run, tuple):
+        run, items = run
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    result = {'seconds': min(timings), 'runs': timings, 'n': items, 'unit': case.unit,
+              'throughput': items / min(timings) if min(timings) > 0 else None}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+# Function to compare results with a baseline
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Find the cases that got slower or bigger than the baseline.
+
+    Parameters:
+        results (dict): 'results' mapping of this run.
+        baseline (dict): 'results' mapping of the baseline run.
+        threshold (float): Allowed relative increase, e.g. 0.25 for 25%.
+
+    Returns:
+        list: (case key, metric, baseline value, current value) for every regression.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or 'seconds' not in previous or 'seconds' not in current:
+            continue
+        for metric, noise in (('seconds', MIN_SECONDS_DELTA), ('peak_mb', MIN_MEMORY_DELTA_MB)):
+            if metric not in current or metric not in previous:
+                continue
+            if current[metric] > previous[metric] * (1 + threshold) and current[metric] - previous[metric] > noise:
+                regressions.append((key, metric, previous[metric], current[metric]))
+    return regressions
+
+
+def main(argv=None):
+    import fnmatch
+    parser = argparse.ArgumentParser(description="Run the ingestion, analytics and ML benchmarks")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, choices=list(synthetic.SIZES))
+    parser.add_argument("--cases", nargs="+", default=['*'], help="Glob patterns of case names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--mongo-url", help="Benchmark against this MongoDB server instead of mongomock")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Fail on regressions against this results file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if any(fnmatch.fnmatch(case.name, pattern) for pattern in args.cases)]
+    if args.list:
+        for case in cases:
+            print(f"{case.name} (up to {case.max_size or 'any'} {case.unit})")
+        return
+
+    report = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'mongo': 'server' if args.mongo_url else 'mongomock',
+        },
+        'results': {},
+    }
+    work_dir = tempfile.mkdtemp(prefix='dsde-benchmarks-')
+    try:
+        for size in args.sizes:
+            ctx = Context(synthetic.SIZES[size], seed=args.seed, mongo_url=args.mongo_url, work_dir=work_dir)
+            for case in cases:
+                key = f"{case.name}@{size}"
+                if case.max_size and ctx.n > case.max_size:
+                    continue
+                try:
+                    result = measure(case, ctx, repeat=args.repeat, memory=not args.no_memory)
+                except Skip as e:
+                    report['results'][key] = {'skipped': str(e)}
+                    print(f"{key:50s} skipped: {e}")
+                    continue
+                except ImportError as e:
+                    report['results'][key] = {'skipped': f"missing dependency ({e})"}
+                    print(f"{key:50s} skipped: missing dependency ({e})")
+                    continue
+                report['results'][key] = result
+                memory = f"{result['peak_mb']:9.1f} MB" if 'peak_mb' in result else ''
+                print(f"{key:50s} {result['seconds']:9.3f} s {memory} {result['throughput']:12,.0f} {case.unit}/s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Results saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(report['results'], baseline, args.threshold)
+        for key, metric, previous, current in regressions:
+            print(f"REGRESSION {key} {metric}: {previous:.3f} -> {current:.3f} ({current / previous - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}")
+
+## ---------------benchmark suite---------------
+
+
+if __name__ == "__main__":
+    main()
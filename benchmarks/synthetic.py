@@ -0,0 +1,156 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+## ---------------synthetic datasets---------------
+# Seeded stand-ins for the Scopus `data` collection, the OpenAlex collection,
+# the raw Scopus JSON records read by formatdata and the title/field training
+# file. Categorical fields follow Zipf-like frequencies so group-bys, top-k
+# counts and graph builders see a realistic long tail. The same seed always
+# gives the same data.
+
+SIZES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+WORDS = [f"term{i}" for i in range(5000)] + [
+    'deep', 'learning', 'graph', 'neural', 'network', 'protein', 'cell', 'climate', 'rice', 'dengue',
+    'cancer', 'covid', 'robot', 'sensor', 'energy', 'water', 'soil', 'model', 'analysis', 'thailand',
+]
+FIELDS = ['Computer Science', 'Engineering', 'Medicine', 'Biology', 'Chemistry', 'Physics',
+          'Environmental Science', 'Agriculture', 'Social Sciences', 'Mathematics']
+COUNTRIES = ['Thailand', 'United States', 'Japan', 'China', 'United Kingdom', 'Germany', 'France',
+             'Australia', 'India', 'South Korea', 'Singapore', 'Malaysia', 'Viet Nam', 'Canada', 'Italy']
+OPEN_ACCESS_FLAGS = ['True', 'False', 'gold', 'green', 'bronze', 'hybrid']
+
+
+def _zipf_choice(rng, options, size, exponent=1.1):
+    weights = 1 / np.arange(1, len(options) + 1) ** exponent
+    return np.asarray(options, dtype=object)[rng.choice(len(options), size=size, p=weights / weights.sum())]
+
+
+def _joined(rng, options, n, max_items, sep=',', exponent=1.1):
+    """n strings, each joining 0..max_items options drawn with Zipf weights."""
+    counts = rng.integers(0, max_items + 1, n)
+    items = _zipf_choice(rng, options, int(counts.sum()), exponent)
+    ends = np.cumsum(counts)
+    return [sep.join(items[end - count:end]) for count, end in zip(counts, ends)]
+
+
+def _sentences(rng, n, min_words, max_words):
+    counts = rng.integers(min_words, max_words + 1, n)
+    words = _zipf_choice(rng, WORDS, int(counts.sum()), exponent=1.0)
+    ends = np.cumsum(counts)
+    return [' '.join(words[end - count:end]) for count, end in zip(counts, ends)]
+
+
+# Function to generate a frame shaped like the Scopus 'data' collection
+def papers_frame(n, seed=42):
+    """
+    Generate ``n`` synthetic Scopus papers.
+
+    Parameters:
+        n (int): Number of papers.
+        seed (int): Random seed.
+
+    Returns:
+        DataFrame: The columns read by analyze_function, plus DOI/ISSN used by the linker.
+    """
+    rng = np.random.default_rng(seed)
+    agencies = [f"Agency {i}" for i in range(2000)] + ['Chulalongkorn University', 'NSTDA', 'Thailand Research Fund']
+    organizations = [f"Organization {i}" for i in range(5000)]
+    journals = [f"Journal of Topic {i}" for i in range(3000)]
+    return pd.DataFrame({
+        '_id': [f"{seed:08x}{i:016x}" for i in range(n)],
+        'dc:title': _sentences(rng, n, 4, 14),
+        'dc:description': _sentences(rng, n, 20, 60),
+        'prism:publicationName': _zipf_choice(rng, journals, n),
+        'citedby-count': rng.negative_binomial(1, 0.08, n),
+        'openaccessFlag': _zipf_choice(rng, OPEN_ACCESS_FLAGS, n, exponent=0.5),
+        'Funding Agencies': _joined(rng, agencies, n, 4),
+        'Organizations': _joined(rng, organizations, n, 5),
+        'Countries': _joined(rng, COUNTRIES, n, 4, exponent=1.3),
+        'auth-keywords': _joined(rng, WORDS[-20:], n, 5),
+        'year': rng.integers(2016, 2024, n),
+        'srctype': _zipf_choice(rng, ['j', 'p', 'b', 'k'], n),
+        'prism:doi': [f"10.{1000 + i % 9000}/bench.{seed}.{i}" for i in range(n)],
+        'prism:issn': [f"{1000 + i % 3000:04d}{i % 7:04d}" for i in range(n)],
+    })
+
+
+# Function to generate the title/field training frame used by the ML pipelines
+def training_frame(n, seed=42):
+    rng = np.random.default_rng(seed)
+    fields = rng.choice(FIELDS, n)
+    # Each field favours its own slice of the vocabulary so clusters and classes are learnable
+    offsets = pd.Series(fields).map({field: i * 400 for i, field in enumerate(FIELDS)}).to_numpy()
+    counts = rng.integers(4, 12, n)
+    words = (np.repeat(offsets, counts) + rng.integers(0, 400, int(counts.sum()))) % 5000
+    ends = np.cumsum(counts)
+    titles = [' '.join(f"term{w}" for w in words[end - count:end]) for count, end in zip(counts, ends)]
+    return pd.DataFrame({'title': titles, 'field': fields})
+
+
+# Function to turn synthetic papers into raw Scopus API records
+def scopus_records(frame):
+    """
+    Build abstracts-retrieval-response records, the input of formatdata.process_record.
+
+    Parameters:
+        frame (DataFrame): Output of papers_frame.
+
+    Returns:
+        list: One JSON-serialisable record per row.
+    """
+    records = []
+    for row in frame.itertuples(index=False):
+        authors = [{'affiliation': {'country': country, 'organization': [{'$': f"Organization of {country}"}]}}
+                   for country in row[8].split(',') if country]
+        records.append({'abstracts-retrieval-response': {
+            'coredata': {
+                'dc:title': row[1], 'prism:publicationName': row[3], 'citedby-count': str(row[4]),
+                'openaccessFlag': row[5], 'prism:doi': row[12], 'prism:coverDate': f"{row[10]}-01-01",
+                'dc:creator': {'author': [{'ce:given-name': 'A.', 'ce:surname': 'Author', '@auid': str(row[0])}]},
+                'link': [{'@rel': 'self', '@href': f"https://api.example/{row[0]}"},
+                         {'@rel': 'scopus', '@href': f"https://www.example/{row[0]}"}],
+            },
+            'authkeywords': {'author-keyword': [{'$': keyword} for keyword in row[9].split(',') if keyword]},
+            'item': {
+                'bibrecord': {'head': {'author-group': authors}},
+                'xocs:meta': {'xocs:funding-list': {'xocs:funding': [
+                    {'xocs:funding-agency-matched-string': agency} for agency in row[6].split(',') if agency
+                ]}},
+            },
+        }})
+    return records
+
+
+# Function to write raw records as one JSON file each, the layout formatdata reads
+def write_scopus_files(frame, directory):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, record in enumerate(scopus_records(frame)):
+        path = os.path.join(directory, f"{i:08d}")
+        with open(path, 'w') as f:
+            json.dump(record, f)
+        paths.append(path)
+    return paths
+
+
+# Function to generate records shaped like the OpenAlex collection, overlapping the Scopus papers
+def openalex_records(frame, overlap=0.5, seed=42):
+    rng = np.random.default_rng(seed)
+    shared = rng.random(len(frame)) < overlap
+    records = []
+    for i, row in enumerate(frame.itertuples(index=False)):
+        records.append({
+            '_id': f"oa{seed:06x}{i:016x}",
+            'id': f"https://openalex.org/W{i}",
+            'doi': f"https://doi.org/{row[12]}" if shared[i] else None,
+            'title': row[1] if shared[i] else f"{row[1]} revisited",
+            'publication_year': int(row[10]),
+            'primary_location': {'source': {'issn': [f"{row[13][:4]}-{row[13][4:]}"]}},
+            'locations': [],
+            'abstract_inverted_index': {word: [position] for position, word in enumerate(row[2].split()[:20])},
+        })
+    return records
+
+## ---------------synthetic datasets---------------
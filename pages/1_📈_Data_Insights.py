@@ -1,36 +1,70 @@
 import streamlit as st
-import time
-import numpy as np
-import pandas as pd
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import networkx as nx
-from collections import Counter
-from analyze_function.data_insights import analyze_funding_agencies
-from analyze_function.data_insights import article_per_year
-from analyze_function.data_insights import analyze_top_cited_journals
-from analyze_function.data_insights import analyze_open_access_trends
-from analyze_function.data_insights import analyze_connection_node
-from app.data_collection.db import MongoDBHandler
-
-
-db_Handler = MongoDBHandler()
-data1,data2 = db_Handler.get_all_data(limit=0)
-
-# Load the uploaded CSV file to inspect its structure and contents
-file_path = data2
-new_df = pd.DataFrame(data2)
-filtered_df = new_df[(new_df['year'] >= 2018) & (new_df['year'] <= 2023)]
-data = filtered_df
-# data = pd.read_csv(file_path)
-data.info()
+from analyze_function.analytics_client import AnalyticsClient
+from analyze_function.render_scheduler import RenderScheduler
+from analyze_function.profiling import profile_section
+
+
+# The analytics server (python -m analyze_function.analytics_server serve) holds one copy of the
+# data and one figure cache for every session; responses are revalidated with ETags
+@st.cache_resource
+def analytics_client():
+    return AnalyticsClient()
+
+
+# Without a server, one in-process dataset is shared by the sessions of this Streamlit process
+@st.cache_resource(ttl=600)
+def local_dataset():
+    from analyze_function.analytics_server import InsightsDataset
+    from app.data_collection.db import MongoDBHandler
+    return InsightsDataset.from_mongo(MongoDBHandler())
+
+
+# Function to fetch a figure payload; `version` only keys the render memo so new data redraws every chart
+def fetch_figure(backend, name, version, **params):
+    return backend.figure(name, **params)
+
 
 # Set page configuration
 st.set_page_config(page_title="Data Insight", page_icon="📈",layout='wide')
 
+client = analytics_client()
+with profile_section("insights.connect"):
+    backend = client if client.available() else local_dataset()
+
 # Set title and description
 st.sidebar.header("Data Insight")
+if backend is not client:
+    st.sidebar.caption(f"Analytics server not reachable at {client.base_url}; computing in-process.")
+
+# full-text search narrows every chart below to the matching papers
+search_query = st.sidebar.text_input(
+    "Search Papers",
+    placeholder='e.g. dengue title:"deep learning"',
+    disabled=not backend.years()["search"],
+    help="Terms, \"quoted phrases\" and title:, keywords: or abstract: clauses; all must match.",
+)
+with profile_section("insights.years"):
+    year_info = backend.years(search_query or None)
+if search_query:
+    st.sidebar.caption(f"{year_info['n_rows']:,} matching papers")
+if not year_info["years"]:
+    st.warning("No papers match the search.")
+    st.stop()
+
+# year range backed by the per-year partial aggregates
+min_year, max_year = year_info["years"][0], year_info["years"][-1]
+if min_year == max_year:
+    # A slider needs two distinct bounds; a single year has nothing to choose
+    start_year = end_year = min_year
+    st.sidebar.caption(f"Publication Year: {min_year}")
+else:
+    start_year, end_year = st.sidebar.slider(
+        "Publication Years",
+        min_value=min_year,
+        max_value=max_year,
+        value=tuple(year_info["default"]),
+    )
+view = {"query": search_query or None, "start_year": start_year, "end_year": end_year}
 st.write(
     """# Welcome to Data Insights Visualize 🌟
 
@@ -38,16 +72,45 @@ This is the **Data Insights Visualize** platform for our project, where we bring
 )
 
 ## ---------------visualize data part---------------
+# Every chart gets a placeholder first; the scheduler fills them as the figures are
+# fetched in parallel, and a figure whose inputs did not change is drawn from the
+# previous run without asking for it again.
+scheduler = RenderScheduler(memo=st.session_state.setdefault("insight_figures", {}))
+
+
+def chart_slot():
+    slot = st.empty()
+    slot.caption("Loading chart...")
+    return slot
+
+
+def render_figure(slot):
+    return lambda payload: slot.plotly_chart(payload["figure"])
+
+
+def render_collaboration(metrics_slot, chart_slot):
+    def render(payload):
+        metrics = payload["metrics"]
+        with metrics_slot.container():
+            st.metric("Nodes", metrics["nodes"])
+            st.metric("Edges", metrics["edges"])
+            st.metric("Communities", metrics["communities"])
+        chart_slot.plotly_chart(payload["figure"])
+    return render
+
+
+def add_figure(name, render, **params):
+    scheduler.add(name, fetch_figure, backend, name, year_info["version"], **view, **params, render=render)
+
+
 col1, col2 = st.columns(2)
 ## top cited journals
 with col1:
-    fig1 = analyze_top_cited_journals(data, top_n=10)
-    st.plotly_chart(fig1)
+    add_figure("top_cited_journals", render_figure(chart_slot()))
 
 ## open access trends
 with col2:
-    fig2 = analyze_open_access_trends(data)
-    st.plotly_chart(fig2)
+    add_figure("open_access", render_figure(chart_slot()))
 
 
 # select box for funding agencies
@@ -63,24 +126,26 @@ col1, col2 = st.columns(2)
 with col1:
     if not option:
         option = "Chulalongkorn"
-    fig3 = analyze_funding_agencies(data, keyword=option, column_name='Funding Agencies', top_n=10)
-    st.plotly_chart(fig3)
+    add_figure("funding_agencies", render_figure(chart_slot()), keyword=option)
 
 ## connection node
 with col2:
-    fig4 = analyze_connection_node(data)
-    chart2 = st.plotly_chart(fig4)
+    add_figure("connection_node", render_figure(chart_slot()))
+
+## collaboration communities over the full graph
+col1, col2 = st.columns([1, 3])
+with col1:
+    graph_column = st.selectbox("Collaboration Graph:", ("Funding Agencies", "Organizations"))
+    graph_size = st.slider("Nodes to Display", min_value=10, max_value=500, value=100, step=10)
+    metrics_slot = st.empty()
+with col2:
+    slot = chart_slot()
+add_figure("collaboration_graph", render_collaboration(metrics_slot, slot), column=graph_column, max_nodes=graph_size)
 
 ## article per year
-fig5 = article_per_year(data)
-st.plotly_chart(fig5)
-
-progress_bar = st.sidebar.progress(0)
-status_text = st.sidebar.empty()
-
-for i in range(1, 101):
-    status_text.text("%i%% Complete" % i)
-    progress_bar.progress(i)
-    time.sleep(0.01)
-progress_bar.empty()
-st.button("Re-run")
\ No newline at end of file
+add_figure("articles_per_year", render_figure(chart_slot()))
+
+with profile_section("insights.render_charts"):
+    scheduler.run()
+
+st.button("Re-run")
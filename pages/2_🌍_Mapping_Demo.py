@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
+import os
+import numpy as np
 import pydeck as pdk
 from urllib.error import URLError
+from analyze_function.geo_flows import aggregate_country_nodes, aggregate_flows, NODES_PATH, FLOWS_PATH
 
 st.set_page_config(page_title="Spatial Viz", page_icon="🌍")
 
@@ -11,19 +14,33 @@ st.write(
     """This spatial visualize represents the relationship in countries column mapping with longtitude and latitude """
 )
 
-# Load the data with caching
-@st.cache_data
-def load_data():
+# Load the data with caching; duplicates are collapsed into weighted nodes and flows before rendering.
+# `version` holds the modification times of the offline tables, so a geo_flows update is picked up
+@st.cache_data(max_entries=2)
+def load_data(version):
     try:
-        line_data_temp = pd.read_csv('./dataset/line_data_list.csv')
-        expanded_df_temp = pd.read_csv('./dataset/countries.csv')
-        return line_data_temp,expanded_df_temp
+        if os.path.exists(NODES_PATH) and os.path.exists(FLOWS_PATH):
+            # tables built offline from the Countries field (python -m analyze_function.geo_flows update)
+            nodes_temp = pd.read_csv(NODES_PATH)
+            flows_temp = pd.read_csv(FLOWS_PATH)
+        else:
+            line_data_temp = pd.read_csv('./dataset/line_data_list.csv')
+            expanded_df_temp = pd.read_csv('./dataset/countries.csv')
+            nodes_temp = aggregate_country_nodes(expanded_df_temp)
+            flows_temp = aggregate_flows(line_data_temp, nodes_temp)
+        # Only the plotted columns are sent to the browser
+        nodes_temp['radius'] = 20000 + 130000 * np.sqrt(nodes_temp['publications'] / nodes_temp['publications'].max())
+        nodes_temp['label'] = nodes_temp['Country'] + ': ' + nodes_temp['publications'].astype(str) + ' publications'
+        flows_temp['label'] = (flows_temp['source'].fillna('?') + ' - ' + flows_temp['target'].fillna('?') + ': '
+                               + flows_temp['weight'].astype(str) + ' links')
+        return flows_temp.drop(columns=['source', 'target']), nodes_temp.drop(columns=['Country'])
     except URLError as e:
         st.error(f"Failed to load data: {e}")
 
 
 # Load the data
-line_data,expanded_df =  load_data()
+tables_version = tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in (NODES_PATH, FLOWS_PATH))
+line_data,expanded_df =  load_data(tables_version)
 
 # ----------------- PyDeck Map Setup -----------------
 # Create a PyDeck scatter plot layer for the countries (dots on the map)
@@ -31,7 +48,7 @@ scatter_layer = pdk.Layer(
     "ScatterplotLayer",
     expanded_df,
     get_position='[longitude, latitude]',
-    get_radius=50000,  # Adjust as needed
+    get_radius='radius',  # scaled by the number of publications
     get_fill_color=[0, 0, 255, 160],  # Blue with some transparency
     pickable=True,
 )
@@ -45,11 +62,12 @@ Outbound_Flow = pdk.Layer(
     get_source_color=[200, 30, 0, 160],
     get_target_color=[200, 30, 0, 160],
     auto_highlight=True,
-    width_scale=0.0001,
-    get_width="outbound",
-    width_min_pixels=3,
+    pickable=True,
+    width_scale=30 / max(line_data['weight'].max(), 1) if len(line_data) else 1,
+    get_width="weight",
+    width_min_pixels=1,
     width_max_pixels=30,
-),
+)
 
 # Set up the view for PyDeck
 view_state = pdk.ViewState(
@@ -64,7 +82,7 @@ deck = pdk.Deck(
     map_style="mapbox://styles/mapbox/light-v9",
     layers=[scatter_layer, Outbound_Flow],
     initial_view_state=view_state,
-    tooltip={"text": "{Country}"}
+    tooltip={"text": "{label}"}
 )
 
 # ----------------- Setup for map2 -----------------
@@ -83,6 +101,7 @@ heatmap_layer = pdk.Layer(
     "HeatmapLayer",
     expanded_df,
     get_position=['longitude','latitude'],
+    get_weight='publications',
     opacity=0.8,
     pickable=True,
     radius_pixels=50,
@@ -100,7 +119,7 @@ deck2 = pdk.Deck(
     map_style="mapbox://styles/mapbox/light-v9",
     layers=[scatter_layer2,heatmap_layer],
     initial_view_state=view_state2,
-    tooltip={"text": "{Country}"}
+    tooltip={"text": "{label}"}
 )
 
 
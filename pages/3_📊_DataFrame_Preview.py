@@ -1,5 +1,5 @@
 import streamlit as st
-import pandas as pd
+from analyze_function.preview_store import PreviewStore, store_version
 
 
 st.set_page_config(page_title="DataFrame Preview", page_icon="📊")
@@ -12,9 +12,28 @@ In this web application, we provide an interactive and user-friendly way to expl
 """
 )
 
-# Display the dataframe in Streamlit
-data = pd.read_csv('dataset/updated_with_year.csv')
-selected_year = st.selectbox('Select Year', options=data['year'].unique())
-st.dataframe(data[data['year'] == selected_year].reset_index(drop=True))
+# The preview reads from a year-partitioned Parquet copy of the CSV, one page at a time.
+# `version` changes with the CSV and the store manifest, so a rebuilt store is reopened
+@st.cache_resource(max_entries=1)
+def load_preview_store(version):
+    return PreviewStore.open()
+
+store = load_preview_store(store_version())
+selected_year = st.selectbox('Select Year', options=store.years)
+selected_columns = st.multiselect('Columns', options=store.columns, default=store.columns)
+
+col1, col2, col3 = st.columns(3)
+sort_by = col1.selectbox('Sort By', options=[None] + (selected_columns or store.columns))
+ascending = col2.radio('Order', options=['Ascending', 'Descending'], horizontal=True) == 'Ascending'
+page_size = col3.selectbox('Rows per Page', options=[25, 50, 100, 500], index=2)
+
+n_pages = store.n_pages(selected_year, page_size)
+page_number = st.number_input('Page', min_value=1, max_value=n_pages, value=1, step=1)
+page = store.page(selected_year, page_number - 1, page_size, selected_columns, sort_by, ascending)
+
+first_row = (page_number - 1) * page_size
+st.caption(f"Rows {first_row + 1:,}-{first_row + len(page):,} of {store.count(selected_year):,} "
+           f"(page {page_number} of {n_pages})")
+st.dataframe(page, hide_index=True)
 
 
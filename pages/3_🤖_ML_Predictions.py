@@ -1,11 +1,27 @@
+import os
+import json
 import streamlit as st
 import pandas as pd
 from analyze_function.ml_processing import analyze_category
 from analyze_function.ml_processing import analyze_webscrape
-from app.data_collection.db import MongoDBHandler
+from analyze_function.ml_processing import load_category_taxonomy
+from analyze_function.ml_processing import analyze_webscrape_streaming
+from analyze_function.ml_processing import fit_cluster_model, ClusterModel, CLUSTER_MODEL_NAME
+from analyze_function.model_registry import ModelRegistry
+from analyze_function.ml_processing import select_k
+from analyze_function.k_selection import plot_k_sweep
+from analyze_function.ml_processing import iter_csv_chunks
+from analyze_function.field_classifier import FieldClassifier, FIELD_MODEL_NAME, train_field_classifier
+from analyze_function.field_classifier import predict_field_counts, plot_field_counts
+from analyze_function.similarity_index import SimilarityIndex, DEFAULT_INDEX_DIR
+from analyze_function.cluster_artifact import load_cluster_artifact, artifact_version
+from analyze_function.profiling import profile_section
 
 st.set_page_config(page_title="ML_Processing", page_icon="🤖",layout='wide')
 
+# uploads above this size switch to streaming mode by default
+STREAMING_UPLOAD_BYTES = 50 * 1024 * 1024
+
 st.markdown("# ML_Processing 🤖")
 st.sidebar.header("ML_Processing")
 st.write(
@@ -13,29 +29,135 @@ st.write(
 """
 )
 
-data = pd.read_csv('dataset/k-mean.csv')
-fig1 = analyze_category(data)
+# the prebuilt cluster artifact; only the plotted columns are read
+@st.cache_data
+def load_cluster_points(version):
+    return load_cluster_artifact()
+
+artifact_stamp = artifact_version()
+with profile_section("ml.load_cluster_points") as section:
+    data = load_cluster_points(artifact_stamp['version'] if artifact_stamp else None)
+    section['rows'] = len(data)
+if artifact_stamp:
+    st.caption(f"Cluster artifact {artifact_stamp['version']}: {artifact_stamp['n_rows']:,} papers from {artifact_stamp['source']}")
+
+# zooming narrows the view; once few enough points are in view they are sent unbinned
+with st.expander("Zoom"):
+    x_bounds = (float(data['PCA1'].min()), float(data['PCA1'].max()))
+    y_bounds = (float(data['PCA2'].min()), float(data['PCA2'].max()))
+    x_range = st.slider("PCA1 Range", min_value=x_bounds[0], max_value=x_bounds[1], value=x_bounds)
+    y_range = st.slider("PCA2 Range", min_value=y_bounds[0], max_value=y_bounds[1], value=y_bounds)
+with profile_section("ml.cluster_overview", rows=len(data)):
+    fig1 = analyze_category(data, x_range=x_range, y_range=y_range)
 st.plotly_chart(fig1)
 
 # File uploader for custom input
 uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
+taxonomy_file = st.file_uploader("Optional category taxonomy (CSV with category,keyword columns)", type=["csv"])
 
-if uploaded_file is not None:
-    # Load the user-provided dataset
-    data5 = pd.read_csv(uploaded_file)
-    st.write("Preview of uploaded dataset:")
-    st.write(data5.head())  # Display a preview of the dataset
-    
-    # Call your function to visualize the data
-    fig2 = analyze_webscrape(data5)
-    st.plotly_chart(fig2)
-else:
-    st.write("Please upload a CSV file to visualize.")
+# Saved cluster models let uploads be scored without refitting
+@st.cache_resource
+def load_cluster_model(version):
+    return ClusterModel.load(ModelRegistry(), CLUSTER_MODEL_NAME, version)
 
+@st.cache_resource
+def load_field_classifier(version):
+    return FieldClassifier.load(ModelRegistry(), FIELD_MODEL_NAME, version)
 
+@st.cache_resource
+def load_similarity_index(path, n_vectors):
+    return SimilarityIndex(path)
 
+# Sweep callback: keeps the scores, fitted models and TF-IDF matrix of the upload
+# and moves the k slider to the best sampled silhouette
+def suggest_k(df, upload_id):
+    sweep, vectorized = select_k(df, range(2, 21))
+    st.session_state["k_sweep"] = (upload_id, sweep, vectorized)
+    st.session_state["n_clusters"] = sweep.best_k
 
+saved_version = ModelRegistry().latest_version(CLUSTER_MODEL_NAME)
+cluster_model = None
+if saved_version is not None and st.sidebar.checkbox(f"Use saved cluster model ({saved_version})", value=True):
+    cluster_model = load_cluster_model(saved_version)
 
+if uploaded_file is not None:
+    category_keywords = load_category_taxonomy(taxonomy_file) if taxonomy_file is not None else None
+    # Large uploads are clustered chunk by chunk instead of being read into memory at once
+    streaming = st.checkbox("Streaming mode (for large files)", value=uploaded_file.size > STREAMING_UPLOAD_BYTES)
 
+    st.write("Preview of uploaded dataset:")
+    st.write(pd.read_csv(uploaded_file, nrows=5))  # Display a preview of the dataset
+    uploaded_file.seek(0)
 
+    if streaming:
+        progress_bar = st.progress(0.0, text="Starting...")
+        fig2 = analyze_webscrape_streaming(
+            uploaded_file,
+            category_keywords=category_keywords,
+            progress_callback=lambda fraction, message: progress_bar.progress(fraction, text=message),
+            model=cluster_model,
+        )
+        progress_bar.empty()
+    else:
+        # Load the user-provided dataset
+        data5 = pd.read_csv(uploaded_file)
+        if cluster_model is None:
+            with st.expander("Number of Clusters"):
+                # The sweep runs in the button callback, before the slider is drawn, so
+                # its best k can become the slider value
+                st.session_state.setdefault("n_clusters", 10)
+                n_clusters = st.slider("Clusters (k)", min_value=2, max_value=30, key="n_clusters")
+                st.button("Suggest k (parallel sweep)", on_click=suggest_k, args=(data5, uploaded_file.file_id))
+                sweep_state = st.session_state.get("k_sweep")
+                if sweep_state is not None and sweep_state[0] != uploaded_file.file_id:
+                    sweep_state = None
+                if sweep_state is not None:
+                    sweep = sweep_state[1]
+                    st.plotly_chart(plot_k_sweep(sweep))
+                    st.write(f"Best sampled silhouette at k={sweep.best_k}, inertia elbow at k={sweep.elbow_k}.")
+            # One fitted model is kept per upload, taxonomy and k, so reruns (the save
+            # click included) reuse it instead of fitting again
+            fit_key = (uploaded_file.file_id, taxonomy_file.file_id if taxonomy_file is not None else None, n_clusters)
+            fitted = st.session_state.get("fitted_cluster_model")
+            if fitted is None or fitted[0] != fit_key:
+                if sweep_state is not None and n_clusters in sweep_state[1].models:
+                    # Finish the model the sweep already fitted for this k on the same TF-IDF matrix
+                    model, _ = fit_cluster_model(data5, category_keywords, n_clusters=n_clusters,
+                                                 vectorized=sweep_state[2], kmeans=sweep_state[1].models[n_clusters])
+                else:
+                    model, _ = fit_cluster_model(data5, category_keywords, n_clusters=n_clusters)
+                fitted = (fit_key, model)
+                st.session_state["fitted_cluster_model"] = fitted
+            cluster_model = fitted[1]
+            if st.button("Save fitted cluster model"):
+                st.success(f"Saved model version {cluster_model.save()}")
+        # Call your function to visualize the data
+        fig2 = analyze_webscrape(data5, model=cluster_model)
+    st.plotly_chart(fig2)
+
+    # supervised title -> field predictions for the upload
+    st.write("### Predicted Research Fields")
+    field_version = ModelRegistry().latest_version(FIELD_MODEL_NAME)
+    if field_version is None:
+        if st.button("Train field classifier on dataset/title_field_count.csv"):
+            classifier, metrics = train_field_classifier()
+            field_version = classifier.save(metadata=metrics)
+            st.success(f"Saved field classifier {field_version} (held-out accuracy {metrics['accuracy']:.2f})")
+    if field_version is not None:
+        field_classifier = load_field_classifier(field_version)
+        field_counts = predict_field_counts(field_classifier, iter_csv_chunks(uploaded_file, usecols=['title']))
+        st.plotly_chart(plot_field_counts(field_counts))
+else:
+    st.write("Please upload a CSV file to visualize.")
 
+# nearest-neighbour search over the prebuilt index (python -m analyze_function.similarity_index build ...)
+if os.path.exists(os.path.join(DEFAULT_INDEX_DIR, "manifest.json")):
+    st.write("### Find Similar Papers")
+    query = st.text_input("Paper title or abstract")
+    if query:
+        with open(os.path.join(DEFAULT_INDEX_DIR, "manifest.json"), "r") as f:
+            n_indexed = json.load(f)["n_vectors"]
+        similarity_index = load_similarity_index(DEFAULT_INDEX_DIR, n_indexed)
+        exact = st.checkbox("Exact search", value=similarity_index.centroids is None)
+        results = similarity_index.search(query, k=10, mode='exact' if exact else 'approx')
+        st.dataframe(results.drop(columns='query'), hide_index=True)
@@ -0,0 +1,104 @@
+import io
+import datetime
+import streamlit as st
+from analyze_function.profiling import recorder
+
+st.set_page_config(page_title="Performance", page_icon="⏱️", layout='wide')
+
+st.markdown("# Performance ⏱️")
+st.sidebar.header("Performance")
+st.write(
+    """Timings recorded by the profiling hooks of the analysis functions, the MongoDB queries and the page sections
+since the app started. Visit the other pages to collect calls."""
+)
+
+summary = recorder.summary()
+records = recorder.frame()
+snapshots = recorder.snapshot_list()
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Recorded Calls", f"{len(records):,}")
+col2.metric("Stages", len(summary))
+col3.metric("cProfile Snapshots", len(snapshots))
+
+## ---------------hot spots---------------
+if summary.empty:
+    st.info("No profiled calls yet.")
+else:
+    st.subheader("Hot Spots")
+    st.caption("Stages sorted by total time; latencies in milliseconds, memory as the mean change of the process RSS.")
+    table = summary.copy()
+    for column in ('p50', 'p95', 'p99', 'max'):
+        table[column] = table[column] * 1000
+    st.dataframe(
+        table,
+        hide_index=True,
+        column_config={
+            'p50': st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+            'p95': st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+            'p99': st.column_config.NumberColumn("p99 (ms)", format="%.1f"),
+            'max': st.column_config.NumberColumn("max (ms)", format="%.1f"),
+            'total_seconds': st.column_config.NumberColumn("total (s)", format="%.3f"),
+            'rows': st.column_config.NumberColumn("rows", format="%d"),
+            'rows_per_second': st.column_config.NumberColumn("rows/s", format="%.0f"),
+            'mean_memory_delta_mb': st.column_config.NumberColumn("memory delta (MB)", format="%.1f"),
+        },
+    )
+    st.bar_chart(summary.head(20).set_index('stage')['total_seconds'], horizontal=True)
+
+    # latency history of one stage
+    stage = st.selectbox("Stage History:", summary['stage'])
+    history = records[records['stage'] == stage].copy()
+    history['time'] = history['timestamp'].map(datetime.datetime.fromtimestamp)
+    history['milliseconds'] = history['seconds'] * 1000
+    st.line_chart(history.set_index('time')['milliseconds'])
+
+    with st.expander("Recent Calls"):
+        recent = records.tail(200).iloc[::-1].copy()
+        recent['time'] = recent['timestamp'].map(datetime.datetime.fromtimestamp)
+        st.dataframe(recent.drop(columns='timestamp'), hide_index=True)
+## ---------------hot spots---------------
+
+## ---------------cProfile snapshots---------------
+st.subheader("cProfile Snapshots")
+st.caption(
+    f"An armed stage runs under cProfile on its next call. Calls slower than {recorder.snapshot_seconds:g}s arm "
+    "their stage automatically (PROFILE_SNAPSHOT_SECONDS)."
+)
+col1, col2 = st.columns([3, 1])
+with col1:
+    arm_stage = st.selectbox("Profile the next call of:", summary['stage'] if not summary.empty else [], index=None,
+                             placeholder="Select a stage...")
+with col2:
+    st.write("")
+    if st.button("Arm", disabled=arm_stage is None):
+        recorder.arm(arm_stage)
+if recorder.armed:
+    st.caption("Armed: " + ", ".join(recorder.armed))
+
+if not snapshots:
+    st.info("No snapshots taken yet.")
+for snapshot in reversed(snapshots):
+    taken = datetime.datetime.fromtimestamp(snapshot['timestamp']).strftime("%H:%M:%S")
+    with st.expander(f"{snapshot['stage']} — {snapshot['seconds']:.3f}s at {taken}"):
+        if snapshot.get('path'):
+            st.caption(snapshot['path'])
+        st.code(snapshot['report'], language=None)
+## ---------------cProfile snapshots---------------
+
+## ---------------export---------------
+st.subheader("Export")
+# The records are serialised in memory and downloaded by the browser; nothing is written on the server
+export_buffer = io.StringIO()
+recorder.export(export_buffer)
+st.download_button(
+    "Download Records (JSON lines)",
+    data=export_buffer.getvalue(),
+    file_name="profile_records.jsonl",
+    mime="application/x-ndjson",
+    disabled=records.empty,
+)
+if st.button("Clear Recorded Calls"):
+    recorder.clear()
+    st.rerun()
+## ---------------export---------------